@@ -0,0 +1,35 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """
+    Strong, quoted ETag for a representation identified by ``parts``.
+    """
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    Answer ``304 Not Modified`` if the client's validators match, otherwise return ``render()``.
+
+    Both carry ``ETag``, and ``Last-Modified`` unless ``last_modified`` is ``None``. The responses
+    depend on the Authorization header, so caches may keep them only privately and must revalidate
+    before reuse.
+    """
+    last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+    if response is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+
+    response.headers["ETag"] = etag
+    if last_modified_timestamp is not None:
+        response.headers["Last-Modified"] = http_date(last_modified_timestamp)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
@@ -1,43 +1,119 @@
 from functools import wraps
 import jwt
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
 from django.http import JsonResponse
-from django.contrib.auth.models import User
 
 from common.constatnts.constants import ACCESS_TYPE
+from common.instrumentation import phase
+from custom_users.cache import acache_user, aget_cached_user, cache_user, get_cached_user
 from custom_users.models import CustomUser
+from zone3000.db_routers import aread_your_writes, read_your_writes
 from zone3000.settings import JWT_ALGORITHM, JWT_SECRET
 
 
-def jwt_access_required(view_func):
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        auth_header = request.headers.get("Authorization", '')
+class AuthenticationFailed(Exception):
+    pass
 
-        if not auth_header.startswith("Bearer ") and not auth_header.startswith("Token "):
-            return JsonResponse({"error": "Authorization header must start with Bearer or Token"}, status=401)
 
-        token = auth_header.split(" ")[1]
+def get_access_payload(request):
+    auth_header = request.headers.get("Authorization", '')
+
+    if not auth_header.startswith("Bearer ") and not auth_header.startswith("Token "):
+        raise AuthenticationFailed("Authorization header must start with Bearer or Token")
+
+    token = auth_header.split(" ")[1]
+
+    try:
+        payload = jwt.decode(
+            token,
+            JWT_SECRET,
+            JWT_ALGORITHM
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed("Token expired")
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed("Invalid token")
+
+    if payload.get("type") != ACCESS_TYPE:
+        raise AuthenticationFailed("Invalid token type")
+
+    if payload.get("user_id") is None:
+        raise AuthenticationFailed("Invalid token")
+
+    return payload
+
+
+def get_token_user(payload, verify=False):
+    """
+    The token's user; ``verify`` loads it even with ``JWT_LAZY_USER``, so that tokens of deleted users fail.
+    """
+    user_id = payload["user_id"]
+
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+
+    if settings.JWT_LAZY_USER and not verify:
+        return CustomUser.from_claims(user_id, payload.get("username"))
+
+    user = CustomUser.objects.get(id=user_id)
+    cache_user(user)
+    return user
 
-        try:
-            payload = jwt.decode(
-                token,
-                JWT_SECRET,
-                JWT_ALGORITHM
-            )
 
-            if payload.get("type") != ACCESS_TYPE:
-                return JsonResponse({"error": "Invalid token type"}, status=401)
+async def aget_token_user(payload, verify=False):
+    user_id = payload["user_id"]
 
-            user_id = payload.get("user_id")
-            request.user = CustomUser.objects.get(id=user_id)
+    user = await aget_cached_user(user_id)
+    if user is not None:
+        return user
+
+    if settings.JWT_LAZY_USER and not verify:
+        return CustomUser.from_claims(user_id, payload.get("username"))
+
+    user = await CustomUser.objects.aget(id=user_id)
+    await acache_user(user)
+    return user
+
+
+def is_safe_method(request):
+    # Writes must not be made on behalf of a user that no longer exists.
+    return request.method in ("GET", "HEAD", "OPTIONS")
+
+
+def jwt_access_required(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            try:
+                with phase("auth"):
+                    payload = get_access_payload(request)
+                    request.user = await aget_token_user(payload, verify=not is_safe_method(request))
+
+                async with aread_your_writes(f"user:{payload['user_id']}"):
+                    return await view_func(request, *args, **kwargs)
+
+            except AuthenticationFailed as e:
+                return JsonResponse({"error": str(e)}, status=401)
+            except CustomUser.DoesNotExist:
+                return JsonResponse({"error": "User not found"}, status=401)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            with phase("auth"):
+                payload = get_access_payload(request)
+                request.user = get_token_user(payload, verify=not is_safe_method(request))
 
-            return view_func(request, *args, **kwargs)
+            with read_your_writes(f"user:{payload['user_id']}"):
+                return view_func(request, *args, **kwargs)
 
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({"error": "Token expired"}, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({"error": "Invalid token"}, status=401)
-        except User.DoesNotExist:
+        except AuthenticationFailed as e:
+            return JsonResponse({"error": str(e)}, status=401)
+        except CustomUser.DoesNotExist:
             return JsonResponse({"error": "User not found"}, status=401)
 
     return wrapper
@@ -0,0 +1,20 @@
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def stream_json_array(items, chunk_size=500, encoder=DjangoJSONEncoder):
+    """
+    Yield ``items`` as a JSON array, ``chunk_size`` items per chunk, without materializing the list.
+    """
+    yield "["
+    encode = encoder().encode
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(encode(item))
+        if len(chunk) >= chunk_size:
+            yield ("" if first else ",") + ",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ("" if first else ",") + ",".join(chunk)
+    yield "]"
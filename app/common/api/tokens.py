@@ -0,0 +1,52 @@
+import datetime
+import jwt
+
+from common.constatnts.constants import (
+    ACCESS_TYPE,
+    REFRESH_TYPE,
+    ACCESS_TOKEN_EXPIRY_MINUTES,
+    REFRESH_TOKEN_EXPIRY_HOURS,
+)
+from zone3000.settings import JWT_ALGORITHM, JWT_SECRET
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def encode_access_token(user_id, username):
+    access_token_expiry = datetime.datetime.now() + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRY_MINUTES)
+    access_payload = {
+        "user_id": user_id,
+        "username": username,
+        "exp": access_token_expiry,
+        "type": ACCESS_TYPE
+    }
+    return jwt.encode(access_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def encode_refresh_token(user_id):
+    refresh_token_expiry = datetime.datetime.now() + datetime.timedelta(days=REFRESH_TOKEN_EXPIRY_HOURS)
+    refresh_payload = {
+        "user_id": user_id,
+        "exp": refresh_token_expiry,
+        "type": REFRESH_TYPE
+    }
+    return jwt.encode(refresh_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def decode_refresh_token(token):
+    try:
+        payload = jwt.decode(token, JWT_SECRET, JWT_ALGORITHM)
+    except jwt.ExpiredSignatureError:
+        raise InvalidRefreshToken("Token expired")
+    except jwt.InvalidTokenError:
+        raise InvalidRefreshToken("Invalid token")
+
+    if payload.get("type") != REFRESH_TYPE:
+        raise InvalidRefreshToken("Invalid token type")
+
+    if payload.get("user_id") is None:
+        raise InvalidRefreshToken("Invalid token")
+
+    return payload
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'common'
+
+    def ready(self):
+        # Connects the query recorder and connection counter before any database connection is opened.
+        from common import instrumentation, metrics  # noqa: F401
@@ -4,3 +4,7 @@ from django import forms
 class RetrieveTokenForm(forms.Form):
     username = forms.CharField(max_length=100)
     password = forms.CharField(max_length=255)
+
+
+class RefreshTokenForm(forms.Form):
+    refresh = forms.CharField()
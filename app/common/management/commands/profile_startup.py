@@ -0,0 +1,121 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+def parse_import_times(output):
+    """
+    ``(module, depth, self_us, cumulative_us)`` for every line of ``python -X importtime`` output.
+    """
+    for line in output.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_us, cumulative_us, name = line[len(IMPORT_TIME_PREFIX):].split("|")
+        if not self_us.strip().isdigit():
+            # The column header.
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        yield name.strip(), depth, int(self_us), int(cumulative_us)
+
+
+def import_group(module, apps):
+    """
+    The installed app ``module`` belongs to, or its top-level package.
+    """
+    for app in apps:
+        if module == app or module.startswith(f"{app}."):
+            return app
+    return module.split(".")[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long a fresh worker takes to start: every run is a new interpreter that imports "
+        "Django and the settings, runs django.setup() (timed per app), loads the middleware and the "
+        "URLconf and, with --path, serves one request. Import time is broken down per app or package "
+        "from one extra run with python -X importtime. Pass several settings modules to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "settings_modules",
+            nargs="*",
+            help="Settings modules to profile; defaults to DJANGO_SETTINGS_MODULE.",
+        )
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per settings module; medians are shown.")
+        parser.add_argument("--path", help="Also time a first request to this path, e.g. /redirect/public/<identifier>.")
+        parser.add_argument("--top", type=int, default=10, help="Import groups and modules to list.")
+
+    def handle(self, *args, **options):
+        settings_modules = options["settings_modules"] or [os.environ["DJANGO_SETTINGS_MODULE"]]
+        for settings_module in settings_modules:
+            runs = [self.run(settings_module, options["path"]) for _ in range(options["runs"])]
+            import_times = self.run(settings_module, options["path"], import_time=True)
+            self.report(settings_module, runs, import_times, options["top"])
+
+    def run(self, settings_module, path, import_time=False):
+        command = [sys.executable]
+        if import_time:
+            command += ["-X", "importtime"]
+        command += ["-m", "common.startup"]
+        if path:
+            command += ["--path", path]
+
+        started_at = time.perf_counter()
+        result = subprocess.run(
+            command,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings_module},
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started_at
+        if result.returncode:
+            raise CommandError(f"Starting with {settings_module} failed:\n{result.stderr[-2000:]}")
+
+        measurement = json.loads(result.stdout.splitlines()[-1])
+        measurement["phases"]["process"] = elapsed
+        if import_time:
+            measurement["imports"] = list(parse_import_times(result.stderr))
+        return measurement
+
+    def report(self, settings_module, runs, import_times, top):
+        def median(values):
+            return statistics.median(values) * 1000
+
+        self.stdout.write(f"{settings_module} (median of {len(runs)} runs, ms)")
+        for phase in runs[0]["phases"]:
+            label = phase
+            if phase == "request":
+                label = f"request ({runs[0]['status']})"
+            self.stdout.write(f"  {label:<16}{median([run['phases'][phase] for run in runs]):>10.1f}")
+
+        self.stdout.write("  django.setup() per app: create / models / ready")
+        for app in runs[0]["apps"]:
+            parts = [
+                median([run["apps"][app].get(part, 0) for run in runs])
+                for part in ("create", "models", "ready")
+            ]
+            self.stdout.write(f"    {app:<32}" + "".join(f"{part:>9.1f}" for part in parts))
+
+        apps = sorted(import_times["apps"], key=len, reverse=True)
+        groups = {}
+        for module, _, self_us, _ in import_times["imports"]:
+            group = import_group(module, apps)
+            groups[group] = groups.get(group, 0) + self_us
+        self.stdout.write(f"  import time per app or package (one -X importtime run, {len(import_times['imports'])} modules)")
+        for group, self_us in sorted(groups.items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f"    {group:<32}{self_us / 1000:>9.1f}")
+
+        self.stdout.write("  slowest top-level imports, cumulative")
+        top_level = [(module, cumulative_us) for module, depth, _, cumulative_us in import_times["imports"] if depth == 0]
+        for module, cumulative_us in sorted(top_level, key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f"    {module:<32}{cumulative_us / 1000:>9.1f}")
@@ -0,0 +1,409 @@
+import fcntl
+import glob
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REQUESTS_TOTAL = "zone3000_http_requests_total"
+REQUEST_DURATION = "zone3000_http_request_duration_seconds"
+CACHE_HITS = "zone3000_cache_hits_total"
+CACHE_MISSES = "zone3000_cache_misses_total"
+CACHE_HIT_RATIO = "zone3000_cache_hit_ratio"
+DB_CONNECTIONS_OPENED = "zone3000_db_connections_opened_total"
+DB_POOL_SIZE = "zone3000_db_pool_size"
+DB_POOL_AVAILABLE = "zone3000_db_pool_available"
+DB_POOL_WAITING = "zone3000_db_pool_requests_waiting"
+DB_POOL_REQUESTS = "zone3000_db_pool_requests_total"
+DB_POOL_WAIT_SECONDS = "zone3000_db_pool_wait_seconds_total"
+DB_POOL_TIMEOUTS = "zone3000_db_pool_timeouts_total"
+
+GAUGES = {DB_POOL_SIZE, DB_POOL_AVAILABLE, DB_POOL_WAITING}
+
+# Request methods are client-controlled: any other is labelled "other", so that the number of series stays bounded.
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+METRICS = {
+    REQUESTS_TOTAL: ("counter", "Requests by route, method and status code."),
+    REQUEST_DURATION: ("histogram", "Request latency by route and method."),
+    CACHE_HITS: ("counter", "Cache hits by cache and tier."),
+    CACHE_MISSES: ("counter", "Cache misses by cache and tier."),
+    CACHE_HIT_RATIO: ("gauge", "Cache hits / (hits + misses), by cache and tier, across all workers."),
+    DB_CONNECTIONS_OPENED: ("counter", "New database connections, by alias."),
+    DB_POOL_SIZE: ("gauge", "Connections held by the pools of all workers, by alias."),
+    DB_POOL_AVAILABLE: ("gauge", "Idle connections in the pools of all workers, by alias."),
+    DB_POOL_WAITING: ("gauge", "Requests waiting for a pooled connection, by alias."),
+    DB_POOL_REQUESTS: ("counter", "Connections requested from the pool, by alias."),
+    DB_POOL_WAIT_SECONDS: ("counter", "Time spent waiting for a pooled connection, by alias."),
+    DB_POOL_TIMEOUTS: ("counter", "Pool requests that timed out waiting for a connection, by alias."),
+}
+
+_HEADER = struct.Struct("<i")
+_VALUE = struct.Struct("<d")
+
+
+def _padded_length(length):
+    # Keeps every value 8-byte aligned: 4 bytes of length, the key, padding, then the double.
+    return length + (8 - (length + 4) % 8) % 8
+
+
+def read_entries(data):
+    """
+    Yield ``(key, value, value_offset)`` for every entry in a store file's contents.
+    """
+    used = _HEADER.unpack_from(data, 0)[0]
+    position = 8
+    while position < used:
+        length = _HEADER.unpack_from(data, position)[0]
+        position += 4
+        key = bytes(data[position:position + length]).decode()
+        position += _padded_length(length)
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        position += 8
+
+
+def pack_entries(values):
+    """
+    The contents of a store file holding ``values``, in the layout ``read_entries`` reads.
+    """
+    entries = b"".join(
+        struct.pack(f"<i{_padded_length(len(encoded))}sd", len(encoded), encoded, value)
+        for encoded, value in ((key.encode(), value) for key, value in values.items())
+    )
+    return _HEADER.pack(8 + len(entries)) + bytes(4) + entries
+
+
+def read_file(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < 8:
+        return {}
+    return {key: value for key, value, _ in read_entries(data)}
+
+
+_process_token = (None, None)
+
+
+def process_file_name():
+    """
+    ``<pid>-<start time in ns>.db``: unique per process, even when a pid is reused.
+    """
+    global _process_token
+
+    pid, token = _process_token
+    if pid != os.getpid():
+        pid, token = _process_token = (os.getpid(), time.time_ns())
+    return f"{pid}-{token}.db"
+
+
+def process_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+PROCESS_FILE_RE = re.compile(r"(-?\d+)-(\d+)\.db")
+
+
+def live_files(paths):
+    """
+    The newest file of every running pid; older files of a pid belong to an exited process that
+    had the same pid. Paths not named like ``process_file_name()`` are left out.
+    """
+    newest = {}
+    for path in paths:
+        match = PROCESS_FILE_RE.fullmatch(os.path.basename(path))
+        if match is None:
+            continue
+        pid, token = int(match[1]), int(match[2])
+        if token > newest.get(pid, (-1, None))[0]:
+            newest[pid] = (token, path)
+    return {path for pid, (_, path) in newest.items() if process_alive(pid)}
+
+
+class MmapValueStore:
+    """
+    Named float values in a memory-mapped file per process, summed across processes on read.
+
+    Every worker only ever writes its own ``<pid>-<start time>.db`` file in ``directory``, so no
+    cross-process locking is needed; the reader (``/metrics``, served by any worker) adds up all
+    these files, ignoring any other file there. When ``read_all`` is told which keys are gauges, it
+    merges the other values of exited workers into ``aggregate.db`` and removes their files, so the
+    directory does not grow with every restarted worker; readers hold a lock on ``.lock`` so that
+    no two merge at once.
+    """
+
+    initial_size = 1 << 16
+    aggregate_name = "aggregate.db"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(os.path.join(self.directory, process_file_name()), "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.initial_size
+            self._file.truncate(size)
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions = {key: position for key, _, position in read_entries(self._mmap)}
+        self._pid = os.getpid()
+
+    def _position(self, key):
+        if self._pid != os.getpid():
+            self._open()
+
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+
+        encoded = key.encode()
+        padded_length = _padded_length(len(encoded))
+        entry = struct.pack(f"<i{padded_length}sd", len(encoded), encoded, 0.0)
+        if self._used + len(entry) > self._capacity:
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+            self._mmap.close()
+            self._file.truncate(self._capacity)
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+
+        self._mmap[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        # Published after the entry is written, so readers never see a partial one.
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        position = self._positions[key] = self._used - 8
+        return position
+
+    def inc(self, key, amount=1.0):
+        with self._lock:
+            position = self._position(key)
+            _VALUE.pack_into(self._mmap, position, _VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            position = self._position(key)
+            _VALUE.pack_into(self._mmap, position, value)
+
+    def _process_paths(self):
+        return {
+            path
+            for path in glob.glob(os.path.join(self.directory, "*.db"))
+            if PROCESS_FILE_RE.fullmatch(os.path.basename(path))
+        }
+
+    def read_all(self, is_gauge=None):
+        """
+        Sum every key over all files; keys for which ``is_gauge(key)`` is true only over the files
+        of running processes.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if is_gauge:
+                self._merge_exited(is_gauge)
+            totals = {}
+            paths = self._process_paths()
+            aggregate_path = os.path.join(self.directory, self.aggregate_name)
+            if os.path.exists(aggregate_path):
+                paths.add(aggregate_path)
+            for path in paths:
+                for key, value in read_file(path).items():
+                    totals[key] = totals.get(key, 0.0) + value
+            return totals
+
+    def _merge_exited(self, is_gauge):
+        aggregate_path = os.path.join(self.directory, self.aggregate_name)
+        paths = self._process_paths()
+        exited = paths - live_files(paths)
+        if not exited:
+            return
+
+        totals = read_file(aggregate_path) if os.path.exists(aggregate_path) else {}
+        for path in exited:
+            for key, value in read_file(path).items():
+                if not is_gauge(key):
+                    totals[key] = totals.get(key, 0.0) + value
+        temporary_path = f"{aggregate_path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(pack_entries(totals))
+        os.replace(temporary_path, aggregate_path)
+        for path in exited:
+            os.unlink(path)
+
+
+def metric_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_metrics_store():
+    directory = settings.METRICS_DIR
+    store = _stores.get(directory)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(directory, MmapValueStore(directory))
+    return store
+
+
+def observe_request(route, method, status, duration):
+    if method not in HTTP_METHODS:
+        method = "other"
+    store = get_metrics_store()
+    store.inc(metric_key(REQUESTS_TOTAL, {"route": route, "method": method, "status": str(status)}))
+
+    labels = {"route": route, "method": method}
+    # Buckets are stored non-cumulatively and summed up when rendered.
+    le = next((bucket for bucket in settings.METRICS_LATENCY_BUCKETS if duration <= bucket), math.inf)
+    store.inc(metric_key(f"{REQUEST_DURATION}_bucket", {**labels, "le": _format_value(le)}))
+    store.inc(metric_key(f"{REQUEST_DURATION}_sum", labels), duration)
+    store.inc(metric_key(f"{REQUEST_DURATION}_count", labels))
+
+
+def cache_collector():
+    from links.cache import redirect_rule_cache, redirect_target_cache
+
+    for cache in (redirect_rule_cache, redirect_target_cache):
+        local = cache.local.stats()
+        yield CACHE_HITS, {"cache": cache.key_prefix, "tier": "local"}, local["hits"]
+        yield CACHE_MISSES, {"cache": cache.key_prefix, "tier": "local"}, local["misses"]
+        yield CACHE_HITS, {"cache": cache.key_prefix, "tier": "shared"}, cache.shared_hits
+        yield CACHE_MISSES, {"cache": cache.key_prefix, "tier": "shared"}, cache.shared_misses
+
+
+_connections_opened = {}
+# A forked worker reports its own connections only.
+os.register_at_fork(after_in_child=_connections_opened.clear)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    _connections_opened[connection.alias] = _connections_opened.get(connection.alias, 0) + 1
+
+
+def database_collector():
+    for alias, opened in _connections_opened.items():
+        yield DB_CONNECTIONS_OPENED, {"alias": alias}, opened
+
+    for alias in connections:
+        # Only the postgresql backend with OPTIONS["pool"] (psycopg 3) has a pool.
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        labels = {"alias": alias}
+        yield DB_POOL_SIZE, labels, stats.get("pool_size", 0)
+        yield DB_POOL_AVAILABLE, labels, stats.get("pool_available", 0)
+        yield DB_POOL_WAITING, labels, stats.get("requests_waiting", 0)
+        yield DB_POOL_REQUESTS, labels, stats.get("requests_num", 0)
+        yield DB_POOL_WAIT_SECONDS, labels, stats.get("requests_wait_ms", 0) / 1000
+        yield DB_POOL_TIMEOUTS, labels, stats.get("requests_errors", 0)
+
+
+# Functions yielding ``(name, labels, value)`` of cumulative per-process counters kept elsewhere.
+collectors = [cache_collector, database_collector]
+_last_collected_at = 0.0
+
+
+def collect(force=False):
+    """
+    Copy the ``collectors``' per-process values into this process's store, at most once a second.
+    """
+    global _last_collected_at
+
+    now = time.monotonic()
+    if not force and now - _last_collected_at < 1:
+        return
+    _last_collected_at = now
+
+    store = get_metrics_store()
+    for collector in collectors:
+        for name, labels, value in collector():
+            store.set(metric_key(name, labels), value)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        label_text = ",".join(f'{label}="{_escape_label_value(label_value)}"' for label, label_value in labels)
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def render_metrics():
+    """
+    Render the values of all workers in the Prometheus text exposition format.
+    """
+    collect(force=True)
+    samples = {}
+    for key, value in get_metrics_store().read_all(is_gauge=lambda key: json.loads(key)[0] in GAUGES).items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((tuple(map(tuple, labels)), value))
+
+    ratios = []
+    for labels, hits in samples.get(CACHE_HITS, []):
+        misses = dict(samples.get(CACHE_MISSES, [])).get(labels, 0.0)
+        if hits + misses:
+            ratios.append((labels, hits / (hits + misses)))
+    samples[CACHE_HIT_RATIO] = ratios
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type != "histogram":
+            lines.extend(_format_sample(name, labels, value) for labels, value in sorted(samples.get(name, [])))
+            continue
+
+        buckets = {}
+        for labels, value in samples.get(f"{name}_bucket", []):
+            labels = dict(labels)
+            le = float(labels.pop("le"))
+            buckets.setdefault(tuple(sorted(labels.items())), {})[le] = value
+        sums = dict(samples.get(f"{name}_sum", []))
+        for labels, count in sorted(samples.get(f"{name}_count", [])):
+            cumulative = 0.0
+            observed = buckets.get(labels, {})
+            for le in [*settings.METRICS_LATENCY_BUCKETS, math.inf]:
+                cumulative += observed.get(le, 0.0)
+                lines.append(_format_sample(f"{name}_bucket", (*labels, ("le", _format_value(le))), cumulative))
+            lines.append(_format_sample(f"{name}_sum", labels, sums.get(labels, 0.0)))
+            lines.append(_format_sample(f"{name}_count", labels, count))
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,119 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from common.instrumentation import finish_request, start_request
+from common.metrics import collect, observe_request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """
+    Record query count, database time and phase timings of every request.
+
+    Adds a ``Server-Timing`` header and logs one JSON line for requests slower than
+    ``REQUEST_SLOW_THRESHOLD_MS``. Removed from the middleware chain entirely when
+    ``REQUEST_TIMING_ENABLED`` is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.process_timings(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.process_timings(request, response, timings)
+
+    def process_timings(self, request, response, timings):
+        total = timings.elapsed
+
+        if settings.REQUEST_TIMING_HEADER:
+            metrics = [f'db;dur={timings.db_time * 1000:.2f};desc="{timings.queries} queries"']
+            metrics += [f"{name};dur={duration * 1000:.2f}" for name, duration in timings.phases.items()]
+            metrics.append(f"total;dur={total * 1000:.2f}")
+            response["Server-Timing"] = ", ".join(metrics)
+
+        if total * 1000 >= settings.REQUEST_SLOW_THRESHOLD_MS:
+            resolver_match = request.resolver_match
+            logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.path,
+                "route": resolver_match.route if resolver_match else None,
+                "status": response.status_code,
+                "duration_ms": round(total * 1000, 2),
+                "queries": timings.queries,
+                "db_ms": round(timings.db_time * 1000, 2),
+                "phases_ms": {name: round(duration * 1000, 2) for name, duration in timings.phases.items()},
+            }))
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Count requests and record their latency per route into the cross-process metrics store.
+
+    Routes are labelled with their URL pattern, and unresolved paths as ``unmatched``, to keep
+    the number of series bounded. Removed from the chain when ``METRICS_ENABLED`` is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started_at = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started_at)
+        return response
+
+    async def __acall__(self, request):
+        started_at = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started_at)
+        return response
+
+    @staticmethod
+    def record(request, response, duration):
+        resolver_match = request.resolver_match
+        route = resolver_match.route if resolver_match else "unmatched"
+        observe_request(route, request.method, response.status_code, duration)
+        collect()
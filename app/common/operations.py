@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently as PostgresAddIndexConcurrently
+from django.db import DEFAULT_DB_ALIAS
+from django.db.migrations.operations import AddIndex, AlterField
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    ``CREATE INDEX CONCURRENTLY`` on PostgreSQL, so writes to the table go on while the index is
+    built; a plain ``CREATE INDEX`` on other databases. Needs ``atomic = False`` on the migration.
+
+    A concurrent build that fails leaves an invalid index behind; drop it before migrating again.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AlterFieldOnShards(AlterField):
+    """
+    ``AlterField`` whose schema change only runs on the ``DATABASE_SHARDS`` besides ``default``, e.g.
+    to drop a foreign key to a table that is only filled in ``default``. Every other database keeps
+    the column as it was, constraints included.
+    """
+
+    @staticmethod
+    def applies_to(connection):
+        return connection.alias in settings.DATABASE_SHARDS and connection.alias != DEFAULT_DB_ALIAS
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
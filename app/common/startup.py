@@ -0,0 +1,120 @@
+"""
+Startup phases of a fresh worker, measured in a new interpreter by ``manage.py profile_startup``.
+
+Run as ``python -m common.startup [--path PATH]`` with ``DJANGO_SETTINGS_MODULE`` set; prints one
+JSON object with the duration, in seconds, of every phase and of every app's part of
+``django.setup()``, and the status of the optional first request to ``PATH``.
+"""
+import io
+import json
+import time
+
+
+def timed_apps(app_timings):
+    """
+    Record how long every app takes to be created, to import its models and to get ready.
+
+    ``apps.populate()`` imports the models of every app before calling any ``ready()``, so
+    ``ready`` can be wrapped per instance from ``import_models``.
+    """
+    from django.apps.config import AppConfig
+
+    create = AppConfig.create.__func__
+    import_models = AppConfig.import_models
+
+    def timed_create(cls, entry):
+        started_at = time.perf_counter()
+        app_config = create(cls, entry)
+        app_timings[app_config.name] = {"create": time.perf_counter() - started_at}
+        return app_config
+
+    def timed_import_models(self):
+        started_at = time.perf_counter()
+        import_models(self)
+        app_timings[self.name]["models"] = time.perf_counter() - started_at
+
+        ready = self.ready
+
+        def timed_ready():
+            started_at = time.perf_counter()
+            ready()
+            app_timings[self.name]["ready"] = time.perf_counter() - started_at
+
+        self.ready = timed_ready
+
+    AppConfig.create = classmethod(timed_create)
+    AppConfig.import_models = timed_import_models
+
+
+def first_request(handler, path, host):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "HTTP_HOST": host,
+        "wsgi.input": io.BytesIO(),
+        "wsgi.url_scheme": "http",
+    }
+    statuses = []
+    response = handler(environ, lambda status, headers: statuses.append(status))
+    response.close()
+    return int(statuses[0].split()[0])
+
+
+def measure(path=None):
+    phases = {}
+    app_timings = {}
+    started_at = time.perf_counter()
+
+    from django.conf import settings
+    phases["django"] = time.perf_counter() - started_at
+
+    phase_started_at = time.perf_counter()
+    # Accessing a setting imports the settings module.
+    settings.INSTALLED_APPS
+    phases["settings"] = time.perf_counter() - phase_started_at
+
+    # django.setup(), in two phases.
+    phase_started_at = time.perf_counter()
+    from django.utils.log import configure_logging
+    configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+    phases["logging"] = time.perf_counter() - phase_started_at
+
+    from django.apps import apps
+
+    timed_apps(app_timings)
+    phase_started_at = time.perf_counter()
+    apps.populate(settings.INSTALLED_APPS)
+    phases["apps"] = time.perf_counter() - phase_started_at
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.urls import get_resolver
+
+    phase_started_at = time.perf_counter()
+    handler = WSGIHandler()
+    phases["middleware"] = time.perf_counter() - phase_started_at
+
+    phase_started_at = time.perf_counter()
+    get_resolver().url_patterns
+    phases["urlconf"] = time.perf_counter() - phase_started_at
+
+    status = None
+    if path:
+        host = next((host for host in settings.ALLOWED_HOSTS if host != "*" and not host.startswith(".")), "localhost")
+        phase_started_at = time.perf_counter()
+        status = first_request(handler, path, host)
+        phases["request"] = time.perf_counter() - phase_started_at
+
+    phases["total"] = time.perf_counter() - started_at
+    return {"phases": phases, "apps": app_timings, "status": status}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path")
+    arguments = parser.parse_args()
+    print(json.dumps(measure(arguments.path)))
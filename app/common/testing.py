@@ -0,0 +1,58 @@
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+class _AssertNumQueriesOnAllContext(ExitStack):
+    def __init__(self, test_case, num):
+        super().__init__()
+        self.test_case = test_case
+        self.num = num
+
+    def __enter__(self):
+        super().__enter__()
+        self.captures = [self.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            queries = [query["sql"] for capture in self.captures for query in capture.captured_queries]
+            self.test_case.assertEqual(
+                len(queries),
+                self.num,
+                "%d queries executed, %d expected\nCaptured queries were:\n%s"
+                % (len(queries), self.num, "\n".join(f"{index}. {sql}" for index, sql in enumerate(queries, start=1))),
+            )
+        return result
+
+
+class AllDatabasesTestMixin:
+    """
+    Run on every database and count the queries of all of them.
+
+    With ``DB_SHARD_URLS`` set, redirect rules live on several databases. Reads are not sent to
+    ``DB_REPLICA_URLS`` unless ``read_replicas`` is set: replicas mirror the test database through
+    connections of their own, which do not see the rows of a ``TestCase``'s open transaction.
+    """
+
+    databases = "__all__"
+    read_replicas = False
+
+    @classmethod
+    def setUpClass(cls):
+        if not cls.read_replicas:
+            cls.enterClassContext(override_settings(DATABASE_REPLICAS=[]))
+        super().setUpClass()
+
+    def assertNumQueries(self, num, func=None, *args, using=None, **kwargs):
+        if using is not None:
+            return super().assertNumQueries(num, func, *args, using=using, **kwargs)
+
+        context = _AssertNumQueriesOnAllContext(self, num)
+        if func is None:
+            return context
+        with context:
+            func(*args, **kwargs)
@@ -1,14 +1,41 @@
 import json
 import jwt
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.http import JsonResponse
+from django.db import router
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 
+from common.api.decorators import jwt_access_required
+from common.management.commands.profile_startup import import_group, parse_import_times
+from common.testing import AllDatabasesTestMixin
+from common.metrics import MmapValueStore, collect, metric_key
+from common.api.tokens import encode_access_token, encode_refresh_token
+from custom_users.cache import cache_user
 from custom_users.models import CustomUser
+from links.models import RedirectRule
+from zone3000.db_routers import (
+    PrimaryReplicaRouter,
+    ShardRouter,
+    is_pinned_to_primary,
+    pin_to_primary,
+    read_your_writes,
+    shard_for_key,
+)
 from zone3000.settings import JWT_SECRET, JWT_ALGORITHM
 from common.constatnts.constants import ACCESS_TYPE, REFRESH_TYPE
 
 
-class RetrieveTokenViewTestCase(TestCase):
+class RetrieveTokenViewTestCase(AllDatabasesTestMixin, TestCase):
     def setUp(self):
         self.user = CustomUser.objects.create(
             username="testuser",
@@ -105,3 +132,572 @@ class RetrieveTokenViewTestCase(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertIn("errors", response.json())
+
+
+class RefreshTokenViewTestCase(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            username="testuser",
+            password="testpassword123"
+        )
+        self.url = "/refresh-token/"
+        self.refresh_token = encode_refresh_token(self.user.id)
+
+    def post(self, data):
+        return self.client.post(
+            self.url,
+            data=json.dumps(data),
+            content_type="application/json"
+        )
+
+    def test_refresh_returns_new_access_token(self):
+        with self.assertNumQueries(1):
+            response = self.post({"refresh": self.refresh_token})
+
+        self.assertEqual(response.status_code, 200)
+        response_data = response.json()
+        decoded_access = jwt.decode(
+            response_data[ACCESS_TYPE],
+            JWT_SECRET,
+            algorithms=[JWT_ALGORITHM]
+        )
+        self.assertEqual(decoded_access["type"], ACCESS_TYPE)
+        self.assertEqual(decoded_access["user_id"], self.user.id)
+        self.assertEqual(decoded_access["username"], "testuser")
+
+    def test_refresh_token_from_login_is_accepted(self):
+        response = self.client.post(
+            "/retrieve-token/",
+            data=json.dumps({"username": "testuser", "password": "testpassword123"}),
+            content_type="application/json"
+        )
+
+        response = self.post({"refresh": response.json()[REFRESH_TYPE]})
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(JWT_USER_CACHE_TTL=60)
+    def test_cached_user_skips_database(self):
+        cache_user(self.user)
+
+        with self.assertNumQueries(0):
+            response = self.post({"refresh": self.refresh_token})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_access_token_is_rejected(self):
+        access_token = encode_access_token(self.user.id, self.user.username)
+
+        response = self.post({"refresh": access_token})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "Invalid token type")
+
+    def test_expired_refresh_token(self):
+        payload = {"user_id": self.user.id, "exp": 0, "type": REFRESH_TYPE}
+
+        response = self.post({"refresh": jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "Token expired")
+
+    def test_deleted_user(self):
+        self.user.delete()
+
+        response = self.post({"refresh": self.refresh_token})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "User not found")
+
+    def test_missing_refresh_token(self):
+        response = self.post({})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("errors", response.json())
+
+
+@jwt_access_required
+def username_view(request):
+    return JsonResponse({"username": request.user.username})
+
+
+@jwt_access_required
+def password_view(request):
+    return JsonResponse({"has_password": bool(request.user.password)})
+
+
+class JwtAccessRequiredTestCase(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = CustomUser.objects.create(
+            username="testuser",
+            password="testpassword123"
+        )
+        payload = {
+            "user_id": self.user.id,
+            "username": self.user.username,
+            "type": ACCESS_TYPE
+        }
+        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+        self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def call(self, view):
+        return view(self.factory.get("/", **self.auth_header))
+
+    def test_user_is_loaded_from_database_by_default(self):
+        with self.assertNumQueries(1):
+            response = self.call(username_view)
+
+        self.assertEqual(json.loads(response.content)["username"], "testuser")
+
+    @override_settings(JWT_LAZY_USER=True)
+    def test_lazy_user_is_built_from_claims(self):
+        with self.assertNumQueries(0):
+            response = self.call(username_view)
+
+        self.assertEqual(json.loads(response.content)["username"], "testuser")
+
+    @override_settings(JWT_LAZY_USER=True)
+    def test_lazy_user_loads_other_fields_on_access(self):
+        with self.assertNumQueries(1):
+            response = self.call(password_view)
+
+        self.assertTrue(json.loads(response.content)["has_password"])
+
+    @override_settings(JWT_LAZY_USER=True)
+    def test_lazy_user_that_no_longer_exists(self):
+        self.user.delete()
+
+        response = self.call(password_view)
+
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_LAZY_USER=True)
+    def test_lazy_user_is_loaded_for_writes(self):
+        self.user.username = "renamed"
+        self.user.save(update_fields=["username"])
+
+        with self.assertNumQueries(1):
+            response = username_view(self.factory.post("/", **self.auth_header))
+
+        self.assertEqual(json.loads(response.content)["username"], "renamed")
+
+        self.user.delete()
+        response = username_view(self.factory.post("/", **self.auth_header))
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_USER_CACHE_TTL=60)
+    def test_token_user_is_cached(self):
+        with self.assertNumQueries(1):
+            self.call(username_view)
+        with self.assertNumQueries(0):
+            response = self.call(username_view)
+
+        self.assertEqual(json.loads(response.content)["username"], "testuser")
+
+    @override_settings(JWT_USER_CACHE_TTL=60)
+    def test_token_user_cache_is_invalidated_on_change(self):
+        self.call(username_view)
+
+        self.user.username = "renamed"
+        self.user.save(update_fields=["username"])
+
+        response = self.call(username_view)
+        self.assertEqual(json.loads(response.content)["username"], "renamed")
+
+    def test_missing_user(self):
+        self.user.delete()
+
+        response = self.call(username_view)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)["error"], "User not found")
+
+
+@override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_SLOW_THRESHOLD_MS=60000)
+class RequestTimingMiddlewareTestCase(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            username="testuser",
+            password="testpassword123"
+        )
+        self.auth_header = {"Authorization": f"Bearer {encode_access_token(self.user.id, self.user.username)}"}
+        # The user, then the rules of every shard.
+        self.list_queries = 1 + len(RedirectRule.objects.shard_querysets())
+
+    def server_timing(self, response):
+        return dict(
+            (metric.split(";")[0], metric)
+            for metric in response["Server-Timing"].split(", ")
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get("/url/redirect_rules", headers=self.auth_header)
+
+        metrics = self.server_timing(response)
+        self.assertIn(f'desc="{self.list_queries} queries"', metrics["db"])
+        self.assertIn("auth", metrics)
+        self.assertIn("serialize", metrics)
+        self.assertIn("total", metrics)
+
+    def test_queries_in_async_requests_are_counted(self):
+        response = async_to_sync(self.async_client.get)("/url/redirect_rules", headers=self.auth_header)
+
+        self.assertIn(f'desc="{self.list_queries} queries"', self.server_timing(response)["db"])
+
+    @override_settings(REQUEST_SLOW_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("common.middleware", "WARNING") as logs:
+            self.client.get("/url/redirect_rules", headers=self.auth_header)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["event"], "slow_request")
+        self.assertEqual(record["route"], "url/redirect_rules")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], self.list_queries)
+        self.assertIn("auth", record["phases_ms"])
+
+    @override_settings(REQUEST_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get("/url/redirect_rules", headers=self.auth_header)
+
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get("/url/redirect_rules", headers=self.auth_header)
+
+        self.assertNotIn("Server-Timing", response)
+
+
+class MmapValueStoreTestCase(TestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def test_values_are_summed_across_processes(self):
+        store = MmapValueStore(self.directory)
+        store.inc("requests")
+        store.inc("requests", 2)
+
+        # A forked worker gets its own file.
+        with mock.patch("common.metrics.os.getpid", return_value=-1):
+            store.inc("requests")
+            store.set("gauge", 5)
+
+        self.assertEqual(store.read_all(), {"requests": 4.0, "gauge": 5.0})
+
+    def test_gauges_of_exited_processes_are_left_out(self):
+        store = MmapValueStore(self.directory)
+        store.inc("requests")
+        store.set("gauge", 2)
+
+        # An exited worker (above the largest possible pid), and an earlier process with this pid.
+        with mock.patch("common.metrics.os.getpid", return_value=2 ** 22 + 1):
+            store.inc("requests")
+            store.set("gauge", 5)
+        with mock.patch("common.metrics._process_token", (os.getpid(), 0)):
+            MmapValueStore(self.directory).set("gauge", 7)
+
+        self.assertEqual(store.read_all()["gauge"], 14.0)
+        self.assertEqual(store.read_all(is_gauge=lambda key: key == "gauge"), {"requests": 2.0, "gauge": 2.0})
+
+    def test_files_of_exited_processes_are_merged(self):
+        store = MmapValueStore(self.directory)
+        store.inc("requests")
+        store.set("gauge", 2)
+        for pid in (2 ** 22 + 1, 2 ** 22 + 2):
+            with mock.patch("common.metrics.os.getpid", return_value=pid):
+                store.inc("requests", 2)
+                store.set("gauge", 5)
+        is_gauge = {"gauge"}.__contains__
+
+        self.assertEqual(store.read_all(is_gauge=is_gauge), {"requests": 5.0, "gauge": 2.0})
+        self.assertEqual(
+            sorted(name.split("-")[0] for name in os.listdir(self.directory)),
+            [".lock", str(os.getpid()), "aggregate.db"],
+        )
+
+        # Later exits are added to the aggregate, and the counts of the running process keep going.
+        with mock.patch("common.metrics.os.getpid", return_value=2 ** 22 + 3):
+            store.inc("requests", 4)
+        store.inc("requests")
+        store.set("gauge", 2)
+        self.assertEqual(store.read_all(is_gauge=is_gauge), {"requests": 10.0, "gauge": 2.0})
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    def test_other_files_are_ignored(self):
+        store = MmapValueStore(self.directory)
+        store.inc("requests")
+        for name in ("stray.db", "1-2-3.db", "worker-1.db", "12-abc.db"):
+            with open(os.path.join(self.directory, name), "wb") as file:
+                file.write(b"foreign")
+
+        self.assertEqual(store.read_all(is_gauge={"gauge"}.__contains__), {"requests": 1.0})
+        self.assertIn("stray.db", os.listdir(self.directory))
+
+    def test_file_grows_and_is_reopened(self):
+        store = MmapValueStore(self.directory)
+        for index in range(5000):
+            store.inc(f"key-{index}", index)
+
+        reopened = MmapValueStore(self.directory)
+        reopened.inc("key-4999")
+
+        totals = reopened.read_all()
+        self.assertEqual(len(totals), 5000)
+        self.assertEqual(totals["key-4999"], 5000.0)
+
+
+class MetricsViewTestCase(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(METRICS_ENABLED=True, METRICS_DIR=directory, METRICS_TOKEN="scraper"))
+        self.user = CustomUser.objects.create(
+            username="testuser",
+            password="testpassword123"
+        )
+
+    def get_metrics(self, token="scraper"):
+        return self.client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+
+    def test_requests_are_counted_per_route(self):
+        refresh_token = encode_refresh_token(self.user.id)
+        for _ in range(2):
+            self.client.post(
+                "/refresh-token/",
+                data=json.dumps({"refresh": refresh_token}),
+                content_type="application/json"
+            )
+        self.client.get("/no-such-page/")
+
+        response = self.get_metrics()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        content = response.content.decode()
+        self.assertIn('zone3000_http_requests_total{method="POST",route="refresh-token/",status="200"} 2', content)
+        self.assertIn('zone3000_http_requests_total{method="GET",route="unmatched",status="404"} 1', content)
+        self.assertIn(
+            'zone3000_http_request_duration_seconds_bucket{method="POST",route="refresh-token/",le="+Inf"} 2',
+            content,
+        )
+        self.assertIn('zone3000_http_request_duration_seconds_count{method="POST",route="refresh-token/"} 2', content)
+        self.assertIn("# TYPE zone3000_http_request_duration_seconds histogram", content)
+
+    def test_unknown_methods_share_a_label(self):
+        for method in ("BREW", "X" * 100):
+            self.client.generic(method, "/no-such-page/")
+
+        content = self.get_metrics().content.decode()
+
+        self.assertIn('zone3000_http_requests_total{method="other",route="unmatched",status="404"} 2', content)
+        self.assertNotIn("BREW", content)
+
+    def test_a_token_is_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.get_metrics("guess").status_code, 401)
+        with self.settings(METRICS_TOKEN=""):
+            self.assertEqual(self.get_metrics("").status_code, 404)
+
+    def test_cache_hit_ratio(self):
+        with mock.patch("common.metrics.collectors", [lambda: [
+            ("zone3000_cache_hits_total", {"cache": "test", "tier": "local"}, 3),
+            ("zone3000_cache_misses_total", {"cache": "test", "tier": "local"}, 1),
+        ]]):
+            collect(force=True)
+            content = self.get_metrics().content.decode()
+
+        self.assertIn('zone3000_cache_hit_ratio{cache="test",tier="local"} 0.75', content)
+
+    def test_new_database_connections_are_counted(self):
+        content = self.get_metrics().content.decode()
+
+        self.assertRegex(content, r'zone3000_db_connections_opened_total\{alias="default"\} [1-9]')
+
+    def test_metric_keys_do_not_depend_on_label_order(self):
+        self.assertEqual(metric_key("name", {"a": 1, "b": 2}), metric_key("name", {"b": 2, "a": 1}))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], DB_PRIMARY_STICKY_SECONDS=10)
+class PrimaryReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        self.assertEqual(RedirectRule.objects.all().db, "replica")
+        self.assertEqual(router.db_for_read(RedirectRule, primary=True), "default")
+        self.assertEqual(router.db_for_write(RedirectRule), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_everything_goes_to_primary_without_replicas(self):
+        self.assertEqual(RedirectRule.objects.all().db, "default")
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        with read_your_writes("user:1"):
+            self.assertEqual(RedirectRule.objects.all().db, "replica")
+            router.db_for_write(RedirectRule)
+            self.assertEqual(RedirectRule.objects.all().db, "default")
+
+        self.assertEqual(RedirectRule.objects.all().db, "replica")
+        self.assertTrue(is_pinned_to_primary("user:1"))
+        with read_your_writes("user:1"):
+            self.assertEqual(RedirectRule.objects.all().db, "default")
+        with read_your_writes("user:2"):
+            self.assertEqual(RedirectRule.objects.all().db, "replica")
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+            "pins": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pins"},
+        },
+        DB_PRIMARY_PIN_CACHE_ALIAS="pins",
+    )
+    def test_pins_are_kept_in_their_own_cache(self):
+        pin_to_primary("user:1")
+
+        self.assertTrue(is_pinned_to_primary("user:1"))
+        self.assertTrue(caches["pins"].get("db_primary_pin:user:1"))
+        self.assertIsNone(cache.get("db_primary_pin:user:1"))
+
+    def test_replicas_are_not_migrated(self):
+        replica_router = PrimaryReplicaRouter()
+
+        self.assertFalse(replica_router.allow_migrate("replica", "links"))
+        self.assertIsNone(replica_router.allow_migrate("default", "links"))
+
+    @override_settings(JWT_LAZY_USER=True)
+    def test_writes_through_authenticated_views_pin_the_user(self):
+        @jwt_access_required
+        def write_view(request):
+            router.db_for_write(RedirectRule)
+            return JsonResponse({})
+
+        token = encode_access_token(1, "testuser")
+        # A GET, so that the lazy user is not loaded from the database.
+        write_view(RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+        self.assertTrue(is_pinned_to_primary("user:1"))
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard_1", "shard_2"], DATABASE_REPLICAS=[])
+class ShardRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_keys_are_spread_over_all_shards(self):
+        shards = [shard_for_key(f"key{index}") for index in range(300)]
+
+        self.assertEqual(set(shards), {"default", "shard_1", "shard_2"})
+        self.assertEqual(shards, [shard_for_key(f"key{index}") for index in range(300)])
+
+    def test_instances_are_written_to_their_shard(self):
+        redirect_rule = RedirectRule(redirect_identifier="abc1234")
+
+        self.assertEqual(self.router.db_for_write(RedirectRule, instance=redirect_rule), shard_for_key("abc1234"))
+        self.assertEqual(self.router.db_for_read(RedirectRule, shard_key="abc1234"), shard_for_key("abc1234"))
+        self.assertIsNone(self.router.db_for_write(RedirectRule))
+        self.assertIsNone(self.router.db_for_write(CustomUser, instance=CustomUser(username="testuser")))
+
+    def test_users_of_sharded_rules_are_read_from_the_default_database(self):
+        redirect_rule = RedirectRule(redirect_identifier="abc1234")
+        redirect_rule._state.db = "shard_2"
+
+        self.assertEqual(router.db_for_read(RedirectRule, instance=redirect_rule), "shard_2")
+        self.assertEqual(router.db_for_read(CustomUser, instance=redirect_rule), "default")
+        self.assertTrue(router.allow_relation(redirect_rule, CustomUser(username="testuser")))
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_unsharded_models_are_left_to_the_next_router(self):
+        self.assertIsNone(self.router.db_for_write(RedirectRule, instance=RedirectRule(redirect_identifier="abc1234")))
+
+
+class ProfileStartupTestCase(SimpleTestCase):
+    def test_parse_import_times(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   django.utils",
+            "import time:       300 |        420 | django",
+            "Traceback-free noise",
+        ])
+
+        self.assertEqual(
+            list(parse_import_times(output)),
+            [("django.utils", 1, 120, 120), ("django", 0, 300, 420)],
+        )
+
+    def test_import_group(self):
+        apps = ["django.contrib.auth", "links"]
+
+        self.assertEqual(import_group("django.contrib.auth.hashers", apps), "django.contrib.auth")
+        self.assertEqual(import_group("links", apps), "links")
+        self.assertEqual(import_group("linksfoo.models", apps), "linksfoo")
+        self.assertEqual(import_group("django.db.models", apps), "django")
+
+    def test_report(self):
+        stdout = StringIO()
+        call_command("profile_startup", runs=1, top=3, stdout=stdout)
+
+        output = stdout.getvalue()
+        for phase in ("settings", "logging", "apps", "middleware", "urlconf", "process"):
+            self.assertIn(f"  {phase} ", output)
+        self.assertIn("    links ", output)
+
+
+class AsgiEntryPointTestCase(SimpleTestCase):
+    def start(self, module, **env):
+        """
+        Import ``module`` in a new interpreter, since the entry points configure the environment
+        before the settings load; return its ``CONN_MAX_AGE`` and what it logged.
+        """
+        environ = {key: value for key, value in os.environ.items() if key != "DB_CONN_MAX_AGE"}
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                f"import {module}; from django.conf import settings; print(settings.DATABASES['default']['CONN_MAX_AGE'])",
+            ],
+            cwd=settings.BASE_DIR,
+            env={
+                **environ,
+                "DJANGO_SETTINGS_MODULE": "zone3000.settings",
+                "DB_POOL": "False",
+                "CACHE_URL": "locmemcache://",
+                **env,
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return int(result.stdout.split()[-1]), result.stderr
+
+    def test_asgi_entry_points_do_not_keep_connections_by_default(self):
+        self.assertEqual(self.start("zone3000.wsgi")[0], 60)
+        self.assertEqual(self.start("zone3000.asgi"), (0, ""))
+        self.assertEqual(self.start("zone3000.redirect_asgi"), (0, ""))
+
+    def test_configured_conn_max_age_is_kept_with_a_warning(self):
+        for module in ("zone3000.asgi", "zone3000.redirect_asgi"):
+            with self.subTest(module=module):
+                conn_max_age, logged = self.start(module, DB_CONN_MAX_AGE="60")
+
+                self.assertEqual(conn_max_age, 60)
+                # Replicas and shards, when configured, share the default's setting.
+                self.assertRegex(logged, r"DB_CONN_MAX_AGE keeps the connections of default(, \w+)* open under ASGI")
+
+
+class SlimSettingsTestCase(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username="testuser", password="testpassword123")
+        self.auth_header = {"Authorization": f"Bearer {encode_access_token(self.user.id, self.user.username)}"}
+
+    @override_settings(ROOT_URLCONF="zone3000.api_urls", MIDDLEWARE=settings.REDIRECT_MIDDLEWARE)
+    def test_api_is_served_without_the_admin(self):
+        response = self.client.get("/url/redirect_rules", headers=self.auth_header)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/admin/")
+        self.assertEqual(response.status_code, 404)
@@ -1,8 +1,9 @@
-from django.contrib import admin
 from django.urls import path
 
-from common.views import RetrieveTokenView
+from common.views import MetricsView, RefreshTokenView, RetrieveTokenView
 
 urlpatterns = [
     path('retrieve-token/', RetrieveTokenView.as_view(), name='retrieve_token'),
+    path('refresh-token/', RefreshTokenView.as_view(), name='refresh_token'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,21 +1,23 @@
-import datetime
+import hmac
 import json
-import jwt
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import View
 
-from common.constatnts.constants import (
-    ACCESS_TYPE,
-    REFRESH_TYPE,
-    ACCESS_TOKEN_EXPIRY_MINUTES,
-    REFRESH_TOKEN_EXPIRY_HOURS,
+from common.api.tokens import (
+    InvalidRefreshToken,
+    decode_refresh_token,
+    encode_access_token,
+    encode_refresh_token,
 )
-from common.forms import RetrieveTokenForm
+from common.forms import RefreshTokenForm, RetrieveTokenForm
+from common.instrumentation import phase
+from common.metrics import render_metrics
+from custom_users.cache import get_cached_user
 from custom_users.models import CustomUser
-from zone3000.settings import JWT_ALGORITHM, JWT_SECRET
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -36,38 +38,14 @@ class RetrieveTokenView(BaseView):
             password = form.cleaned_data.get("password")
 
             user = CustomUser.objects.get(username=username)
-            if not user.check_password(password):
+            with phase("password"):
+                valid_password = user.check_password(password)
+            if not valid_password:
                 return JsonResponse({"error": "Invalid credentials"}, status=401)
 
-            access_token_expiry = datetime.datetime.now() + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRY_MINUTES)
-            refresh_token_expiry = datetime.datetime.now() + datetime.timedelta(days=REFRESH_TOKEN_EXPIRY_HOURS)
-
-            access_payload = {
-                "user_id": user.id,
-                "username": user.username,
-                "exp": access_token_expiry,
-                "type": ACCESS_TYPE
-            }
-            refresh_payload = {
-                "user_id": user.id,
-                "exp": refresh_token_expiry,
-                "type": REFRESH_TYPE
-            }
-
-            access_token = jwt.encode(
-                access_payload,
-                JWT_SECRET,
-                algorithm=JWT_ALGORITHM
-            )
-            refresh_token = jwt.encode(
-                refresh_payload,
-                JWT_SECRET,
-                algorithm=JWT_ALGORITHM
-            )
-
             return JsonResponse({
-                "access": access_token,
-                "refresh": refresh_token,
+                "access": encode_access_token(user.id, user.username),
+                "refresh": encode_refresh_token(user.id),
                 "username": user.username,
                 "user_id": user.id
             })
@@ -80,3 +58,58 @@ class RetrieveTokenView(BaseView):
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
+
+
+class RefreshTokenView(BaseView):
+    """
+    Exchange a refresh token for a new access token.
+
+    Unlike ``RetrieveTokenView`` this never hashes a password: the refresh token's signature
+    proves the login, and the only database work is a primary-key lookup of the username
+    (skipped when the user is in the JWT user cache).
+    """
+
+    @staticmethod
+    def post(request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+            form = RefreshTokenForm(data)
+            if not form.is_valid():
+                return JsonResponse({"errors": form.errors}, status=400)
+
+            payload = decode_refresh_token(form.cleaned_data.get("refresh"))
+            user_id = payload["user_id"]
+
+            user = get_cached_user(user_id)
+            if user is not None:
+                username = user.username
+            else:
+                username = CustomUser.objects.values_list("username", flat=True).get(id=user_id)
+
+            return JsonResponse({
+                "access": encode_access_token(user_id, username),
+                "username": username,
+                "user_id": user_id
+            })
+
+        except InvalidRefreshToken as e:
+            return JsonResponse({"error": str(e)}, status=401)
+
+        except CustomUser.DoesNotExist:
+            return JsonResponse({"error": "User not found"}, status=401)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
+
+
+class MetricsView(BaseView):
+    @staticmethod
+    def get(request, *args, **kwargs):
+        if not settings.METRICS_TOKEN:
+            return JsonResponse({"error": "Not found"}, status=404)
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+            return JsonResponse({"error": "Invalid metrics token"}, status=401)
+        return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _user_cache_key(user_id):
+    return f"jwt_user:{user_id}"
+
+
+def _user_from_claims(claims):
+    from custom_users.models import CustomUser
+
+    return CustomUser.from_claims(**claims)
+
+
+def _user_claims(user):
+    # Only non-secret fields are cached; the password hash stays in the database.
+    return {"user_id": user.id, "username": user.username}
+
+
+def get_cached_user(user_id):
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return None
+
+    claims = caches[settings.JWT_USER_CACHE_ALIAS].get(_user_cache_key(user_id))
+    if claims is None:
+        return None
+    return _user_from_claims(claims)
+
+
+async def aget_cached_user(user_id):
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return None
+
+    claims = await caches[settings.JWT_USER_CACHE_ALIAS].aget(_user_cache_key(user_id))
+    if claims is None:
+        return None
+    return _user_from_claims(claims)
+
+
+def cache_user(user):
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return
+
+    caches[settings.JWT_USER_CACHE_ALIAS].set(
+        _user_cache_key(user.id),
+        _user_claims(user),
+        settings.JWT_USER_CACHE_TTL,
+    )
+
+
+async def acache_user(user):
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return
+
+    await caches[settings.JWT_USER_CACHE_ALIAS].aset(
+        _user_cache_key(user.id),
+        _user_claims(user),
+        settings.JWT_USER_CACHE_TTL,
+    )
+
+
+def invalidate_user(user_id):
+    caches[settings.JWT_USER_CACHE_ALIAS].delete(_user_cache_key(user_id))
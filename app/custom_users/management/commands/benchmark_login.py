@@ -0,0 +1,88 @@
+import json
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from common.api.tokens import encode_refresh_token
+from common.views import RefreshTokenView, RetrieveTokenView
+from custom_users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query plan of the login username lookup and measure lookup, login and token refresh "
+        "throughput against a table of --users users. Users are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000000)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--lookups", type=int, default=10000)
+        parser.add_argument("--logins", type=int, default=20, help="Each login runs a full password hash.")
+        parser.add_argument("--refreshes", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        password = "benchmark-password"
+        # bulk_create skips the hashing pre_save signal, so store a ready-made hash once.
+        password_hash = make_password(password)
+        factory = RequestFactory()
+
+        with transaction.atomic():
+            started_at = time.perf_counter()
+            for start in range(0, options["users"], options["batch_size"]):
+                stop = min(start + options["batch_size"], options["users"])
+                CustomUser.objects.bulk_create(
+                    [CustomUser(username=f"benchmark-{index}", password=password_hash) for index in range(start, stop)]
+                )
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {CustomUser._meta.db_table}")
+            self.stdout.write(f"created {options['users']:,} users in {time.perf_counter() - started_at:.1f}s")
+
+            def random_username():
+                return f"benchmark-{random.randrange(options['users'])}"
+
+            plan = CustomUser.objects.filter(username=random_username()).explain()
+            self.stdout.write(f"query plan:\n{plan}")
+            self.stdout.write(f"username index used: {'yes' if 'index' in plan.lower() else 'NO'}")
+
+            usernames = [random_username() for _ in range(options["lookups"])]
+            elapsed = self.measure(lambda: [CustomUser.objects.get(username=username) for username in usernames])
+            self.stdout.write(f"lookup: {options['lookups'] / elapsed:,.0f}/s")
+
+            login_view = RetrieveTokenView.as_view()
+            requests = [
+                factory.post(
+                    "/retrieve-token/",
+                    json.dumps({"username": random_username(), "password": password}),
+                    content_type="application/json",
+                )
+                for _ in range(options["logins"])
+            ]
+            elapsed = self.measure(lambda: [login_view(request) for request in requests])
+            self.stdout.write(f"login: {options['logins'] / elapsed:,.1f}/s")
+
+            refresh_view = RefreshTokenView.as_view()
+            user_ids = list(CustomUser.objects.filter(username__in=usernames[:100]).values_list("id", flat=True))
+            requests = [
+                factory.post(
+                    "/refresh-token/",
+                    json.dumps({"refresh": encode_refresh_token(random.choice(user_ids))}),
+                    content_type="application/json",
+                )
+                for _ in range(options["refreshes"])
+            ]
+            elapsed = self.measure(lambda: [refresh_view(request) for request in requests])
+            self.stdout.write(f"refresh: {options['refreshes'] / elapsed:,.0f}/s")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(path):
+        started_at = time.perf_counter()
+        path()
+        return time.perf_counter() - started_at
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def rename_duplicate_usernames(apps, schema_editor):
+    """
+    Keep the oldest user of every duplicated username and rename the others to ``<username>-<id>``.
+
+    The renamed accounts keep their passwords and redirect rules; they just log in with the new name.
+    """
+    CustomUser = apps.get_model("custom_users", "CustomUser")
+    users = CustomUser.objects.using(schema_editor.connection.alias)
+    max_length = CustomUser._meta.get_field("username").max_length
+
+    duplicated = (
+        users.values("username")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .values_list("username", flat=True)
+    )
+    for username in duplicated.iterator():
+        user_ids = users.filter(username=username).order_by("id").values_list("id", flat=True)
+        for user_id in list(user_ids)[1:]:
+            suffix = f"-{user_id}"
+            new_username = username[:max_length - len(suffix)] + suffix
+            while users.filter(username=new_username).exists():
+                suffix = f"-{suffix}"
+                new_username = username[:max_length - len(suffix)] + suffix
+            users.filter(id=user_id).update(username=new_username)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_usernames, migrations.RunPython.noop),
+    ]
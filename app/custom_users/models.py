@@ -1,16 +1,36 @@
 from django.contrib.auth.hashers import check_password, make_password
-from django.db import models
-from django.db.models.signals import pre_save
+from django.db import models, router
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from custom_users.cache import invalidate_user
+
 
 class CustomUser(models.Model):
+    # Unique through Meta.constraints; see RedirectRule.redirect_identifier.
     username = models.CharField(max_length=100)
     password = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["username"], name="custom_users_username_uniq"),
+        ]
+
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_claims(cls, user_id, username=None):
+        """
+        Build a user from token claims without a query; any other field is loaded on first access.
+        """
+        field_names = ["id"]
+        values = [user_id]
+        if username is not None:
+            field_names.append("username")
+            values.append(username)
+        return cls.from_db(router.db_for_read(cls), field_names, values)
+
     def set_password(self, raw_password):
         self.password = make_password(raw_password)
         self._password = raw_password
@@ -32,3 +52,9 @@ class CustomUser(models.Model):
 @receiver(pre_save, sender=CustomUser)
 def password_hashing(sender, instance, **kwargs):
     instance.set_password(instance.password)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_cache_invalidate(sender, instance, **kwargs):
+    invalidate_user(instance.id)
@@ -1,3 +1,40 @@
-from django.test import TestCase
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
 
-# Create your tests here.
+from custom_users.models import CustomUser
+
+
+class CustomUserTests(TestCase):
+    def test_username_is_unique(self):
+        CustomUser.objects.create(username="testuser", password="testpassword123")
+
+        with self.assertRaises(IntegrityError):
+            CustomUser.objects.create(username="testuser", password="otherpassword")
+
+
+class DedupeUsernamesMigrationTests(TransactionTestCase):
+    before = [("custom_users", "0001_initial")]
+    after = [("custom_users", "0003_customuser_username_uniq")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_duplicates_are_renamed_before_the_constraint_is_added(self):
+        # Migrating back also unapplies the migrations of other apps; leave the schema complete for later tests.
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        apps = self.migrate(self.before)
+        OldCustomUser = apps.get_model("custom_users", "CustomUser")
+        first = OldCustomUser.objects.create(username="testuser", password="one")
+        second = OldCustomUser.objects.create(username="testuser", password="two")
+        other = OldCustomUser.objects.create(username="other", password="three")
+
+        self.migrate(self.after)
+
+        usernames = dict(CustomUser.objects.using(connection.alias).values_list("id", "username"))
+        self.assertEqual(usernames[first.id], "testuser")
+        self.assertEqual(usernames[second.id], f"testuser-{second.id}")
+        self.assertEqual(usernames[other.id], "other")
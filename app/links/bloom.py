@@ -0,0 +1,331 @@
+import datetime
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CREATED_VERSION_KEY = "redirect_identifier_filter:created_version"
+# Cache backends whose entries other worker processes cannot see.
+PROCESS_LOCAL_CACHES = ("LocMemCache", "DummyCache")
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings, sized for ``capacity`` items at the given false-positive rate.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = max(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.num_hashes = max(round(self.num_bits / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_usage(self):
+        return len(self.bits)
+
+    def estimated_error_rate(self):
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class RedirectIdentifierFilter:
+    """
+    Per-process Bloom filter of every ``redirect_identifier``, consulted before identifier lookups.
+
+    Until the first build finishes every identifier passes. Rules created in this process are added
+    through signals once committed. Rules created by other workers are picked up through a
+    shared-cache counter that every creation increments: when an identifier is absent and the
+    counter differs from the value read at the last sync, or is missing (evicted), it passes, and
+    rules created since then are loaded by a background thread, one sync at a time. The counter
+    holds no timestamps, so clocks of different hosts are never compared; only the ``created_at``
+    lookup of a sync goes ``sync_margin`` seconds further back. The counter only reaches other
+    workers through a cache they share, so the filter must not be used with a per-process cache
+    such as ``LocMemCache``. Deleted identifiers cannot be removed from a Bloom
+    filter, so they stay as false positives until the next rebuild. A rebuild runs every
+    ``rebuild_interval`` seconds, and earlier once deletions pass ``max_deleted_ratio`` or the
+    filter is over capacity.
+    """
+
+    def __init__(
+        self,
+        error_rate,
+        rebuild_interval,
+        sync_margin,
+        headroom=2.0,
+        min_capacity=100000,
+        max_deleted_ratio=0.1,
+        cache_alias="default",
+    ):
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.sync_margin = sync_margin
+        self.headroom = headroom
+        self.min_capacity = min_capacity
+        self.max_deleted_ratio = max_deleted_ratio
+        self.cache_alias = cache_alias
+        self.deleted = 0
+        self._filter = None
+        self._built_at = None
+        self._synced_at = None
+        self._synced_version = None
+        self._pending = None
+        self._rebuilding = False
+        self._syncing = False
+        self._pid = None
+        self._lock = threading.RLock()
+
+    @property
+    def ready(self):
+        return self._filter is not None and self._pid == os.getpid()
+
+    def build(self):
+        from links.models import RedirectRule
+
+        started_at = time.time()
+        version = self._created_version()
+        with self._lock:
+            self._pending = []
+
+        try:
+            querysets = RedirectRule.objects.shard_querysets(primary=True)
+            bloom_filter = BloomFilter(
+                capacity=max(sum(queryset.count() for queryset in querysets) * self.headroom, self.min_capacity),
+                error_rate=self.error_rate,
+            )
+            for queryset in querysets:
+                identifiers = queryset.values_list("redirect_identifier", flat=True)
+                for redirect_identifier in identifiers.iterator(chunk_size=10000):
+                    bloom_filter.add(redirect_identifier)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            for redirect_identifier in self._pending:
+                bloom_filter.add(redirect_identifier)
+            self._pending = None
+            self._filter = bloom_filter
+            self._built_at = time.monotonic()
+            self._synced_at = started_at
+            self._synced_version = version
+            self._pid = os.getpid()
+            self.deleted = 0
+
+        logger.info(
+            "Built redirect identifier filter: %d identifiers, %d bytes, %d hashes",
+            bloom_filter.count,
+            bloom_filter.memory_usage,
+            bloom_filter.num_hashes,
+        )
+        return bloom_filter
+
+    def start(self):
+        """
+        Build the filter in a background thread; lookups pass through until it is ready.
+        """
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="redirect-identifier-filter", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Failed to build the redirect identifier filter")
+        finally:
+            self._rebuilding = False
+            close_old_connections()
+
+    def _needs_rebuild(self, bloom_filter):
+        return (
+            time.monotonic() - self._built_at > self.rebuild_interval
+            or bloom_filter.count > bloom_filter.capacity
+            or self.deleted > bloom_filter.count * self.max_deleted_ratio
+        )
+
+    def add(self, redirect_identifier):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(redirect_identifier)
+            if self._pending is not None:
+                self._pending.append(redirect_identifier)
+
+    def discard(self, redirect_identifier):
+        with self._lock:
+            self.deleted += 1
+
+    def _is_stale(self, version):
+        # Without a counter nothing says no rules were created elsewhere: sync before rejecting.
+        return version is None or version != self._synced_version
+
+    def _created_version(self):
+        # Read before loading rules, so that creations committed meanwhile make the next miss sync
+        # again. A missing counter starts over at 0: the next lookups skip the sync until a rule is
+        # created.
+        cache = caches[self.cache_alias]
+        cache.add(CREATED_VERSION_KEY, 0, None)
+        return cache.get(CREATED_VERSION_KEY)
+
+    def might_contain(self, redirect_identifier):
+        if not self.ready:
+            if self._filter is not None:
+                # Inherited across a fork: rebuild in this process.
+                self.start()
+            return True
+
+        bloom_filter = self._filter
+        if self._needs_rebuild(bloom_filter):
+            self.start()
+        if redirect_identifier in bloom_filter:
+            return True
+
+        if not self._is_stale(caches[self.cache_alias].get(CREATED_VERSION_KEY)):
+            return False
+        # Possibly created elsewhere: the normal lookup answers while the filter catches up.
+        self.start_sync()
+        return True
+
+    async def amight_contain(self, redirect_identifier):
+        if not self.ready:
+            if self._filter is not None:
+                self.start()
+            return True
+
+        bloom_filter = self._filter
+        if self._needs_rebuild(bloom_filter):
+            self.start()
+        if redirect_identifier in bloom_filter:
+            return True
+
+        if not self._is_stale(await caches[self.cache_alias].aget(CREATED_VERSION_KEY)):
+            return False
+        self.start_sync()
+        return True
+
+    def start_sync(self):
+        """
+        Sync in a background thread, unless a sync of this process is already running.
+        """
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        threading.Thread(target=self._sync, name="redirect-identifier-filter-sync", daemon=True).start()
+
+    def _sync(self):
+        try:
+            self.sync()
+        except Exception:
+            logger.exception("Failed to sync the redirect identifier filter")
+        finally:
+            self._syncing = False
+            # The thread ends here, and with it the use of its connections.
+            connections.close_all()
+
+    def sync(self):
+        """
+        Add rules created (by any worker) since the last sync, with ``sync_margin`` seconds of overlap.
+        """
+        from links.models import RedirectRule
+
+        started_at = time.time()
+        version = self._created_version()
+        since = datetime.datetime.fromtimestamp(self._synced_at - self.sync_margin, tz=datetime.timezone.utc)
+        # Loaded without the lock, which signal handlers of the request threads take to add rules.
+        identifiers = [
+            redirect_identifier
+            for queryset in RedirectRule.objects.shard_querysets(primary=True)
+            for redirect_identifier in queryset.filter(created_at__gte=since).values_list("redirect_identifier", flat=True)
+        ]
+        with self._lock:
+            if self._filter is None:
+                return
+            for redirect_identifier in identifiers:
+                self._filter.add(redirect_identifier)
+            self._synced_at = started_at
+            self._synced_version = version
+
+    def mark_created(self, using=None):
+        """
+        Tell the other workers that rules were created, once the current transaction commits.
+        """
+        transaction.on_commit(self._bump_version, using=using)
+
+    def _bump_version(self):
+        try:
+            caches[self.cache_alias].incr(CREATED_VERSION_KEY)
+        except ValueError:
+            # Evicted: a missing counter already makes every worker sync.
+            pass
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._pid = None
+            self.deleted = 0
+
+    def stats(self):
+        bloom_filter = self._filter
+        if bloom_filter is None:
+            return {"ready": False}
+        return {
+            "ready": self.ready,
+            "count": bloom_filter.count,
+            "capacity": bloom_filter.capacity,
+            "bits": bloom_filter.num_bits,
+            "hashes": bloom_filter.num_hashes,
+            "memory_bytes": bloom_filter.memory_usage,
+            "error_rate": bloom_filter.error_rate,
+            "estimated_error_rate": bloom_filter.estimated_error_rate(),
+            "deleted_since_build": self.deleted,
+            "age_seconds": time.monotonic() - self._built_at,
+        }
+
+
+identifier_filter = RedirectIdentifierFilter(
+    error_rate=settings.REDIRECT_FILTER_ERROR_RATE,
+    rebuild_interval=settings.REDIRECT_FILTER_REBUILD_INTERVAL,
+    sync_margin=settings.REDIRECT_FILTER_SYNC_MARGIN,
+    cache_alias=settings.REDIRECT_RULE_CACHE_ALIAS,
+)
+
+
+def start_identifier_filter():
+    if not settings.REDIRECT_FILTER_ENABLED:
+        return
+    if caches[settings.REDIRECT_RULE_CACHE_ALIAS].__class__.__name__ in PROCESS_LOCAL_CACHES:
+        logger.warning(
+            "The redirect identifier filter uses the per-process cache %r: rules created by other "
+            "workers are rejected until the next rebuild. Configure a shared cache.",
+            settings.REDIRECT_RULE_CACHE_ALIAS,
+        )
+    identifier_filter.start()
@@ -0,0 +1,291 @@
+import hashlib
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+NOT_FOUND = "__redirect_rule_not_found__"
+# Left by a creation where its negative entry was, so that lookups which read the database before the
+# commit cannot cache the new rule as missing; it reads as a miss.
+CREATED = "__redirect_rule_created__"
+SAFE_KEY_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Bounded, thread-safe, per-process LRU cache whose entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key):
+        """
+        Return ``(found, value)`` so that cached ``None`` values can be told apart from misses.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return False, None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class RedirectRuleCache:
+    """
+    Two-tier cache for redirect rules keyed by identifier.
+
+    The local tier is a per-process ``LRUTTLCache`` holding found rules only. The shared tier
+    is a Django cache alias visible to every worker; it also remembers identifiers that do not
+    exist (with a shorter timeout), so repeated lookups of unknown identifiers skip the database.
+
+    Invalidation only reaches the local tier of the invalidating process directly. Once the
+    change is committed, it also replaces the shared generation token of the identifier's bucket,
+    one of ``generation_buckets``. Every process reads all tokens at most once per
+    ``generation_interval`` seconds, dropping the local entries of the buckets whose token changed:
+    local entries outlive a change elsewhere by that interval at most, and a change costs other
+    processes ``1 / generation_buckets`` of their local tier. Creations keep the tokens, since a
+    new identifier cannot be in any local tier.
+    """
+
+    def __init__(
+        self,
+        local,
+        alias,
+        timeout,
+        not_found_timeout,
+        key_prefix="redirect_rule",
+        generation_interval=1.0,
+        generation_buckets=64,
+    ):
+        self.local = local
+        self.alias = alias
+        self.timeout = timeout
+        self.not_found_timeout = not_found_timeout
+        self.key_prefix = key_prefix
+        self.generation_interval = generation_interval
+        self.generation_buckets = generation_buckets
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._generation_keys = [self.generation_key(bucket) for bucket in range(generation_buckets)]
+        self._generations = [None] * generation_buckets
+        self._generation_checked_at = None
+
+    def generation_key(self, bucket):
+        return f"{self.key_prefix}:generation:{bucket}"
+
+    def bucket(self, redirect_identifier):
+        return zlib.crc32(redirect_identifier.encode()) % self.generation_buckets
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def make_key(self, redirect_identifier):
+        if not SAFE_KEY_RE.fullmatch(redirect_identifier):
+            redirect_identifier = hashlib.md5(redirect_identifier.encode()).hexdigest()
+        return f"{self.key_prefix}:{redirect_identifier}"
+
+    def _generation_due(self):
+        if not self.local.enabled:
+            return False
+        now = time.monotonic()
+        if self._generation_checked_at is not None and now - self._generation_checked_at < self.generation_interval:
+            return False
+        self._generation_checked_at = now
+        return True
+
+    def _set_generations(self, tokens):
+        # Every invalidation writes a new token, so one that was evicted meanwhile is replaced, not missed.
+        generations = [tokens.get(key) for key in self._generation_keys]
+        changed = {
+            bucket for bucket, (old, new) in enumerate(zip(self._generations, generations)) if old != new
+        }
+        if len(changed) == self.generation_buckets:
+            self.local.clear()
+        elif changed:
+            self.local.delete_where(lambda redirect_identifier: self.bucket(redirect_identifier) in changed)
+        self._generations = generations
+
+    def get(self, redirect_identifier):
+        """
+        Return ``(found, redirect_rule)``; a found ``None`` means the identifier is known not to exist.
+        """
+        if self._generation_due():
+            self._set_generations(self.shared.get_many(self._generation_keys))
+        found, value = self.local.get(redirect_identifier)
+        if found:
+            return True, value
+
+        value = self.shared.get(self.make_key(redirect_identifier), _MISSING)
+        if value is _MISSING or value == CREATED:
+            self.shared_misses += 1
+            return False, None
+
+        self.shared_hits += 1
+        if value == NOT_FOUND:
+            return True, None
+
+        self.local.set(redirect_identifier, value)
+        return True, value
+
+    async def aget(self, redirect_identifier):
+        if self._generation_due():
+            self._set_generations(await self.shared.aget_many(self._generation_keys))
+        found, value = self.local.get(redirect_identifier)
+        if found:
+            return True, value
+
+        value = await self.shared.aget(self.make_key(redirect_identifier), _MISSING)
+        if value is _MISSING or value == CREATED:
+            self.shared_misses += 1
+            return False, None
+
+        self.shared_hits += 1
+        if value == NOT_FOUND:
+            return True, None
+
+        self.local.set(redirect_identifier, value)
+        return True, value
+
+    def set(self, redirect_identifier, redirect_rule):
+        key = self.make_key(redirect_identifier)
+        if redirect_rule is None:
+            if self.not_found_timeout > 0:
+                # Added, not set: see CREATED.
+                self.shared.add(key, NOT_FOUND, self.not_found_timeout)
+            return
+
+        self.local.set(redirect_identifier, redirect_rule)
+        if self.timeout > 0:
+            self.shared.set(key, redirect_rule, self.timeout)
+
+    async def aset(self, redirect_identifier, redirect_rule):
+        key = self.make_key(redirect_identifier)
+        if redirect_rule is None:
+            if self.not_found_timeout > 0:
+                await self.shared.aadd(key, NOT_FOUND, self.not_found_timeout)
+            return
+
+        self.local.set(redirect_identifier, redirect_rule)
+        if self.timeout > 0:
+            await self.shared.aset(key, redirect_rule, self.timeout)
+
+    def invalidate(self, redirect_identifier, created=False):
+        self.invalidate_many([redirect_identifier], created=created)
+
+    def invalidate_many(self, redirect_identifiers, created=False):
+        """
+        Forget ``redirect_identifiers``; ``created`` ones were unknown, so only negative entries can be stale.
+        """
+        redirect_identifiers = list(redirect_identifiers)
+        for redirect_identifier in redirect_identifiers:
+            self.local.delete(redirect_identifier)
+        self.shared.delete_many(list(map(self.make_key, redirect_identifiers)))
+        # A concurrent lookup may re-cache the old state before the change is committed.
+        transaction.on_commit(lambda: self._invalidate_shared(redirect_identifiers, created))
+
+    def _invalidate_shared(self, redirect_identifiers, created):
+        keys = list(map(self.make_key, redirect_identifiers))
+        if created and self.not_found_timeout > 0:
+            # Negative entries stored meanwhile are replaced, and later ones cannot be added for as long.
+            self.shared.set_many(dict.fromkeys(keys, CREATED), self.not_found_timeout)
+        else:
+            self.shared.delete_many(keys)
+        if self.local.enabled and not created:
+            # Any new value will do: other processes only compare it with the one they last read.
+            buckets = {self.bucket(redirect_identifier) for redirect_identifier in redirect_identifiers}
+            self.shared.set_many({self.generation_key(bucket): uuid.uuid4().hex for bucket in buckets}, None)
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        return {
+            "local": self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
+
+
+def _build_cache(key_prefix):
+    return RedirectRuleCache(
+        local=LRUTTLCache(
+            max_size=settings.REDIRECT_RULE_CACHE_MAX_SIZE,
+            ttl=settings.REDIRECT_RULE_CACHE_TTL,
+        ),
+        alias=settings.REDIRECT_RULE_CACHE_ALIAS,
+        timeout=settings.REDIRECT_RULE_SHARED_CACHE_TTL,
+        not_found_timeout=settings.REDIRECT_RULE_NOT_FOUND_CACHE_TTL,
+        key_prefix=key_prefix,
+        generation_interval=settings.REDIRECT_RULE_CACHE_GENERATION_INTERVAL,
+        generation_buckets=settings.REDIRECT_RULE_CACHE_GENERATION_BUCKETS,
+    )
+
+
+# Field values of whole rules (RedirectRuleManager._cached_values), for responses that serialize them.
+redirect_rule_cache = _build_cache("redirect_rule")
+# Lean RedirectTarget tuples, for the plain 302 redirect path.
+redirect_target_cache = _build_cache("redirect_target")
+redirect_caches = (redirect_rule_cache, redirect_target_cache)
@@ -0,0 +1,33 @@
+"""
+Filters and orders of the rule listing (``UrlListForm``).
+
+Every filter is backed by an index that starts with ``user``, because listings are always scoped
+to one user (see ``RedirectRule.Meta.indexes``):
+
+* ``created_after``/``created_before`` and the default order: ``(user, created_at, id)``;
+* ``modified_after``/``modified_before`` and ``modified_at`` order: ``(user, modified_at, id)``;
+* ``is_private``: ``(user, is_private, created_at, id)``;
+* ``host``: ``(user, redirect_host, created_at, id)``;
+* ``url_prefix``: ``(user, redirect_url)`` with ``varchar_pattern_ops`` on PostgreSQL.
+"""
+
+DEFAULT_ORDERING = "created_at"
+
+
+def filter_rules(queryset, cleaned_data):
+    """
+    Apply the listing filters of ``UrlListForm.cleaned_data`` to ``queryset``.
+    """
+    filters = {}
+    if cleaned_data.get("is_private") is not None:
+        filters["is_private"] = cleaned_data["is_private"]
+    for field in ("created", "modified"):
+        if cleaned_data.get(f"{field}_after"):
+            filters[f"{field}_at__gte"] = cleaned_data[f"{field}_after"]
+        if cleaned_data.get(f"{field}_before"):
+            filters[f"{field}_at__lt"] = cleaned_data[f"{field}_before"]
+    if cleaned_data.get("url_prefix"):
+        filters["redirect_url__startswith"] = cleaned_data["url_prefix"]
+    if cleaned_data.get("host"):
+        filters["redirect_host"] = cleaned_data["host"]
+    return queryset.filter(**filters)
@@ -8,4 +8,48 @@ class UrlsForm(forms.Form):
 
 class UrlsPatchForm(forms.Form):
     redirect_url = forms.URLField(required=False)
-    is_private = forms.BooleanField(required=False)
\ No newline at end of file
+    is_private = forms.BooleanField(required=False)
+
+
+class UrlListForm(forms.Form):
+    ORDERING_CHOICES = [
+        (ordering, ordering) for ordering in ("created_at", "-created_at", "modified_at", "-modified_at")
+    ]
+
+    cursor = forms.CharField(required=False)
+    page_size = forms.IntegerField(min_value=1, required=False)
+    stream = forms.BooleanField(required=False)
+    is_private = forms.NullBooleanField(required=False)
+    created_after = forms.DateTimeField(required=False)
+    created_before = forms.DateTimeField(required=False)
+    modified_after = forms.DateTimeField(required=False)
+    modified_before = forms.DateTimeField(required=False)
+    url_prefix = forms.CharField(required=False, max_length=200)
+    host = forms.CharField(required=False, max_length=255)
+    ordering = forms.ChoiceField(choices=ORDERING_CHOICES, required=False)
+
+    def clean_host(self):
+        return self.cleaned_data["host"].lower()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field in ("created", "modified"):
+            after = cleaned_data.get(f"{field}_after")
+            before = cleaned_data.get(f"{field}_before")
+            if after and before and after >= before:
+                raise forms.ValidationError(f"{field}_after must be before {field}_before")
+        return cleaned_data
+
+
+class UrlStatsForm(forms.Form):
+    start = forms.DateTimeField(required=False)
+    end = forms.DateTimeField(required=False)
+    granularity = forms.ChoiceField(choices=[("minute", "minute"), ("hour", "hour")], required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+        if start and end and start >= end:
+            raise forms.ValidationError("start must be before end")
+        return cleaned_data
@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+IDENTIFIER_LENGTH = 7
+IDENTIFIER_SPACE = len(BASE62_ALPHABET) ** IDENTIFIER_LENGTH
+# Coprime with IDENTIFIER_SPACE, so multiplying by it permutes the identifier space and
+# consecutive sequence values don't produce guessable neighbouring identifiers.
+SCRAMBLE_MULTIPLIER = 2654435761
+SCRAMBLE_INVERSE = pow(SCRAMBLE_MULTIPLIER, -1, IDENTIFIER_SPACE)
+SEQUENCE_NAME = "redirect_identifier"
+# What the allocators generate, or the first 10 characters of a uuid4() that identifiers used to be.
+IDENTIFIER_RE = re.compile(rf"[{BASE62_ALPHABET}]{{{IDENTIFIER_LENGTH}}}|[0-9a-f-]{{10}}")
+
+
+class IdentifierSpaceExhausted(Exception):
+    pass
+
+
+def encode_base62(number, length=IDENTIFIER_LENGTH):
+    chars = []
+    while number:
+        number, remainder = divmod(number, 62)
+        chars.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(chars)).rjust(length, BASE62_ALPHABET[0])
+
+
+def is_valid_identifier(value):
+    return isinstance(value, str) and IDENTIFIER_RE.fullmatch(value) is not None
+
+
+def identifier_from_value(value):
+    if not 0 <= value < IDENTIFIER_SPACE:
+        raise IdentifierSpaceExhausted(value)
+    return encode_base62(value * SCRAMBLE_MULTIPLIER % IDENTIFIER_SPACE)
+
+
+def value_from_identifier(redirect_identifier):
+    """
+    The sequence value that ``identifier_from_value`` turns into ``redirect_identifier``, or ``None`` if none does.
+    """
+    if len(redirect_identifier) != IDENTIFIER_LENGTH or not set(redirect_identifier) <= set(BASE62_ALPHABET):
+        return None
+    number = 0
+    for char in redirect_identifier:
+        number = number * 62 + BASE62_ALPHABET.index(char)
+    return number * SCRAMBLE_INVERSE % IDENTIFIER_SPACE
+
+
+def reserved_sequence_end(name=SEQUENCE_NAME):
+    """
+    The first value of the ``name`` sequence that has not been reserved yet.
+    """
+    from links.models import IdentifierSequence
+
+    database = router.db_for_write(IdentifierSequence)
+    return IdentifierSequence.objects.using(database).filter(name=name).values_list("last_value", flat=True).first() or 0
+
+
+def reserve_sequence_range(name, count):
+    """
+    Atomically advance the ``name`` sequence by ``count`` and return the reserved values.
+    """
+    from links.models import IdentifierSequence
+
+    # Read back on the primary: a replica may not have the update yet.
+    database = router.db_for_write(IdentifierSequence)
+    sequences = IdentifierSequence.objects.using(database)
+    with transaction.atomic(using=database):
+        updated = sequences.filter(name=name).update(last_value=F("last_value") + count)
+        if not updated:
+            sequences.get_or_create(name=name)
+            sequences.filter(name=name).update(last_value=F("last_value") + count)
+        last_value = sequences.filter(name=name).values_list("last_value", flat=True).get()
+    return range(last_value - count, last_value)
+
+
+class SequenceIdentifierAllocator:
+    """
+    Base62 identifiers from a database sequence: one round trip per ``allocate``/``allocate_many`` call.
+
+    Values are never handed out twice, so identifiers are unique without collision checks.
+    """
+
+    def __init__(self, sequence_name=SEQUENCE_NAME):
+        self.sequence_name = sequence_name
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        return [identifier_from_value(value) for value in self._reserve(count)]
+
+    def _reserve(self, count):
+        return reserve_sequence_range(self.sequence_name, count)
+
+
+class BlockIdentifierAllocator(SequenceIdentifierAllocator):
+    """
+    Reserves ``block_size`` sequence values at a time and hands them out from memory,
+    so a worker only touches the database once per block.
+    """
+
+    def __init__(self, sequence_name=SEQUENCE_NAME, block_size=1000):
+        super().__init__(sequence_name)
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._block = iter(())
+        self._remaining = 0
+
+    def _reserve(self, count):
+        with self._lock:
+            # A block reserved before a fork must not be shared by the child processes.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._block = iter(())
+                self._remaining = 0
+
+            values = []
+            while len(values) < count:
+                if not self._remaining:
+                    block = reserve_sequence_range(self.sequence_name, max(self.block_size, count - len(values)))
+                    self._block = iter(block)
+                    self._remaining = len(block)
+                take = min(self._remaining, count - len(values))
+                values.extend(next(self._block) for _ in range(take))
+                self._remaining -= take
+            return values
+
+
+@lru_cache(maxsize=None)
+def get_identifier_allocator():
+    allocator_class = import_string(settings.REDIRECT_IDENTIFIER_ALLOCATOR)
+    if issubclass(allocator_class, BlockIdentifierAllocator):
+        return allocator_class(block_size=settings.REDIRECT_IDENTIFIER_BLOCK_SIZE)
+    return allocator_class()
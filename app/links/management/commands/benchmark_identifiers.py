@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from links.identifiers import BlockIdentifierAllocator
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure redirect identifier allocation throughput with concurrent writers. "
+        "Values are taken from a separate sequence, so real identifiers are not consumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--allocator", default="links.identifiers.BlockIdentifierAllocator")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--count", type=int, default=10000, help="Identifiers per thread.")
+        parser.add_argument("--block-size", type=int, default=1000)
+        parser.add_argument("--sequence", default="benchmark")
+
+    def handle(self, *args, **options):
+        allocator_class = import_string(options["allocator"])
+        results = [None] * options["threads"]
+        errors = []
+
+        def writer(index):
+            # Each thread stands in for a separate worker process with its own allocator and connection.
+            if issubclass(allocator_class, BlockIdentifierAllocator):
+                allocator = allocator_class(options["sequence"], block_size=options["block_size"])
+            else:
+                allocator = allocator_class(options["sequence"])
+            try:
+                results[index] = [allocator.allocate() for _ in range(options["count"])]
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(options["threads"])]
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+
+        if errors:
+            raise CommandError(f"{len(errors)} writer(s) failed: {errors[0]}")
+
+        identifiers = [identifier for result in results for identifier in result]
+        duplicates = len(identifiers) - len(set(identifiers))
+        self.stdout.write(
+            f"{options['allocator']}: {len(identifiers)} identifiers from {options['threads']} writers "
+            f"in {elapsed:.3f}s ({len(identifiers) / elapsed:,.0f}/s), {duplicates} duplicates"
+        )
+        if duplicates:
+            raise CommandError("Duplicate identifiers were allocated")
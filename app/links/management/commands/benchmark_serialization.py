@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import JsonResponse
+
+from custom_users.models import CustomUser
+from links.models import RedirectRule
+from links.serializers import redirect_rule_rows, serialize_redirect_rule_row
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of the as_dict() listing path with the values()-based serializer, "
+        "from query to encoded JSON. Test rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomUser(username="benchmark-serialization", password="!")
+            user.save()
+            RedirectRule.objects.bulk_create_rules(
+                [
+                    RedirectRule(user=user, redirect_url=f"https://example.com/{index}", is_private=bool(index % 2))
+                    for index in range(options["rows"])
+                ],
+                batch_size=1000,
+            )
+            queryset = RedirectRule.objects.filter(user=user)
+
+            def as_dict_path():
+                return JsonResponse(
+                    [redirect_rule.as_dict() for redirect_rule in queryset.select_related("user")],
+                    safe=False,
+                ).content
+
+            def serializer_path():
+                return JsonResponse(
+                    [serialize_redirect_rule_row(row) for row in redirect_rule_rows(queryset)],
+                    safe=False,
+                ).content
+
+            results = {}
+            for name, path in (("as_dict", as_dict_path), ("serializer", serializer_path)):
+                best = min(self.measure(path) for _ in range(options["repeat"]))
+                results[name] = options["rows"] / best
+                self.stdout.write(f"{name}: {results[name]:,.0f} rows/s (best of {options['repeat']})")
+
+            self.stdout.write(f"speedup: {results['serializer'] / results['as_dict']:.2f}x")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(path):
+        started_at = time.perf_counter()
+        path()
+        return time.perf_counter() - started_at
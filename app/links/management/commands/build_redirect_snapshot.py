@@ -0,0 +1,48 @@
+import datetime
+import os
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from links.models import RedirectRule, RedirectRuleDeletion
+from links.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile all public redirect rules into the memory-mapped snapshot file served by "
+        "PublicRedirectView and swap it in atomically. Run it periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.REDIRECT_SNAPSHOT_PATH)
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("Set REDIRECT_SNAPSHOT_PATH or pass --path")
+
+        # Rules changed after this moment are picked up by the workers' overlay.
+        built_at = time.time()
+        started_at = time.perf_counter()
+        rows = chain.from_iterable(
+            queryset
+            .filter(is_private=False)
+            .values_list("redirect_identifier", "id", "redirect_url")
+            .iterator(chunk_size=options["chunk_size"])
+            for queryset in RedirectRule.objects.shard_querysets(primary=True)
+        )
+        count = write_snapshot(path, rows, built_at)
+
+        # Deletions before the build are in the new snapshot; workers reload it before their next sync.
+        pruned_before = datetime.datetime.fromtimestamp(built_at - settings.REDIRECT_SNAPSHOT_SYNC_MARGIN, tz=datetime.timezone.utc)
+        for queryset in RedirectRule.objects.shard_querysets(primary=True):
+            RedirectRuleDeletion.objects.using(queryset.db).filter(deleted_at__lt=pruned_before).delete()
+
+        self.stdout.write(
+            f"Wrote {count} redirect rules to {path} "
+            f"({os.path.getsize(path):,} bytes) in {time.perf_counter() - started_at:.2f}s"
+        )
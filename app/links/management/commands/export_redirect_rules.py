@@ -0,0 +1,79 @@
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from custom_users.models import CustomUser
+from links.models import RedirectRule
+from links.transfer import (
+    EXPORT_ROW_VALUES,
+    EXPORT_VALUES,
+    FORMATS,
+    copy_to,
+    detect_format,
+    export_sql,
+    merge_export_rows,
+    supports_copy,
+    write_header,
+    write_rows,
+)
+from zone3000.db_routers import is_sharded
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream redirect rules to a JSON Lines or CSV file ('-' for stdout), oldest first. "
+        "CSV exports from an unsharded PostgreSQL database use COPY; everything else is read "
+        "in --chunk-size chunks and merged across DATABASE_SHARDS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to csv for *.csv paths, jsonl otherwise.")
+        parser.add_argument("--user", help="Only export the rules of this username.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or detect_format(path)
+        querysets = [queryset.order_by("created_at", "id") for queryset in RedirectRule.objects.shard_querysets()]
+        if options["user"]:
+            try:
+                user_id = CustomUser.objects.values_list("id", flat=True).get(username=options["user"])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist") from None
+            querysets = [queryset.filter(user_id=user_id) for queryset in querysets]
+
+        started_at = time.perf_counter()
+        output = nullcontext(sys.stdout) if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        with output as file:
+            connection = connections[querysets[0].db]
+            if format == "csv" and supports_copy(connection) and not is_sharded():
+                with connection.cursor() as cursor:
+                    count = copy_to(cursor, *export_sql(querysets[0].values_list(*EXPORT_VALUES), connection), file)
+            else:
+                count = self.write_chunks(querysets, file, format, options)
+
+        # Progress and the summary go to stderr, which keeps stdout usable for the data.
+        if options["verbosity"]:
+            self.stderr.write(f"Exported {count} redirect rules to {path} in {time.perf_counter() - started_at:.2f}s")
+
+    def write_chunks(self, querysets, file, format, options):
+        chunk_size = options["chunk_size"]
+        rows = merge_export_rows([
+            queryset.values_list(*EXPORT_ROW_VALUES).iterator(chunk_size=chunk_size) for queryset in querysets
+        ])
+        write_header(file, format)
+        count = 0
+        while chunk := list(islice(rows, chunk_size)):
+            # Users are looked up per chunk: with DATABASE_SHARDS they are not in the rules' database.
+            user_ids = {row[-1] for row in chunk if row[-1] is not None}
+            usernames = dict(CustomUser.objects.filter(id__in=user_ids).values_list("id", "username"))
+            write_rows([(*row[:-1], usernames.get(row[-1])) for row in chunk], file, format)
+            count += len(chunk)
+            if options["verbosity"] > 1:
+                self.stderr.write(f"Exported {count} redirect rules")
+        return count
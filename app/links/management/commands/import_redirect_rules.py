@@ -0,0 +1,139 @@
+import json
+import sys
+import time
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, router
+
+from custom_users.models import CustomUser
+from links.forms import UrlsForm
+from links.identifiers import IDENTIFIER_LENGTH, is_valid_identifier, reserved_sequence_end, value_from_identifier
+from links.models import RedirectRule
+from links.transfer import FORMATS, InvalidRow, detect_format, parse_boolean, read_rows, supports_copy
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream redirect rules from a JSON Lines or CSV file ('-' for stdin), as written by "
+        "export_redirect_rules. Rows need redirect_url; is_private, username and redirect_identifier "
+        "are optional, other columns are ignored. Each --batch-size chunk is committed on its own, "
+        "with COPY on PostgreSQL and bulk_create elsewhere. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to csv for *.csv paths, jsonl otherwise.")
+        parser.add_argument("--user", help="Assign every rule to this username instead of the rows' username.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--keep-identifiers",
+            action="store_true",
+            help=(
+                "Keep the rows' redirect_identifier so existing short links keep working. "
+                "Identifiers that the allocator has not generated yet are rejected, since it would "
+                "generate them again later."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or detect_format(path)
+        user_id = None
+        if options["user"]:
+            try:
+                user_id = CustomUser.objects.values_list("id", flat=True).get(username=options["user"])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist") from None
+
+        if supports_copy(connections[router.db_for_write(RedirectRule)]):
+            create_rules = RedirectRule.objects.copy_rules
+        else:
+            create_rules = partial(RedirectRule.objects.bulk_create_rules, batch_size=options["batch_size"])
+
+        # Sequence values at or past this one may still be allocated; so may the rest of blocks that
+        # workers reserved but have not used up, which only identifiers of other deployments can hit.
+        reserved_end = reserved_sequence_end() if options["keep_identifiers"] else None
+
+        started_at = time.perf_counter()
+        imported = skipped = 0
+        source = nullcontext(sys.stdin) if path == "-" else open(path, newline="", encoding="utf-8")
+        with source as file:
+            rows = read_rows(file, format)
+            while chunk := list(islice(rows, options["batch_size"])):
+                redirect_rules = self.build_rules(chunk, user_id, reserved_end)
+                skipped += len(chunk) - len(redirect_rules)
+                try:
+                    if redirect_rules:
+                        create_rules(redirect_rules)
+                except IntegrityError as e:
+                    raise CommandError(
+                        f"Lines {chunk[0][0]}-{chunk[-1][0]} were not imported: {e}. "
+                        f"{imported} rules from earlier lines were imported."
+                    ) from e
+                imported += len(redirect_rules)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Imported {imported} redirect rules")
+
+        self.stdout.write(
+            f"Imported {imported} redirect rules from {path}, skipped {skipped} invalid rows "
+            f"in {time.perf_counter() - started_at:.2f}s"
+        )
+
+    def build_rules(self, chunk, user_id, reserved_end):
+        """
+        Rules of the valid rows of ``chunk``; identifiers are kept unless ``reserved_end`` is ``None``.
+        """
+        users = {}
+        if user_id is None:
+            usernames = {row["username"] for _, row in chunk if row and isinstance(row.get("username"), str)}
+            users = dict(CustomUser.objects.filter(username__in=usernames).values_list("username", "id"))
+
+        # UrlsForm's own field: building a form per row would deep-copy its fields every time.
+        url_field = UrlsForm.base_fields["redirect_url"]
+        redirect_rules = []
+        for line_number, row in chunk:
+            try:
+                redirect_url, is_private, redirect_identifier, username = self.clean_row(
+                    row, users, user_id, reserved_end, url_field,
+                )
+            except InvalidRow as e:
+                self.stderr.write(f"Line {line_number}: {json.dumps(e.args[0])}")
+                continue
+
+            redirect_rules.append(RedirectRule(
+                user_id=user_id if user_id is not None else users.get(username),
+                redirect_url=redirect_url,
+                is_private=is_private,
+                redirect_identifier=redirect_identifier,
+            ))
+        return redirect_rules
+
+    def clean_row(self, row, users, user_id, reserved_end, url_field):
+        if row is None:
+            raise InvalidRow({"__all__": ["Expected a JSON object"]})
+
+        try:
+            redirect_url = url_field.clean(row.get("redirect_url"))
+        except ValidationError as e:
+            raise InvalidRow({"redirect_url": e.messages}) from None
+        is_private = parse_boolean(row.get("is_private"))
+
+        redirect_identifier = ""
+        if reserved_end is not None:
+            redirect_identifier = row.get("redirect_identifier")
+            if not is_valid_identifier(redirect_identifier):
+                raise InvalidRow({"redirect_identifier": [f"Expected {IDENTIFIER_LENGTH} base62 characters"]})
+            value = value_from_identifier(redirect_identifier)
+            if value is not None and value >= reserved_end:
+                raise InvalidRow({"redirect_identifier": ["Not generated here yet, so it would be generated again"]})
+
+        username = row.get("username")
+        if username is not None and not isinstance(username, str):
+            raise InvalidRow({"username": ["Expected a string"]})
+        if user_id is None and username and username not in users:
+            raise InvalidRow({"username": [f"User {username!r} does not exist"]})
+        return redirect_url, is_private, redirect_identifier, username
@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from links.cache import redirect_caches
+from links.models import RedirectRule
+from zone3000.db_routers import shard_for_key
+
+
+class Command(BaseCommand):
+    help = (
+        "Move redirect rules to the DATABASE_SHARDS alias that owns their identifier, e.g. after "
+        "shards were added. Rules are copied before they are deleted from their old shard, so an "
+        "interrupted run leaves duplicates that the next run removes; lookups only see the owner's copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        moved = 0
+        for source in settings.DATABASE_SHARDS:
+            rules = RedirectRule.objects.using(source).order_by("pk")
+            last_pk = None
+            while True:
+                batch = list((rules.filter(pk__gt=last_pk) if last_pk else rules)[:options["batch_size"]])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                by_shard = {}
+                for redirect_rule in batch:
+                    shard = shard_for_key(redirect_rule.redirect_identifier)
+                    if shard != source:
+                        by_shard.setdefault(shard, []).append(redirect_rule)
+                for shard, shard_rules in by_shard.items():
+                    timestamps = [(rule.created_at, rule.modified_at) for rule in shard_rules]
+                    # Plain copies and deletes: the rules themselves do not change, so no signals are sent,
+                    # which would count the copies as new rules and delete the hit rollups of the originals.
+                    with transaction.atomic(using=shard):
+                        RedirectRule.objects.using(shard).bulk_create(shard_rules, ignore_conflicts=True)
+                        # bulk_create fills the auto_now(_add) fields with the current time; put the originals back.
+                        for redirect_rule, (created_at, modified_at) in zip(shard_rules, timestamps):
+                            redirect_rule.created_at, redirect_rule.modified_at = created_at, modified_at
+                        RedirectRule.objects.using(shard).bulk_update(
+                            shard_rules, ["created_at", "modified_at"], batch_size=1000,
+                        )
+                    RedirectRule.objects.using(source).filter(pk__in=[rule.pk for rule in shard_rules])._raw_delete(source)
+                    # Lookups only ask the owning shard, so they may have cached the rules as missing,
+                    # but not as found: to the caches, the rules are new.
+                    redirect_identifiers = [rule.redirect_identifier for rule in shard_rules]
+                    for cache in redirect_caches:
+                        cache.invalidate_many(redirect_identifiers, created=True)
+                    moved += len(shard_rules)
+
+            self.stdout.write(f"{source}: done, {moved} redirect rules moved so far")
+
+        self.stdout.write(f"Moved {moved} redirect rules in {time.perf_counter() - started_at:.2f}s")
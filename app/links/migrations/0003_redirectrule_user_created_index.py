@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0001_initial'),
+        ('links', '0002_redirectrule_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='redirectrule',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='links_rule_user_created_idx'),
+        ),
+    ]
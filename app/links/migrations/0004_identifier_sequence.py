@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+def create_identifier_sequence(apps, schema_editor):
+    IdentifierSequence = apps.get_model("links", "IdentifierSequence")
+    IdentifierSequence.objects.using(schema_editor.connection.alias).get_or_create(name="redirect_identifier")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0001_initial'),
+        ('links', '0003_redirectrule_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_identifier_sequence, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='redirectrule',
+            name='redirect_identifier',
+            field=models.CharField(editable=False, max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='redirectrule',
+            constraint=models.UniqueConstraint(fields=('redirect_identifier',), name='links_rule_identifier_uniq'),
+        ),
+    ]
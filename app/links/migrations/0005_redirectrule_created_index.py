@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0001_initial'),
+        ('links', '0004_identifier_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='redirectrule',
+            index=models.Index(fields=['created_at'], name='links_rule_created_idx'),
+        ),
+    ]
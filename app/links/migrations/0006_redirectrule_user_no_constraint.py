@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from common.operations import AlterFieldOnShards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0003_customuser_username_uniq'),
+        ('links', '0005_redirectrule_created_index'),
+    ]
+
+    operations = [
+        # Users only exist in the default database: the shards cannot keep the constraint.
+        AlterFieldOnShards(
+            model_name='redirectrule',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='redirect_rules', to='custom_users.customuser'),
+        ),
+    ]
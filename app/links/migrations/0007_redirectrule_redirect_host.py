@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_users', '0003_customuser_username_uniq'),
+        ('links', '0006_redirectrule_user_no_constraint'),
+    ]
+
+    operations = [
+        # A constant default: no table rewrite on PostgreSQL 11+; 0008 fills in existing rows.
+        migrations.AddField(
+            model_name='redirectrule',
+            name='redirect_host',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
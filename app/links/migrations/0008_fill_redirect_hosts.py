@@ -0,0 +1,39 @@
+from urllib.parse import urlsplit
+
+from django.db import migrations, transaction
+
+
+def fill_redirect_hosts(apps, schema_editor):
+    """
+    Set ``redirect_host`` of existing rules, ``batch_size`` rows per transaction, so row locks are
+    held briefly. Rules saved meanwhile already have it; an interrupted run resumes where it stopped.
+    """
+    RedirectRule = apps.get_model("links", "RedirectRule")
+    alias = schema_editor.connection.alias
+    rules = RedirectRule.objects.using(alias).filter(redirect_host="").only("id", "redirect_url").order_by("id")
+    batch_size = 5000
+    last_id = None
+    while True:
+        batch = list((rules.filter(id__gt=last_id) if last_id else rules)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for redirect_rule in batch:
+            try:
+                redirect_rule.redirect_host = (urlsplit(redirect_rule.redirect_url).hostname or "")[:255]
+            except ValueError:
+                redirect_rule.redirect_host = ""
+        with transaction.atomic(using=alias):
+            RedirectRule.objects.using(alias).bulk_update(batch, ["redirect_host"])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('links', '0007_redirectrule_redirect_host'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_redirect_hosts, migrations.RunPython.noop),
+    ]
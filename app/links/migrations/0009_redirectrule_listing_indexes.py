@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from common.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('custom_users', '0003_customuser_username_uniq'),
+        ('links', '0008_fill_redirect_hosts'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='redirectrule',
+            index=models.Index(fields=['user', 'modified_at', 'id'], name='links_rule_user_modified_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='redirectrule',
+            index=models.Index(fields=['user', 'is_private', 'created_at', 'id'], name='links_rule_user_private_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='redirectrule',
+            index=models.Index(fields=['user', 'redirect_host', 'created_at', 'id'], name='links_rule_user_host_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='redirectrule',
+            index=models.Index(fields=['user', 'redirect_url'], name='links_rule_user_url_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+from common.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('links', '0009_redirectrule_listing_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='redirectrule',
+            index=models.Index(fields=['modified_at'], name='links_rule_modified_idx'),
+        ),
+    ]
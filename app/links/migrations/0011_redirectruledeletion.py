@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0010_redirectrule_modified_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedirectRuleDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('redirect_identifier', models.CharField(max_length=10)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at'], name='links_deletion_deleted_idx')],
+            },
+        ),
+    ]
@@ -1,23 +1,285 @@
+import copy
 import uuid
+from collections import namedtuple
+from functools import partial
+from urllib.parse import urlsplit
 
-from django.db.models.signals import pre_save
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from custom_users.models import CustomUser
+from links.bloom import identifier_filter
+from links.cache import redirect_caches, redirect_rule_cache, redirect_target_cache
+from links.identifiers import get_identifier_allocator
+from links.signals import redirect_rules_bulk_created
+from links.snapshot import redirect_snapshot
+from zone3000.db_routers import (
+    ais_pinned_to_primary,
+    is_pinned_to_primary,
+    is_sharded,
+    pin_to_primary,
+    shard_for_key,
+)
+
+
+def generate_redirect_identifier():
+    return get_identifier_allocator().allocate()
+
+
+def generate_redirect_identifiers(count):
+    return get_identifier_allocator().allocate_many(count)
+
+
+# The only fields a plain redirect needs.
+RedirectTarget = namedtuple("RedirectTarget", ["id", "redirect_url", "is_private"])
+
+# What redirect_rule_cache keeps of a rule, plus the owner's username: plain values rather than a
+# pickled instance, so that the owner's password hash never reaches the shared cache.
+CACHED_RULE_FIELDS = (
+    "id",
+    "created_at",
+    "modified_at",
+    "redirect_url",
+    "redirect_host",
+    "is_private",
+    "redirect_identifier",
+    "user_id",
+)
+
+
+def rule_pin_key(redirect_identifier):
+    return f"redirect_rule:{redirect_identifier}"
+
+
+def url_host(url):
+    try:
+        return (urlsplit(url).hostname or "")[:255]
+    except ValueError:
+        return ""
+
+
+class IdentifierSequence(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
 
 
 class RedirectRuleManager(models.Manager):
+    def shard_querysets(self, primary=False):
+        """
+        One queryset per ``DATABASE_SHARDS`` alias, or a single one when rules are not sharded.
+
+        ``primary`` reads the unsharded table from the primary instead of a replica.
+        """
+        if is_sharded():
+            return [self.using(shard) for shard in settings.DATABASE_SHARDS]
+        if primary:
+            return [self.using(router.db_for_read(self.model, primary=True))]
+        return [self.all()]
+
+    def _by_shard(self, redirect_rules):
+        if not is_sharded():
+            return {router.db_for_write(self.model): redirect_rules}
+        by_shard = {}
+        for redirect_rule in redirect_rules:
+            by_shard.setdefault(shard_for_key(redirect_rule.redirect_identifier), []).append(redirect_rule)
+        return by_shard
+
+    def _with_user(self):
+        # The users table is not on the shards, so the user is loaded by a second query there.
+        return self.prefetch_related("user") if is_sharded() else self.select_related("user")
+
     def get_by_id(self, redirect_rule_id, user):
+        """
+        Get one of ``user``'s rules; with sharding, the shards are asked in turn since ids carry no shard.
+        """
+        for queryset in self.shard_querysets():
+            try:
+                redirect_rule = queryset.get(id=redirect_rule_id, user=user)
+                break
+            except RedirectRule.DoesNotExist:
+                continue
+        else:
+            return None
+        # Matched on user, so reuse it instead of loading it again on access.
+        redirect_rule.user = user
+        return redirect_rule
+
+    def _is_valid_identifier(self, redirect_identifier):
+        return len(redirect_identifier) <= self.model._meta.get_field("redirect_identifier").max_length
+
+    def _get_by_identifier(self, queryset, redirect_identifier):
+        """
+        Get a rule from a replica, or from the primary when it changed recently or is not replicated yet.
+
+        The fallback means unknown identifiers are looked up twice; the identifier filter and the
+        negative cache keep that off the hot path. Sharded rules are read from the owning shard.
+        """
+        if is_sharded():
+            return queryset.using(shard_for_key(redirect_identifier)).get(redirect_identifier=redirect_identifier)
+
+        primary = router.db_for_read(self.model, primary=True)
+        if queryset.db != primary and is_pinned_to_primary(rule_pin_key(redirect_identifier)):
+            queryset = queryset.using(primary)
+        try:
+            return queryset.get(redirect_identifier=redirect_identifier)
+        except RedirectRule.DoesNotExist:
+            if queryset.db == primary:
+                raise
+            return queryset.using(primary).get(redirect_identifier=redirect_identifier)
+
+    async def _aget_by_identifier(self, queryset, redirect_identifier):
+        if is_sharded():
+            return await queryset.using(shard_for_key(redirect_identifier)).aget(redirect_identifier=redirect_identifier)
+
+        primary = router.db_for_read(self.model, primary=True)
+        if queryset.db != primary and await ais_pinned_to_primary(rule_pin_key(redirect_identifier)):
+            queryset = queryset.using(primary)
         try:
-            return self.get(id=redirect_rule_id, user=user)
+            return await queryset.aget(redirect_identifier=redirect_identifier)
         except RedirectRule.DoesNotExist:
+            if queryset.db == primary:
+                raise
+            return await queryset.using(primary).aget(redirect_identifier=redirect_identifier)
+
+    @staticmethod
+    def _cached_values(redirect_rule):
+        if redirect_rule is None:
             return None
+        values = {name: getattr(redirect_rule, name) for name in CACHED_RULE_FIELDS}
+        values["username"] = redirect_rule.user.username if redirect_rule.user_id is not None else None
+        values["database"] = redirect_rule._state.db
+        return values
+
+    def _from_cached_values(self, values):
+        """
+        Rebuild a cached rule; its user has the id and username, and loads any other field on access.
+        """
+        if values is None:
+            return None
+        values = dict(values)
+        username = values.pop("username")
+        redirect_rule = self.model.from_db(values.pop("database"), list(values), list(values.values()))
+        if redirect_rule.user_id is not None:
+            redirect_rule.user = CustomUser.from_claims(redirect_rule.user_id, username)
+        return redirect_rule
 
     def get_by_identifier(self, redirect_identifier):
+        if not self._is_valid_identifier(redirect_identifier):
+            return None
+
+        found, values = redirect_rule_cache.get(redirect_identifier)
+        if found:
+            return self._from_cached_values(values)
+
         try:
-            return self.get(redirect_identifier=redirect_identifier)
+            redirect_rule = self._get_by_identifier(self._with_user(), redirect_identifier)
         except RedirectRule.DoesNotExist:
+            redirect_rule = None
+
+        redirect_rule_cache.set(redirect_identifier, self._cached_values(redirect_rule))
+        return redirect_rule
+
+    async def aget_by_identifier(self, redirect_identifier):
+        if not self._is_valid_identifier(redirect_identifier):
             return None
 
+        found, values = await redirect_rule_cache.aget(redirect_identifier)
+        if found:
+            return self._from_cached_values(values)
+
+        try:
+            redirect_rule = await self._aget_by_identifier(self._with_user(), redirect_identifier)
+        except RedirectRule.DoesNotExist:
+            redirect_rule = None
+
+        await redirect_rule_cache.aset(redirect_identifier, self._cached_values(redirect_rule))
+        return redirect_rule
+
+    def get_redirect_target(self, redirect_identifier):
+        if not self._is_valid_identifier(redirect_identifier):
+            return None
+
+        found, redirect_target = redirect_target_cache.get(redirect_identifier)
+        if found:
+            return redirect_target
+
+        try:
+            redirect_target = RedirectTarget(
+                *self._get_by_identifier(self.values_list(*RedirectTarget._fields), redirect_identifier)
+            )
+        except RedirectRule.DoesNotExist:
+            redirect_target = None
+
+        redirect_target_cache.set(redirect_identifier, redirect_target)
+        return redirect_target
+
+    async def aget_redirect_target(self, redirect_identifier):
+        if not self._is_valid_identifier(redirect_identifier):
+            return None
+
+        found, redirect_target = await redirect_target_cache.aget(redirect_identifier)
+        if found:
+            return redirect_target
+
+        try:
+            redirect_target = RedirectTarget(
+                *await self._aget_by_identifier(self.values_list(*RedirectTarget._fields), redirect_identifier)
+            )
+        except RedirectRule.DoesNotExist:
+            redirect_target = None
+
+        await redirect_target_cache.aset(redirect_identifier, redirect_target)
+        return redirect_target
+
+    def _prepare_bulk(self, redirect_rules):
+        # What RedirectRule.save() would fill in, with identifiers allocated in one go.
+        missing = [redirect_rule for redirect_rule in redirect_rules if not redirect_rule.redirect_identifier]
+        for redirect_rule, redirect_identifier in zip(missing, generate_redirect_identifiers(len(missing))):
+            redirect_rule.redirect_identifier = redirect_identifier
+        for redirect_rule in redirect_rules:
+            redirect_rule.redirect_host = url_host(redirect_rule.redirect_url)
+
+    def bulk_create_rules(self, redirect_rules, batch_size):
+        """
+        Insert ``redirect_rules`` in one transaction per shard, ``batch_size`` rows per INSERT.
+
+        ``bulk_create`` skips the model signals, so identifiers are generated here and
+        ``redirect_rules_bulk_created`` is sent instead of ``post_save``.
+        """
+        self._prepare_bulk(redirect_rules)
+
+        for database, shard_rules in self._by_shard(redirect_rules).items():
+            with transaction.atomic(using=database):
+                for start in range(0, len(shard_rules), batch_size):
+                    self.using(database).bulk_create(shard_rules[start:start + batch_size])
+
+        redirect_rules_bulk_created.send(sender=self.model, instances=redirect_rules)
+        return redirect_rules
+
+    def copy_rules(self, redirect_rules):
+        """
+        Like ``bulk_create_rules``, but streams the rows to PostgreSQL with one ``COPY ... FROM STDIN`` per shard.
+        """
+        from links.transfer import copy_from, copy_rules_sql, rules_csv_buffer
+
+        self._prepare_bulk(redirect_rules)
+        now = timezone.now()
+        for redirect_rule in redirect_rules:
+            redirect_rule.created_at = redirect_rule.modified_at = now
+
+        for database, shard_rules in self._by_shard(redirect_rules).items():
+            connection = connections[database]
+            with transaction.atomic(using=database), connection.cursor() as cursor:
+                copy_from(cursor, copy_rules_sql(self.model, connection), rules_csv_buffer(shard_rules))
+            for redirect_rule in shard_rules:
+                redirect_rule._state.adding = False
+                redirect_rule._state.db = database
+        redirect_rules_bulk_created.send(sender=self.model, instances=redirect_rules)
+        return redirect_rules
+
 
 class RedirectRule(models.Model):
     objects = RedirectRuleManager()
@@ -26,21 +288,61 @@ class RedirectRule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
     redirect_url = models.URLField()
+    # Lowercased host of redirect_url, kept by save() for the listing's host filter.
+    redirect_host = models.CharField(max_length=255, blank=True, default="", editable=False)
     is_private = models.BooleanField(default=False)
+    # Uniqueness comes from a constraint rather than unique=True, which on Postgres would also
+    # build an unused varchar_pattern_ops index next to the unique one.
     redirect_identifier = models.CharField(
         max_length=10,
-        unique=True,
         editable=False,
-        db_index=True,
     )
+    # Only the shards besides default, where the users table stays empty, drop the constraint
+    # (migration 0006); rules on those are deleted with their user by redirect_rules_delete_sharded.
     user = models.ForeignKey(
         "custom_users.CustomUser",
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name="redirect_rules",
         null=True,
         blank=True,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["redirect_identifier"], name="links_rule_identifier_uniq"),
+        ]
+        indexes = [
+            # The listing's default order and created_at range.
+            models.Index(fields=["user", "created_at", "id"], name="links_rule_user_created_idx"),
+            # Backs the identifier filter's "created since" sync query.
+            models.Index(fields=["created_at"], name="links_rule_created_idx"),
+            # Backs the redirect snapshot's "modified since" refresh query.
+            models.Index(fields=["modified_at"], name="links_rule_modified_idx"),
+            # Listing filters and orders, see links.filters.
+            models.Index(fields=["user", "modified_at", "id"], name="links_rule_user_modified_idx"),
+            models.Index(fields=["user", "is_private", "created_at", "id"], name="links_rule_user_private_idx"),
+            models.Index(fields=["user", "redirect_host", "created_at", "id"], name="links_rule_user_host_idx"),
+            # Pattern ops, so that PostgreSQL can use the index for LIKE 'prefix%' under any collation.
+            models.Index(
+                fields=["user", "redirect_url"],
+                name="links_rule_user_url_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Assigned before saving, so that the router can pick the shard that owns the identifier.
+        if not self.redirect_identifier:
+            self.redirect_identifier = generate_redirect_identifier()
+        self.redirect_host = url_host(self.redirect_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "redirect_url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "redirect_host"}
+        if is_sharded():
+            kwargs["using"] = shard_for_key(self.redirect_identifier)
+        super().save(*args, **kwargs)
+
     def as_dict(self):
         return {
             "id": self.id,
@@ -53,7 +355,90 @@ class RedirectRule(models.Model):
         }
 
 
-@receiver(pre_save, sender=RedirectRule)
-def redirect_identifier_pre_save(sender, instance, **kwargs):
-    if not instance.redirect_identifier:
-        instance.redirect_identifier = str(uuid.uuid4())[:10]
+class RedirectRuleDeletion(models.Model):
+    """
+    Identifier of a deleted rule, stored next to it so that snapshot refreshes of every worker mask it.
+
+    Written while ``REDIRECT_SNAPSHOT_LOG_DELETIONS`` is set; rows older than the current snapshot
+    are pruned by ``build_redirect_snapshot``.
+    """
+
+    redirect_identifier = models.CharField(max_length=10)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at"], name="links_deletion_deleted_idx"),
+        ]
+
+
+@receiver(pre_delete, sender="custom_users.CustomUser")
+def redirect_rules_delete_sharded(sender, instance, **kwargs):
+    # The cascade only reaches rules in the user's own database.
+    for shard in settings.DATABASE_SHARDS:
+        if shard != instance._state.db:
+            RedirectRule.objects.using(shard).filter(user_id=instance.id).delete()
+
+
+@receiver(post_save, sender=RedirectRule)
+@receiver(post_delete, sender=RedirectRule)
+def redirect_rule_cache_invalidate(sender, instance, created=False, **kwargs):
+    for cache in redirect_caches:
+        cache.invalidate(instance.redirect_identifier, created=created)
+    # Until replicas catch up, lookups of this rule must not re-cache its old state.
+    pin_to_primary(rule_pin_key(instance.redirect_identifier))
+
+
+@receiver(redirect_rules_bulk_created, sender=RedirectRule)
+def redirect_rule_cache_invalidate_bulk(sender, instances, **kwargs):
+    redirect_identifiers = [instance.redirect_identifier for instance in instances]
+    for cache in redirect_caches:
+        cache.invalidate_many(redirect_identifiers, created=True)
+    pin_to_primary(*map(rule_pin_key, redirect_identifiers))
+
+
+@receiver(post_save, sender=RedirectRule)
+def redirect_identifier_filter_add(sender, instance, created, using, **kwargs):
+    if created:
+        # Once committed, like the counter: a rolled-back rule would stay as a false positive.
+        transaction.on_commit(partial(identifier_filter.add, instance.redirect_identifier), using=using)
+        identifier_filter.mark_created(using=using)
+
+
+@receiver(post_delete, sender=RedirectRule)
+def redirect_identifier_filter_discard(sender, instance, **kwargs):
+    identifier_filter.discard(instance.redirect_identifier)
+
+
+@receiver(redirect_rules_bulk_created, sender=RedirectRule)
+def redirect_identifier_filter_add_bulk(sender, instances, **kwargs):
+    def add():
+        for instance in instances:
+            identifier_filter.add(instance.redirect_identifier)
+
+    transaction.on_commit(add)
+    identifier_filter.mark_created()
+
+
+@receiver(post_save, sender=RedirectRule)
+def redirect_snapshot_update(sender, instance, using, **kwargs):
+    # Once committed, with the values saved now: a rolled-back save must not reach the overlay.
+    transaction.on_commit(partial(redirect_snapshot.update, copy.copy(instance)), using=using)
+
+
+@receiver(post_delete, sender=RedirectRule)
+def redirect_snapshot_remove(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(redirect_snapshot.remove, instance.redirect_identifier), using=using)
+    # Part of the deleting transaction, on the rule's own database. Only build_redirect_snapshot
+    # prunes the rows, so none are written unless some worker serves a snapshot.
+    if settings.REDIRECT_SNAPSHOT_LOG_DELETIONS:
+        RedirectRuleDeletion.objects.using(instance._state.db).create(redirect_identifier=instance.redirect_identifier)
+
+
+@receiver(redirect_rules_bulk_created, sender=RedirectRule)
+def redirect_snapshot_update_bulk(sender, instances, **kwargs):
+    def update():
+        for instance in instances:
+            redirect_snapshot.update(instance)
+
+    transaction.on_commit(update)
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import datetime
+import heapq
+import uuid
+from itertools import islice
+from operator import itemgetter
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, redirect_rule_id):
+    raw = f"{value.isoformat()}|{redirect_rule_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, redirect_rule_id = raw.split("|")
+        return datetime.datetime.fromisoformat(value), uuid.UUID(redirect_rule_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_queryset(queryset, cursor=None, ordering="created_at"):
+    """
+    Order by ``(field, id)``, descending for a ``-field`` ``ordering``, and keep only rows after the cursor.
+
+    A cursor is only meaningful with the ordering (and filters) of the page that returned it.
+    """
+    field = ordering.lstrip("-")
+    descending = ordering.startswith("-")
+    queryset = queryset.order_by(ordering, "-id" if descending else "id")
+    if cursor:
+        value, redirect_rule_id = decode_cursor(cursor)
+        after = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{after}": value}) | Q(**{field: value, f"id__{after}": redirect_rule_id})
+        )
+    return queryset
+
+
+def keyset_key(ordering="created_at"):
+    return itemgetter(ordering.lstrip("-"), "id")
+
+
+def merge_keyset(iterables, ordering="created_at"):
+    """
+    Merge rows that are each already in keyset ``ordering``, e.g. one stream per shard.
+    """
+    if len(iterables) == 1:
+        return iter(iterables[0])
+    return heapq.merge(*iterables, key=keyset_key(ordering), reverse=ordering.startswith("-"))
+
+
+def keyset_rows(querysets, cursor=None, chunk_size=2000, ordering="created_at"):
+    """
+    Stream the rows of all ``querysets`` after ``cursor`` in keyset order, reading each in chunks.
+    """
+    return merge_keyset(
+        [keyset_queryset(queryset, cursor, ordering).iterator(chunk_size=chunk_size) for queryset in querysets],
+        ordering,
+    )
+
+
+def keyset_page(querysets, page_size, cursor=None, ordering="created_at"):
+    """
+    Return one page of the merged ``querysets`` (``values()`` querysets, one per shard) and the opaque
+    cursor of the next page (``None`` on the last one).
+    """
+    pages = [list(keyset_queryset(queryset, cursor, ordering)[:page_size + 1]) for queryset in querysets]
+    items = list(islice(merge_keyset(pages, ordering), page_size + 1))
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    return items, encode_cursor(items[-1][ordering.lstrip("-")], items[-1]["id"])
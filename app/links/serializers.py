@@ -0,0 +1,74 @@
+"""
+JSON-ready serialization of redirect rules.
+
+Rules are rendered to plain ``str``/``bool``/``None`` values up front, so the JSON encoder never
+has to fall back to ``DjangoJSONEncoder.default`` for UUIDs and datetimes. Listing views read
+``REDIRECT_RULE_VALUES`` straight from ``QuerySet.values()`` and skip model instances entirely.
+The output matches ``RedirectRule.as_dict()`` encoded by ``JsonResponse``.
+"""
+
+from django.db.models import Value
+
+REDIRECT_RULE_VALUES = (
+    "id",
+    "created_at",
+    "modified_at",
+    "redirect_url",
+    "is_private",
+    "redirect_identifier",
+    "user_id",
+    "user__username",
+)
+
+
+def format_datetime(value):
+    # Same output as DjangoJSONEncoder: millisecond precision and "Z" for UTC.
+    result = value.isoformat()
+    if value.microsecond:
+        result = result[:23] + result[26:]
+    if result.endswith("+00:00"):
+        result = result[:-6] + "Z"
+    return result
+
+
+def serialize_user(user):
+    return {
+        "username": user.username,
+    }
+
+
+def serialize_redirect_rule(redirect_rule):
+    return {
+        "id": str(redirect_rule.id),
+        "created_at": format_datetime(redirect_rule.created_at),
+        "modified_at": format_datetime(redirect_rule.modified_at),
+        "redirect_url": redirect_rule.redirect_url,
+        "is_private": redirect_rule.is_private,
+        "redirect_identifier": redirect_rule.redirect_identifier,
+        "user": serialize_user(redirect_rule.user) if redirect_rule.user_id is not None else None,
+    }
+
+
+def serialize_redirect_rule_row(row):
+    return {
+        "id": str(row["id"]),
+        "created_at": format_datetime(row["created_at"]),
+        "modified_at": format_datetime(row["modified_at"]),
+        "redirect_url": row["redirect_url"],
+        "is_private": row["is_private"],
+        "redirect_identifier": row["redirect_identifier"],
+        "user": {"username": row["user__username"]} if row["user_id"] is not None else None,
+    }
+
+
+def redirect_rule_rows(queryset):
+    return queryset.values(*REDIRECT_RULE_VALUES)
+
+
+def user_redirect_rule_rows(queryset, user):
+    """
+    ``redirect_rule_rows`` of a queryset of ``user``'s rules, with the known username selected as a
+    constant instead of joined; the join would also find no users on the ``DATABASE_SHARDS`` besides
+    the default one.
+    """
+    return queryset.values(*REDIRECT_RULE_VALUES[:-1], user__username=Value(user.username))
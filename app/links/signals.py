@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with ``instances`` after rules are inserted by ``RedirectRuleManager.bulk_create_rules``,
+# which bypasses the ``pre_save``/``post_save`` signals.
+redirect_rules_bulk_created = Signal()
@@ -0,0 +1,316 @@
+import datetime
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from array import array
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"ZRS2"
+# magic, slot count, entry count, build start (epoch seconds), slot table offset
+_HEADER = struct.Struct("<4sIIdQ")
+# crc32 of the identifier, record offset
+_SLOT = struct.Struct("<IQ")
+_URL_LENGTH = struct.Struct("<H")
+_MISSING = object()
+
+
+class InvalidSnapshot(ValueError):
+    pass
+
+
+def _slot_count(entry_count):
+    # Power of two with a load factor of at most 0.5, so probe sequences stay short.
+    slot_count = 8
+    while slot_count < entry_count * 2:
+        slot_count *= 2
+    return slot_count
+
+
+def write_snapshot(path, rows, built_at):
+    """
+    Write ``(redirect_identifier, id, redirect_url)`` rows to ``path`` as an open-addressing hash table.
+
+    Layout: header, then one record per rule (identifier length and bytes, 16-byte id, URL length
+    and bytes), then the slot table of ``(crc32, record offset)`` pairs. Records are streamed to
+    disk; only the 8-byte slot entries are kept in memory. The file is written next to ``path``
+    and moved into place with ``os.replace``, so readers only ever see complete snapshots.
+    """
+    hashes = array("I")
+    offsets = array("Q")
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(bytes(_HEADER.size))
+            offset = _HEADER.size
+            for redirect_identifier, redirect_rule_id, redirect_url in rows:
+                identifier = redirect_identifier.encode()
+                url = redirect_url.encode()
+                record = b"".join((
+                    bytes((len(identifier),)),
+                    identifier,
+                    redirect_rule_id.bytes,
+                    _URL_LENGTH.pack(len(url)),
+                    url,
+                ))
+                file.write(record)
+                hashes.append(zlib.crc32(identifier))
+                offsets.append(offset)
+                offset += len(record)
+
+            slot_count = _slot_count(len(offsets))
+            mask = slot_count - 1
+            slots = bytearray(slot_count * _SLOT.size)
+            for entry_hash, entry_offset in zip(hashes, offsets):
+                slot = entry_hash & mask
+                while _SLOT.unpack_from(slots, slot * _SLOT.size)[1]:
+                    slot = (slot + 1) & mask
+                _SLOT.pack_into(slots, slot * _SLOT.size, entry_hash, entry_offset)
+            file.write(slots)
+
+            file.seek(0)
+            file.write(_HEADER.pack(SNAPSHOT_MAGIC, slot_count, len(offsets), built_at, offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return len(offsets)
+
+
+class SnapshotTable:
+    """
+    Read-only view of one snapshot file, shared between processes through the page cache.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.stat = os.fstat(file.fileno())
+            if self.stat.st_size < _HEADER.size:
+                raise InvalidSnapshot(f"{path} is too small to be a redirect snapshot")
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.entry_count, self.built_at, self.slots_offset = _HEADER.unpack_from(self.mmap)
+        if magic != SNAPSHOT_MAGIC:
+            raise InvalidSnapshot(f"{path} is not a redirect snapshot")
+        self.mask = self.slot_count - 1
+
+    def get(self, redirect_identifier):
+        """
+        Return ``(redirect_rule_id, redirect_url)``, or ``None`` if the identifier is not in the snapshot.
+        """
+        identifier = redirect_identifier.encode()
+        entry_hash = zlib.crc32(identifier)
+        data = self.mmap
+        slot = entry_hash & self.mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(data, self.slots_offset + slot * _SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == entry_hash and data[offset + 1:offset + 1 + data[offset]] == identifier:
+                offset += 1 + data[offset]
+                redirect_rule_id = uuid.UUID(bytes=data[offset:offset + 16])
+                url_length = _URL_LENGTH.unpack_from(data, offset + 16)[0]
+                return redirect_rule_id, data[offset + 18:offset + 18 + url_length].decode()
+            slot = (slot + 1) & self.mask
+
+
+def changed_rules(queryset, since):
+    """
+    Rules modified since ``since``, as ``(redirect_identifier, id, redirect_url, is_private)`` rows.
+    """
+    return queryset.filter(modified_at__gte=since).values_list("redirect_identifier", "id", "redirect_url", "is_private")
+
+
+def deleted_identifiers(querysets, since):
+    """
+    Identifiers of rules deleted since ``since`` from the databases of ``querysets``.
+    """
+    from links.models import RedirectRuleDeletion
+
+    return {
+        redirect_identifier
+        for queryset in querysets
+        for redirect_identifier in RedirectRuleDeletion.objects.using(queryset.db)
+        .filter(deleted_at__gte=since)
+        .values_list("redirect_identifier", flat=True)
+    }
+
+
+class RedirectSnapshot:
+    """
+    Public redirect targets from a snapshot file, corrected by an in-memory overlay of later changes.
+
+    Every ``refresh_interval`` seconds a background thread, started by the first lookup of each
+    process, checks whether the file was replaced (and maps the new one) and loads rules modified
+    since the last refresh, with ``sync_margin`` seconds of overlap, into the overlay. Until the
+    first refresh, and while the file is missing, every lookup misses and falls through to the
+    database. Deleted rules are read from their ``RedirectRuleDeletion`` rows the same way, so every
+    change, deletions included, reaches all workers within one refresh interval. Changes made in
+    this process apply as soon as they are committed.
+    """
+
+    def __init__(self, path, refresh_interval, sync_margin):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.sync_margin = sync_margin
+        self.hits = 0
+        self.misses = 0
+        self._table = None
+        self._overlay = {}
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refresher_pid = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def get(self, redirect_identifier):
+        """
+        Return ``(found, RedirectTarget or None)``; a found ``None`` means the rule is private or deleted.
+        """
+        if self._refresher_pid != os.getpid():
+            self.start()
+        return self._lookup(redirect_identifier)
+
+    async def aget(self, redirect_identifier):
+        # Never waits for the database: refreshes happen in the background thread.
+        return self.get(redirect_identifier)
+
+    def start(self):
+        """
+        Start the refresher thread of the current process; a forked child starts its own on first lookup.
+        """
+        with self._start_lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            threading.Thread(target=self._run, name="redirect-snapshot-refresher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self._checked_at + self.refresh_interval - time.monotonic(), 0))
+            self.refresh()
+            close_old_connections()
+
+    def _lookup(self, redirect_identifier):
+        from links.models import RedirectTarget
+
+        target = self._overlay.get(redirect_identifier, _MISSING)
+        if target is _MISSING:
+            table = self._table
+            target = table.get(redirect_identifier) if table is not None else None
+            if target is None:
+                self.misses += 1
+                return False, None
+
+        self.hits += 1
+        if target is None:
+            return True, None
+        return True, RedirectTarget(target[0], target[1], False)
+
+    def refresh(self):
+        if not self._lock.acquire(blocking=False):
+            # Another thread is refreshing; keep serving the current state meanwhile.
+            return
+        try:
+            self._checked_at = time.monotonic()
+            self._reload()
+            if self._table is not None:
+                self._sync()
+        except Exception:
+            # Keep serving the current snapshot and overlay; the next refresh retries.
+            logger.exception("Failed to refresh the redirect snapshot %s", self.path)
+        finally:
+            self._lock.release()
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Nothing syncs the overlay without a snapshot, so it would go stale; lookups fall through.
+            self._table = None
+            self._overlay = {}
+            self._synced_at = None
+            return
+
+        table = self._table
+        if table is not None and (table.stat.st_ino, table.stat.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns):
+            return
+
+        self._table = SnapshotTable(self.path)
+        # The overlay is relative to the previous snapshot; rebuild it from the new build time.
+        self._overlay = {}
+        self._synced_at = self._table.built_at
+
+    def _sync(self):
+        from links.models import RedirectRule
+
+        started_at = time.time()
+        since = datetime.datetime.fromtimestamp(self._synced_at - self.sync_margin, tz=datetime.timezone.utc)
+        querysets = RedirectRule.objects.shard_querysets()
+        overlay = {}
+        for queryset in querysets:
+            changed = changed_rules(queryset, since).iterator(chunk_size=2000)
+            for redirect_identifier, redirect_rule_id, redirect_url, is_private in changed:
+                overlay[redirect_identifier] = None if is_private else (redirect_rule_id, redirect_url)
+
+        # A deleted identifier may be in use again, e.g. by a rule moved to another shard.
+        deleted = [
+            redirect_identifier
+            for redirect_identifier in deleted_identifiers(querysets, since)
+            if redirect_identifier not in overlay
+        ]
+        for start in range(0, len(deleted), 1000):
+            chunk = deleted[start:start + 1000]
+            existing = set()
+            for queryset in querysets:
+                existing.update(queryset.filter(redirect_identifier__in=chunk).values_list("redirect_identifier", flat=True))
+            overlay.update((redirect_identifier, None) for redirect_identifier in chunk if redirect_identifier not in existing)
+
+        self._overlay.update(overlay)
+        self._synced_at = started_at
+
+    def update(self, redirect_rule):
+        """
+        Apply a change made in this process to the overlay right away.
+        """
+        if self.enabled:
+            target = None if redirect_rule.is_private else (redirect_rule.id, redirect_rule.redirect_url)
+            self._overlay[redirect_rule.redirect_identifier] = target
+
+    def remove(self, redirect_identifier):
+        if self.enabled:
+            self._overlay[redirect_identifier] = None
+
+    def stats(self):
+        table = self._table
+        return {
+            "path": self.path,
+            "loaded": table is not None,
+            "entries": table.entry_count if table is not None else 0,
+            "size_bytes": table.stat.st_size if table is not None else 0,
+            "built_at": table.built_at if table is not None else None,
+            "overlay": len(self._overlay),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+redirect_snapshot = RedirectSnapshot(
+    path=settings.REDIRECT_SNAPSHOT_PATH,
+    refresh_interval=settings.REDIRECT_SNAPSHOT_REFRESH_INTERVAL,
+    sync_margin=settings.REDIRECT_SNAPSHOT_SYNC_MARGIN,
+)
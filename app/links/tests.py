@@ -1,14 +1,60 @@
+import datetime
+import importlib
+import itertools
 import json
 import jwt
+import os
+import tempfile
+import time
+import uuid
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-from django.test import TestCase
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import JsonResponse
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
 
+from common.api.streaming import stream_json_array
+from common.api.tokens import encode_access_token
 from zone3000.settings import JWT_SECRET, JWT_ALGORITHM
+from common.testing import AllDatabasesTestMixin
 from custom_users.models import CustomUser
-from links.models import RedirectRule
+from links.bloom import CREATED_VERSION_KEY, BloomFilter, RedirectIdentifierFilter, start_identifier_filter
+from links.cache import LRUTTLCache, RedirectRuleCache, redirect_rule_cache, redirect_target_cache
+from links.identifiers import (
+    BlockIdentifierAllocator,
+    IDENTIFIER_LENGTH,
+    IDENTIFIER_SPACE,
+    SequenceIdentifierAllocator,
+    encode_base62,
+    get_identifier_allocator,
+    identifier_from_value,
+    value_from_identifier,
+)
+from links.models import IdentifierSequence, RedirectRule, RedirectRuleDeletion, rule_pin_key
+from links.filters import filter_rules
+from links.forms import UrlListForm
+from links.pagination import keyset_key, keyset_queryset, merge_keyset
+from links.snapshot import _SLOT, RedirectSnapshot, SnapshotTable, changed_rules, write_snapshot
+from links.serializers import (
+    format_datetime,
+    redirect_rule_rows,
+    serialize_redirect_rule,
+    serialize_redirect_rule_row,
+    user_redirect_rule_rows,
+)
+from redirects.models import RedirectHitRollup
+from zone3000.db_routers import is_pinned_to_primary, is_sharded, pin_to_primary, shard_for_key
 
 
-class UrlViewsTestBase(TestCase):
+class UrlViewsTestBase(AllDatabasesTestMixin, TestCase):
     def setUp(self):
         self.user = CustomUser.objects.create(
             username="testuser",
@@ -34,6 +80,21 @@ class UrlViewsTestBase(TestCase):
         self.token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
 
+    # Rules of all shards; a plain queryset only reads the default database.
+    def count_rules(self, **filters):
+        return sum(queryset.filter(**filters).count() for queryset in RedirectRule.objects.shard_querysets())
+
+    def rule_values(self, *fields, **filters):
+        return sorted(
+            row
+            for queryset in RedirectRule.objects.shard_querysets()
+            for row in queryset.filter(**filters).values_list(*fields)
+        )
+
+    def delete_rules(self):
+        for queryset in RedirectRule.objects.shard_querysets():
+            queryset.delete()
+
 
 class UrlViewTests(UrlViewsTestBase):
     def setUp(self):
@@ -76,6 +137,21 @@ class UrlViewTests(UrlViewsTestBase):
         self.assertTrue("errors" in response_data)
         self.assertTrue("redirect_url" in response_data["errors"])
 
+    @override_settings(JWT_LAZY_USER=True)
+    def test_create_url_with_token_of_deleted_user(self):
+        self.user.delete()
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"redirect_url": "https://test.com", "is_private": False}),
+            content_type="application/json",
+            **self.auth_header
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)["error"], "User not found")
+        self.assertEqual(self.count_rules(redirect_url="https://test.com"), 0)
+
     def test_create_url_invalid_json(self):
         response = self.client.post(
             self.url,
@@ -103,6 +179,84 @@ class UrlViewTests(UrlViewsTestBase):
         self.assertEqual(response.status_code, 401)
 
 
+class UrlBulkViewTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.url = "/url/bulk"
+
+    def post(self, data):
+        return self.client.post(
+            self.url,
+            data=json.dumps(data),
+            content_type="application/json",
+            **self.auth_header
+        )
+
+    def test_bulk_create_success(self):
+        data = [
+            {"redirect_url": "https://one.com", "is_private": False},
+            {"redirect_url": "https://two.com", "is_private": True},
+        ]
+
+        response = self.post(data)
+
+        self.assertEqual(response.status_code, 201)
+        results = json.loads(response.content)["results"]
+        self.assertEqual([result["index"] for result in results], [0, 1])
+        self.assertEqual(results[1]["redirect_rule"]["redirect_url"], "https://two.com")
+        self.assertTrue(results[1]["redirect_rule"]["is_private"])
+
+        identifiers = [result["redirect_rule"]["redirect_identifier"] for result in results]
+        self.assertTrue(all(identifiers))
+        self.assertEqual(self.count_rules(user=self.user, redirect_identifier__in=identifiers), 2)
+
+    def test_bulk_create_partial_errors(self):
+        data = [
+            {"redirect_url": "https://one.com"},
+            {"redirect_url": "not-a-valid-url"},
+            "not-an-object",
+        ]
+
+        response = self.post(data)
+
+        self.assertEqual(response.status_code, 207)
+        results = json.loads(response.content)["results"]
+        self.assertIn("redirect_rule", results[0])
+        self.assertIn("redirect_url", results[1]["errors"])
+        self.assertIn("redirect_url", results[2]["errors"])
+        self.assertEqual(self.count_rules(user=self.user), 3)
+
+    def test_bulk_create_all_invalid(self):
+        response = self.post([{"redirect_url": "not-a-valid-url"}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.count_rules(user=self.user), 2)
+
+    def test_bulk_create_expects_a_list(self):
+        response = self.post({"redirect_url": "https://one.com"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)["error"], "Expected a list of items")
+
+    @override_settings(URL_BULK_MAX_ITEMS=1)
+    def test_bulk_create_too_many_items(self):
+        response = self.post([{"redirect_url": "https://one.com"}, {"redirect_url": "https://two.com"}])
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_create_invalidates_negative_cache(self):
+        self.assertIsNone(RedirectRule.objects.get_by_identifier("bulk-new"))
+
+        with mock.patch("links.models.generate_redirect_identifiers", return_value=["bulk-new"]):
+            self.post([{"redirect_url": "https://one.com"}])
+
+        self.assertIsNotNone(RedirectRule.objects.get_by_identifier("bulk-new"))
+
+    def test_bulk_create_unauthorized(self):
+        response = self.client.post(self.url, data="[]", content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+
 class UrlListViewTests(UrlViewsTestBase):
     def setUp(self):
         super().setUp()
@@ -122,6 +276,175 @@ class UrlListViewTests(UrlViewsTestBase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 401)
 
+    def test_list_urls_keyset_pagination(self):
+        redirect_rule3 = RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+
+        response = self.client.get(self.url, {"page_size": 2}, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        first_page = json.loads(response.content)
+        self.assertEqual(len(first_page["results"]), 2)
+        self.assertIsNotNone(first_page["next"])
+
+        response = self.client.get(self.url, {"page_size": 2, "cursor": first_page["next"]}, **self.auth_header)
+        second_page = json.loads(response.content)
+        self.assertEqual(len(second_page["results"]), 1)
+        self.assertIsNone(second_page["next"])
+
+        ids = [item["id"] for item in first_page["results"] + second_page["results"]]
+        self.assertCountEqual(
+            ids,
+            [str(self.redirect_rule1.id), str(self.redirect_rule2.id), str(redirect_rule3.id)],
+        )
+
+    def test_list_urls_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"}, **self.auth_header)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)["error"], "Invalid cursor")
+
+    def test_list_urls_invalid_page_size(self):
+        response = self.client.get(self.url, {"page_size": 0}, **self.auth_header)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("page_size", json.loads(response.content)["errors"])
+
+    def test_list_urls_streaming(self):
+        response = self.client.get(self.url, {"stream": "true"}, **self.auth_header)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        response_data = json.loads(b"".join(response.streaming_content))
+        self.assertCountEqual(
+            [item["redirect_url"] for item in response_data],
+            [self.redirect_rule1.redirect_url, self.redirect_rule2.redirect_url],
+        )
+
+
+class UrlListFilterTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.url = "/url/redirect_rules"
+        self.redirect_rule3 = RedirectRule.objects.create(user=self.user, redirect_url="https://Docs.Example.net/guide")
+
+    def list(self, **params):
+        response = self.client.get(self.url, params, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        return [item["redirect_url"] for item in json.loads(response.content)]
+
+    def test_filter_by_is_private(self):
+        self.assertEqual(self.list(is_private="true"), [self.redirect_rule2.redirect_url])
+        self.assertEqual(self.list(is_private="false"), [self.redirect_rule1.redirect_url, self.redirect_rule3.redirect_url])
+
+    def test_filter_by_host_and_url_prefix(self):
+        self.assertEqual(self.list(host="docs.example.NET"), [self.redirect_rule3.redirect_url])
+        self.assertEqual(self.list(url_prefix="https://example."), [self.redirect_rule1.redirect_url, self.redirect_rule2.redirect_url])
+
+    def test_filter_by_created_and_modified_range(self):
+        RedirectRule.objects.using(self.redirect_rule1._state.db).filter(id=self.redirect_rule1.id).update(
+            created_at=timezone.now() - datetime.timedelta(days=2),
+            modified_at=timezone.now() - datetime.timedelta(days=2),
+        )
+        yesterday = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+
+        self.assertEqual(self.list(created_before=yesterday), [self.redirect_rule1.redirect_url])
+        self.assertEqual(len(self.list(modified_after=yesterday)), 2)
+
+    def test_ordering_and_pagination(self):
+        RedirectRule.objects.using(self.redirect_rule2._state.db).filter(id=self.redirect_rule2.id).update(
+            modified_at=timezone.now() + datetime.timedelta(days=1),
+        )
+        expected = [self.redirect_rule2.redirect_url, self.redirect_rule3.redirect_url, self.redirect_rule1.redirect_url]
+
+        self.assertEqual(self.list(ordering="-modified_at"), expected)
+        first_page = json.loads(self.client.get(self.url, {"ordering": "-modified_at", "page_size": 2}, **self.auth_header).content)
+        second_page = json.loads(
+            self.client.get(
+                self.url, {"ordering": "-modified_at", "page_size": 2, "cursor": first_page["next"]}, **self.auth_header
+            ).content
+        )
+        self.assertEqual([item["redirect_url"] for item in first_page["results"] + second_page["results"]], expected)
+
+    def test_invalid_filters(self):
+        for params in ({"ordering": "redirect_url"}, {"created_after": "2025-01-02", "created_before": "2025-01-01"}):
+            response = self.client.get(self.url, params, **self.auth_header)
+            self.assertEqual(response.status_code, 400)
+
+
+class FillRedirectHostsTests(UrlViewsTestBase):
+    def test_existing_rules_are_filled_in_batches(self):
+        fill_redirect_hosts = importlib.import_module("links.migrations.0008_fill_redirect_hosts").fill_redirect_hosts
+        # The migration runs once per database.
+        for queryset in RedirectRule.objects.shard_querysets():
+            queryset.update(redirect_host="")
+            fill_redirect_hosts(django_apps, connections[queryset.db].schema_editor())
+
+        self.assertEqual(
+            dict(self.rule_values("id", "redirect_host")),
+            {self.redirect_rule1.id: "example.com", self.redirect_rule2.id: "example.org"},
+        )
+
+
+class UrlListIndexTests(UrlViewsTestBase):
+    FILTERS = {
+        "is_private": [None, True, False],
+        "created": [False, True],
+        "modified": [False, True],
+        "url_prefix": ["", "https://example."],
+        "host": ["", "example.com"],
+        "ordering": [choice for choice, _ in UrlListForm.ORDERING_CHOICES],
+    }
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == "postgresql":
+            # Tiny tables are cheaper to scan: give the planner enough rows of other users, changed
+            # long ago, that the indexes win on their own.
+            long_ago = timezone.now() - datetime.timedelta(days=365)
+            RedirectRule.objects.using(connection.alias).bulk_create(
+                [
+                    RedirectRule(redirect_url=f"https://example.net/{index}", redirect_identifier=f"fill{index}")
+                    for index in range(10000)
+                ],
+                batch_size=1000,
+            )
+            RedirectRule.objects.using(connection.alias).filter(redirect_identifier__startswith="fill").update(
+                created_at=long_ago, modified_at=long_ago,
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(RedirectRule._meta.db_table)}")
+
+    def assertUsesIndex(self, queryset, index_prefix="links_rule_user_"):
+        if connection.vendor == "postgresql":
+            plan = queryset.explain()
+            self.assertRegex(plan, rf"(Index (Only )?Scan( Backward)? using|Bitmap Index Scan on) {index_prefix}")
+            self.assertNotIn("Seq Scan", plan)
+        else:
+            plan = queryset.explain()
+            self.assertRegex(plan, rf"SEARCH links_redirectrule USING (COVERING )?INDEX {index_prefix}")
+            self.assertNotRegex(plan, r"SCAN links_redirectrule(?! USING)")
+
+    def test_every_filter_combination_uses_an_index(self):
+        now = timezone.now()
+        for combination in itertools.product(*self.FILTERS.values()):
+            options = dict(zip(self.FILTERS, combination))
+            cleaned_data = {"is_private": options["is_private"], "url_prefix": options["url_prefix"], "host": options["host"]}
+            if options["created"]:
+                cleaned_data.update(created_after=now - datetime.timedelta(days=1), created_before=now)
+            if options["modified"]:
+                cleaned_data.update(modified_after=now - datetime.timedelta(days=1))
+            queryset = keyset_queryset(
+                user_redirect_rule_rows(
+                    filter_rules(RedirectRule.objects.filter(user=self.user), cleaned_data), self.user
+                ),
+                ordering=options["ordering"],
+            )
+            with self.subTest(**options):
+                self.assertUsesIndex(queryset)
+
+    def test_snapshot_refresh_uses_an_index(self):
+        # Runs every few seconds in every worker, so it must not scan the table.
+        queryset = changed_rules(RedirectRule.objects.all(), timezone.now() - datetime.timedelta(minutes=1))
+
+        self.assertUsesIndex(queryset, index_prefix="links_rule_modified_idx")
+
 
 class UrlDetailViewTests(UrlViewsTestBase):
     def setUp(self):
@@ -213,3 +536,1257 @@ class UrlDetailViewTests(UrlViewsTestBase):
 
         response = self.client.delete(self.url, **auth_header2)
         self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.list_url = "/url/redirect_rules"
+        self.detail_url = f"/url/{self.redirect_rule1.id}"
+
+    def test_detail_validators(self):
+        response = self.client.get(self.detail_url, **self.auth_header)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertEqual(response["Last-Modified"], http_date(self.redirect_rule1.modified_at.timestamp()))
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Authorization", response["Vary"])
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"], **self.auth_header)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"], **self.auth_header,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_changes_after_update(self):
+        etag = self.client.get(self.detail_url, **self.auth_header)["ETag"]
+        self.client.patch(
+            self.detail_url,
+            data=json.dumps({"redirect_url": "https://updated-example.com"}),
+            content_type="application/json",
+            **self.auth_header
+        )
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_not_found_has_no_validators(self):
+        response = self.client.get(f"/url/{uuid.uuid4()}", **self.auth_header)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
+
+    def test_list_not_modified_skips_the_rows(self):
+        response = self.client.get(self.list_url, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+        # The user lookup and one aggregate per shard.
+        with self.assertNumQueries(1 + len(RedirectRule.objects.shard_querysets())):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=response["ETag"], **self.auth_header)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_ignores_if_modified_since(self):
+        # A deletion does not move the latest modified_at, so the date cannot validate a list.
+        if_modified_since = http_date(time.time() + 3600)
+        self.redirect_rule2.delete()
+
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=if_modified_since, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    def test_list_changes_after_create_and_delete(self):
+        etag = self.client.get(self.list_url, **self.auth_header)["ETag"]
+
+        self.redirect_rule2.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+
+        RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_list_etag_depends_on_the_query(self):
+        etag = self.client.get(self.list_url, **self.auth_header)["ETag"]
+
+        response = self.client.get(self.list_url, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            self.list_url, {"page_size": 1}, HTTP_IF_NONE_MATCH=response["ETag"], **self.auth_header,
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+    def test_pages_are_validated_without_aggregates(self):
+        # The token user, then one page query per shard: no count of all the user's rules.
+        with self.assertNumQueries(1 + len(RedirectRule.objects.shard_querysets())), \
+                mock.patch("links.views.Count", side_effect=AssertionError("aggregate")):
+            response = self.client.get(self.list_url, {"page_size": 1}, **self.auth_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+
+        response = self.client.get(self.list_url, {"stream": "true"}, **self.auth_header)
+        self.assertNotIn("ETag", response)
+
+
+class StreamJsonArrayTests(SimpleTestCase):
+    def test_chunks_form_a_json_array(self):
+        for items in ([], [1], list(range(7))):
+            chunks = list(stream_json_array(iter(items), chunk_size=3))
+            self.assertEqual(json.loads("".join(chunks)), items)
+
+
+class UrlStatsViewTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/url/{self.redirect_rule1.id}/stats"
+        self.hour = datetime.datetime(2025, 3, 1, 10, tzinfo=datetime.timezone.utc)
+        RedirectHitRollup.objects.add_counts({
+            (self.redirect_rule1.id, RedirectHitRollup.HOUR, self.hour): 5,
+            (self.redirect_rule1.id, RedirectHitRollup.MINUTE, self.hour + datetime.timedelta(minutes=70)): 2,
+            (self.redirect_rule2.id, RedirectHitRollup.HOUR, self.hour): 7,
+        })
+
+    def test_stats_by_hour(self):
+        params = {"start": "2025-03-01T10:00:00Z", "end": "2025-03-01T12:00:00Z"}
+        response = self.client.get(self.url, params, **self.auth_header)
+
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data["granularity"], "hour")
+        self.assertEqual(response_data["total"], 7)
+        self.assertEqual(
+            response_data["buckets"],
+            [{"start": "2025-03-01T10:00:00Z", "count": 5}, {"start": "2025-03-01T11:00:00Z", "count": 2}],
+        )
+
+    def test_stats_by_minute(self):
+        params = {"start": "2025-03-01T10:00:00Z", "end": "2025-03-01T12:00:00Z", "granularity": "minute"}
+        response = self.client.get(self.url, params, **self.auth_header)
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data["buckets"], [{"start": "2025-03-01T11:10:00Z", "count": 2}])
+
+    def test_stats_invalid_range(self):
+        params = {"start": "2025-03-02T00:00:00Z", "end": "2025-03-01T00:00:00Z"}
+        response = self.client.get(self.url, params, **self.auth_header)
+        self.assertEqual(response.status_code, 400)
+
+        params = {"start": "2025-01-01T00:00:00Z", "end": "2025-03-01T00:00:00Z", "granularity": "minute"}
+        response = self.client.get(self.url, params, **self.auth_header)
+        self.assertEqual(response.status_code, 400)
+
+    def test_stats_of_another_users_rule(self):
+        user2 = CustomUser.objects.create(username="anotheruser", password="testpassword456")
+        token2 = jwt.encode({"user_id": user2.id, "type": "access"}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {token2}")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_stats_unauthorized(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+
+class SerializerTests(UrlViewsTestBase):
+    def assertMatchesAsDict(self, serialized, redirect_rule):
+        expected = json.loads(JsonResponse(redirect_rule.as_dict()).content)
+        self.assertEqual(json.loads(JsonResponse(serialized).content), expected)
+
+    def test_instance_matches_as_dict(self):
+        anonymous_rule = RedirectRule.objects.create(redirect_url="https://example.net")
+
+        for redirect_rule in (self.redirect_rule1, anonymous_rule):
+            self.assertMatchesAsDict(serialize_redirect_rule(redirect_rule), redirect_rule)
+
+    def test_values_row_matches_as_dict(self):
+        anonymous_rule = RedirectRule.objects.create(redirect_url="https://example.net")
+        # The users are not on the other shards, so the listing selects the known username instead.
+        rows = {
+            row["id"]: row
+            for queryset in RedirectRule.objects.shard_querysets()
+            for row in (
+                *user_redirect_rule_rows(queryset.filter(user=self.user), self.user),
+                *redirect_rule_rows(queryset.filter(user=None)),
+            )
+        }
+
+        for redirect_rule in (self.redirect_rule1, self.redirect_rule2, anonymous_rule):
+            redirect_rule.refresh_from_db()
+            self.assertMatchesAsDict(serialize_redirect_rule_row(rows[redirect_rule.id]), redirect_rule)
+
+    def test_format_datetime(self):
+        value = datetime.datetime(2025, 3, 1, 10, 5, 7, 123456, tzinfo=datetime.timezone.utc)
+        self.assertEqual(format_datetime(value), "2025-03-01T10:05:07.123Z")
+        self.assertEqual(format_datetime(value.replace(microsecond=0)), "2025-03-01T10:05:07Z")
+
+    def test_list_has_no_per_row_queries(self):
+        # One query for the token user, one for the rules of every shard.
+        with self.assertNumQueries(1 + len(RedirectRule.objects.shard_querysets())):
+            response = self.client.get("/url/redirect_rules", **self.auth_header)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+
+class LRUTTLCacheTests(SimpleTestCase):
+    def test_get_set_and_counters(self):
+        cache = LRUTTLCache(max_size=2, ttl=60)
+
+        self.assertEqual(cache.get("a"), (False, None))
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), (True, 1))
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUTTLCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expired_entry_is_a_miss(self):
+        cache = LRUTTLCache(max_size=2, ttl=10)
+        with mock.patch("links.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with mock.patch("links.cache.time.monotonic", return_value=111):
+            self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = LRUTTLCache(max_size=0, ttl=60)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), (False, None))
+
+
+class RedirectRuleCacheTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        redirect_rule_cache.clear()
+        redirect_target_cache.clear()
+        self.identifier = self.redirect_rule1.redirect_identifier
+
+    def test_get_by_identifier_is_served_from_cache(self):
+        # With sharding the user is loaded from the default database by a second query.
+        with self.assertNumQueries(2 if is_sharded() else 1):
+            RedirectRule.objects.get_by_identifier(self.identifier)
+        with self.assertNumQueries(0):
+            redirect_rule = RedirectRule.objects.get_by_identifier(self.identifier)
+        self.assertEqual(redirect_rule.id, self.redirect_rule1.id)
+
+    def test_shared_tier_holds_no_user_secrets(self):
+        RedirectRule.objects.get_by_identifier(self.identifier)
+        redirect_rule_cache.local.clear()
+
+        cached = cache.get(redirect_rule_cache.make_key(self.identifier))
+        self.assertIsInstance(cached, dict)
+        self.assertNotIn(self.user.password, map(str, cached.values()))
+
+        with self.assertNumQueries(0):
+            redirect_rule = RedirectRule.objects.get_by_identifier(self.identifier)
+            self.assertEqual(redirect_rule.user.username, self.user.username)
+            self.assertEqual(redirect_rule.modified_at, self.redirect_rule1.modified_at)
+        # Any other field of the user is loaded when needed.
+        with self.assertNumQueries(1):
+            self.assertEqual(redirect_rule.user.password, self.user.password)
+
+    def test_cache_is_invalidated_on_save(self):
+        RedirectRule.objects.get_by_identifier(self.identifier)
+
+        self.redirect_rule1.is_private = True
+        self.redirect_rule1.save()
+
+        redirect_rule = RedirectRule.objects.get_by_identifier(self.identifier)
+        self.assertTrue(redirect_rule.is_private)
+
+    def test_redirect_target_is_cached_and_invalidated(self):
+        with self.assertNumQueries(1):
+            RedirectRule.objects.get_redirect_target(self.identifier)
+        with self.assertNumQueries(0):
+            redirect_target = RedirectRule.objects.get_redirect_target(self.identifier)
+        self.assertEqual(redirect_target.redirect_url, self.redirect_rule1.redirect_url)
+
+        self.redirect_rule1.redirect_url = "https://changed.com"
+        self.redirect_rule1.save()
+
+        redirect_target = RedirectRule.objects.get_redirect_target(self.identifier)
+        self.assertEqual(redirect_target.redirect_url, "https://changed.com")
+
+    def test_cache_is_invalidated_on_delete(self):
+        RedirectRule.objects.get_by_identifier(self.identifier)
+
+        self.redirect_rule1.delete()
+
+        self.assertIsNone(RedirectRule.objects.get_by_identifier(self.identifier))
+
+    def test_shared_tier_serves_other_workers(self):
+        RedirectRule.objects.get_by_identifier(self.identifier)
+        redirect_rule_cache.local.clear()
+
+        with self.assertNumQueries(0):
+            redirect_rule = RedirectRule.objects.get_by_identifier(self.identifier)
+        self.assertEqual(redirect_rule.id, self.redirect_rule1.id)
+
+    def test_local_tiers_of_other_workers_are_dropped_on_change(self):
+        other_worker = RedirectRuleCache(
+            local=LRUTTLCache(max_size=10, ttl=60),
+            alias=redirect_rule_cache.alias,
+            timeout=60,
+            not_found_timeout=60,
+            key_prefix=redirect_rule_cache.key_prefix,
+            generation_interval=1,
+        )
+        with mock.patch("links.cache.time.monotonic", return_value=100):
+            other_worker.set(self.identifier, "old")
+            self.assertEqual(other_worker.get(self.identifier), (True, "old"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.redirect_rule1.save()
+
+        with mock.patch("links.cache.time.monotonic", return_value=100.5):
+            self.assertEqual(other_worker.get(self.identifier), (True, "old"))
+        with mock.patch("links.cache.time.monotonic", return_value=101):
+            self.assertEqual(other_worker.get(self.identifier), (False, None))
+
+    def test_local_tiers_of_other_workers_keep_other_buckets_on_change(self):
+        other_worker = RedirectRuleCache(
+            local=LRUTTLCache(max_size=10, ttl=60),
+            alias=redirect_rule_cache.alias,
+            timeout=60,
+            not_found_timeout=60,
+            key_prefix=redirect_rule_cache.key_prefix,
+            generation_interval=1,
+        )
+        bucket = other_worker.bucket(self.identifier)
+        unrelated = next(
+            identifier for identifier in map(str, itertools.count()) if other_worker.bucket(identifier) != bucket
+        )
+        with mock.patch("links.cache.time.monotonic", return_value=100):
+            other_worker.set(self.identifier, "old")
+            other_worker.set(unrelated, "unrelated")
+            self.assertEqual(other_worker.get(self.identifier), (True, "old"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.redirect_rule1.save()
+
+        with mock.patch("links.cache.time.monotonic", return_value=101):
+            self.assertEqual(other_worker.get(self.identifier), (False, None))
+            self.assertEqual(other_worker.local.get(unrelated), (True, "unrelated"))
+
+    def test_local_tiers_of_other_workers_are_kept_on_create(self):
+        other_worker = RedirectRuleCache(
+            local=LRUTTLCache(max_size=10, ttl=60),
+            alias=redirect_rule_cache.alias,
+            timeout=60,
+            not_found_timeout=60,
+            key_prefix=redirect_rule_cache.key_prefix,
+            generation_interval=1,
+        )
+        with mock.patch("links.cache.time.monotonic", return_value=100):
+            other_worker.set(self.identifier, "cached")
+            self.assertEqual(other_worker.get(self.identifier), (True, "cached"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+            RedirectRule.objects.bulk_create_rules(
+                [RedirectRule(user=self.user, redirect_url="https://example.net/bulk")], batch_size=10,
+            )
+
+        with mock.patch("links.cache.time.monotonic", return_value=101):
+            self.assertEqual(other_worker.get(self.identifier), (True, "cached"))
+
+    def test_unknown_identifier_is_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(RedirectRule.objects.get_by_identifier("missing"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(RedirectRule.objects.get_by_identifier("missing"))
+
+    def test_negative_entry_is_invalidated_on_create(self):
+        self.assertIsNone(RedirectRule.objects.get_by_identifier("fresh"))
+
+        redirect_rule = RedirectRule(user=self.user, redirect_url="https://example.net")
+        redirect_rule.redirect_identifier = "fresh"
+        redirect_rule.save()
+
+        self.assertEqual(RedirectRule.objects.get_by_identifier("fresh").id, redirect_rule.id)
+
+    def test_negative_entry_of_a_lookup_racing_a_create_is_not_stored(self):
+        redirect_rule = RedirectRule(user=self.user, redirect_url="https://example.net")
+        redirect_rule.redirect_identifier = "fresh"
+        with self.captureOnCommitCallbacks(execute=True):
+            redirect_rule.save()
+        # A lookup that read the database before the commit stores its result after it.
+        redirect_rule_cache.set("fresh", None)
+        redirect_rule_cache.local.clear()
+
+        self.assertEqual(RedirectRule.objects.get_by_identifier("fresh").id, redirect_rule.id)
+
+    def test_overlong_identifier_skips_lookup(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(RedirectRule.objects.get_by_identifier("x" * 200))
+
+    def test_unsafe_identifier_gets_a_safe_cache_key(self):
+        key = redirect_rule_cache.make_key("bad key/\u00e9")
+        self.assertRegex(key, r"^redirect_rule:[0-9a-f]{32}$")
+
+
+@skipIf(settings.DATABASE_SHARDS, "Sharded rules are not read from replicas")
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaLookupTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.identifier = self.redirect_rule1.redirect_identifier
+        self.replica_queryset = mock.Mock(db="replica")
+        self.replica_queryset.using.side_effect = RedirectRule.objects.using
+
+    def test_replica_miss_falls_back_to_primary(self):
+        self.replica_queryset.get.side_effect = RedirectRule.DoesNotExist
+
+        redirect_rule = RedirectRule.objects._get_by_identifier(self.replica_queryset, self.identifier)
+
+        self.assertEqual(redirect_rule.id, self.redirect_rule1.id)
+        self.replica_queryset.using.assert_called_once_with("default")
+
+    def test_recently_changed_rule_is_read_from_primary(self):
+        pin_to_primary(rule_pin_key(self.identifier))
+
+        redirect_rule = RedirectRule.objects._get_by_identifier(self.replica_queryset, self.identifier)
+
+        self.assertEqual(redirect_rule.id, self.redirect_rule1.id)
+        self.replica_queryset.get.assert_not_called()
+
+    def test_saving_a_rule_pins_it_to_primary(self):
+        self.redirect_rule1.save()
+
+        self.assertTrue(is_pinned_to_primary(rule_pin_key(self.identifier)))
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS and not settings.DATABASE_SHARDS,
+    "Set DB_REPLICA_URLS, e.g. to sqlite:////tmp/replica.sqlite3",
+)
+class ReplicaReadTests(AllDatabasesTestMixin, TransactionTestCase):
+    # Replicas mirror the test database through their own connections, which only see committed rows.
+    read_replicas = True
+
+    def setUp(self):
+        cache.clear()
+        redirect_rule_cache.clear()
+        redirect_target_cache.clear()
+        self.user = CustomUser.objects.create(username="testuser", password="testpassword123")
+        self.redirect_rule = RedirectRule.objects.create(user=self.user, redirect_url="https://example.com")
+        self.identifier = self.redirect_rule.redirect_identifier
+        self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {encode_access_token(self.user.id, self.user.username)}"}
+        # Forget the pins of the writes above.
+        cache.clear()
+
+    def rule_queries(self, alias):
+        capture = self.enterContext(CaptureQueriesContext(connections[alias]))
+        return lambda: [query["sql"] for query in capture if "links_redirectrule" in query["sql"]]
+
+    def test_lookups_read_through_the_replica(self):
+        replica_queries = self.rule_queries(settings.DATABASE_REPLICAS[0])
+        primary_queries = self.rule_queries("default")
+
+        redirect_rule = RedirectRule.objects.get_by_identifier(self.identifier)
+        redirect_target = RedirectRule.objects.get_redirect_target(self.identifier)
+
+        self.assertEqual(redirect_rule.user.username, self.user.username)
+        self.assertEqual(redirect_target.redirect_url, self.redirect_rule.redirect_url)
+        self.assertEqual(len(replica_queries()), 2)
+        self.assertEqual(primary_queries(), [])
+
+    def test_changed_rules_are_read_from_the_primary(self):
+        self.redirect_rule.redirect_url = "https://example.net"
+        self.redirect_rule.save()
+        replica_queries = self.rule_queries(settings.DATABASE_REPLICAS[0])
+        primary_queries = self.rule_queries("default")
+
+        redirect_target = RedirectRule.objects.get_redirect_target(self.identifier)
+
+        self.assertEqual(redirect_target.redirect_url, "https://example.net")
+        self.assertEqual(replica_queries(), [])
+        self.assertEqual(len(primary_queries()), 1)
+
+    def test_listing_reads_through_the_replica_until_the_user_writes(self):
+        replica_queries = self.rule_queries(settings.DATABASE_REPLICAS[0])
+        primary_queries = self.rule_queries("default")
+
+        response = self.client.get("/url/redirect_rules", **self.auth_header)
+        self.assertEqual(len(json.loads(response.content)), 1)
+        self.assertEqual((len(replica_queries()), len(primary_queries())), (1, 0))
+
+        self.client.post(
+            "/url/",
+            data=json.dumps({"redirect_url": "https://example.org"}),
+            content_type="application/json",
+            **self.auth_header,
+        )
+        response = self.client.get("/url/redirect_rules", **self.auth_header)
+        self.assertEqual(len(json.loads(response.content)), 2)
+        self.assertEqual(len(replica_queries()), 1)
+
+
+class RedirectSnapshotTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "redirects.snapshot")
+        self.public_rule = self.redirect_rule1
+        self.private_rule = self.redirect_rule2
+        self.private_rule.is_private = True
+        self.private_rule.save()
+        self.enterContext(override_settings(REDIRECT_SNAPSHOT_LOG_DELETIONS=True))
+
+    def build(self):
+        call_command("build_redirect_snapshot", path=self.path, stdout=open(os.devnull, "w"))
+
+    def snapshot(self):
+        return RedirectSnapshot(self.path, refresh_interval=3600, sync_margin=60)
+
+    def test_table_round_trip(self):
+        rows = [(encode_base62(index), uuid.uuid4(), f"https://example.com/{index}") for index in range(2000)]
+        self.assertEqual(write_snapshot(self.path, iter(rows), built_at=0), 2000)
+
+        table = SnapshotTable(self.path)
+
+        for redirect_identifier, redirect_rule_id, redirect_url in rows:
+            self.assertEqual(table.get(redirect_identifier), (redirect_rule_id, redirect_url))
+        self.assertIsNone(table.get("missing"))
+
+    def test_large_record_offsets_fit_in_the_slot_table(self):
+        rows = [("abc", uuid.uuid4(), "https://example.com")]
+        write_snapshot(self.path, iter(rows), built_at=0)
+        table = SnapshotTable(self.path)
+
+        # Offsets beyond 4 GiB are stored as they are.
+        self.assertEqual(_SLOT.unpack(_SLOT.pack(1, 5 << 30)), (1, 5 << 30))
+        self.assertEqual(table.get("abc"), rows[0][1:])
+
+    def test_lookups_refresh_in_the_background(self):
+        self.build()
+        snapshot = RedirectSnapshot(self.path, refresh_interval=0, sync_margin=60)
+
+        with mock.patch.object(snapshot, "refresh") as refresh, \
+                mock.patch("links.snapshot.threading.Thread") as thread, \
+                self.assertNumQueries(0):
+            self.assertEqual(snapshot.get(self.public_rule.redirect_identifier), (False, None))
+            snapshot.get(self.public_rule.redirect_identifier)
+
+        refresh.assert_not_called()
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs["target"], snapshot._run)
+
+    def test_public_rules_are_served_without_queries(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+
+        with self.assertNumQueries(0):
+            found, redirect_target = snapshot.get(self.public_rule.redirect_identifier)
+            self.assertEqual(snapshot.get("missing"), (False, None))
+            # Made private just before the build, so it is also in the overlay.
+            self.assertEqual(snapshot.get(self.private_rule.redirect_identifier), (True, None))
+
+        self.assertTrue(found)
+        self.assertEqual(redirect_target.id, self.public_rule.id)
+        self.assertEqual(redirect_target.redirect_url, self.public_rule.redirect_url)
+
+    def test_overlay_applies_changes_from_other_processes(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        # Queryset updates skip the signals, as if another worker made the changes.
+        for redirect_rule, is_private in ((self.public_rule, True), (self.private_rule, False)):
+            RedirectRule.objects.using(redirect_rule._state.db).filter(id=redirect_rule.id).update(
+                is_private=is_private, modified_at=timezone.now(),
+            )
+
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.get(self.public_rule.redirect_identifier), (True, None))
+        found, redirect_target = snapshot.get(self.private_rule.redirect_identifier)
+        self.assertEqual(redirect_target.redirect_url, self.private_rule.redirect_url)
+
+    def test_rules_deleted_elsewhere_are_masked(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        # Deleted through another instance than the snapshot, as if by another worker; never looked up here.
+        self.public_rule.delete()
+
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.get(self.public_rule.redirect_identifier), (True, None))
+
+    def test_deleted_identifiers_in_use_again_are_not_masked(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        RedirectRuleDeletion.objects.using(self.public_rule._state.db).create(
+            redirect_identifier=self.public_rule.redirect_identifier,
+        )
+
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.get(self.public_rule.redirect_identifier)[1].id, self.public_rule.id)
+
+    def test_build_prunes_deletions_older_than_the_snapshot(self):
+        self.public_rule.delete()
+        RedirectRuleDeletion.objects.using(self.public_rule._state.db).update(
+            deleted_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+
+        self.build()
+
+        self.assertFalse(RedirectRuleDeletion.objects.using(self.public_rule._state.db).exists())
+
+    @override_settings(REDIRECT_SNAPSHOT_LOG_DELETIONS=False)
+    def test_deletions_are_not_logged_without_a_snapshot(self):
+        self.public_rule.delete()
+
+        self.assertFalse(RedirectRuleDeletion.objects.using(self.public_rule._state.db).exists())
+
+    def test_deletions_by_workers_without_a_snapshot_are_masked(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+
+        # An API worker, which does not serve the snapshot itself.
+        with mock.patch("links.models.redirect_snapshot", RedirectSnapshot("", refresh_interval=3600, sync_margin=60)):
+            self.public_rule.delete()
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.get(self.public_rule.redirect_identifier), (True, None))
+
+    def test_local_changes_apply_immediately(self):
+        snapshot = self.snapshot()
+        redirect_rule = RedirectRule(user=self.user, redirect_url="https://example.net")
+        redirect_rule.redirect_identifier = "fresh"
+
+        snapshot.update(redirect_rule)
+        self.assertEqual(snapshot.get("fresh")[1].redirect_url, "https://example.net")
+
+        snapshot.remove("fresh")
+        self.assertEqual(snapshot.get("fresh"), (True, None))
+
+    def test_local_changes_apply_once_committed(self):
+        other_rule = RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        self.enterContext(mock.patch("links.models.redirect_snapshot", snapshot))
+        identifier = self.public_rule.redirect_identifier
+
+        database = self.public_rule._state.db
+
+        with self.captureOnCommitCallbacks(using=database, execute=True):
+            try:
+                with transaction.atomic(using=database):
+                    self.public_rule.redirect_url = "https://rolled-back.example.com"
+                    self.public_rule.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        with self.captureOnCommitCallbacks(using=other_rule._state.db, execute=True):
+            try:
+                with transaction.atomic(using=other_rule._state.db):
+                    other_rule.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(snapshot.get(identifier)[1].redirect_url, "https://example.com")
+        self.assertEqual(snapshot.get(other_rule.redirect_identifier)[1].redirect_url, "https://example.net")
+
+        with self.captureOnCommitCallbacks(using=database, execute=True):
+            self.public_rule.redirect_url = "https://committed.example.com"
+            self.public_rule.save()
+        self.assertEqual(snapshot.get(identifier)[1].redirect_url, "https://committed.example.com")
+
+    def test_removed_snapshot_drops_the_overlay(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        snapshot.update(self.public_rule)
+
+        os.remove(self.path)
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.get(self.public_rule.redirect_identifier), (False, None))
+        self.assertEqual(snapshot.get(self.private_rule.redirect_identifier), (False, None))
+        self.assertEqual(snapshot.stats()["overlay"], 0)
+
+    def test_new_snapshot_is_swapped_in(self):
+        self.build()
+        snapshot = self.snapshot()
+        snapshot.refresh()
+        redirect_rule = RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+
+        self.build()
+        snapshot.refresh()
+
+        self.assertEqual(snapshot.stats()["entries"], 2)
+        self.assertTrue(snapshot.get(redirect_rule.redirect_identifier)[0])
+
+
+class TransferCommandTests(UrlViewsTestBase):
+    def setUp(self):
+        # A block reserved by an earlier test was rolled back with it; kept identifiers are checked against
+        # the sequence, so the rules of this test must reserve theirs in it.
+        get_identifier_allocator.cache_clear()
+        super().setUp()
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def export(self, name, **options):
+        path = os.path.join(self.directory, name)
+        call_command("export_redirect_rules", path, stderr=open(os.devnull, "w"), **options)
+        return path
+
+    def import_rules(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_redirect_rules", path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def rules(self):
+        return self.rule_values("redirect_url", "is_private", "user_id")
+
+    def test_jsonl_round_trip_keeps_identifiers(self):
+        expected = self.rule_values("redirect_identifier", "redirect_url", "is_private", "user_id")
+        path = self.export("rules.jsonl")
+        self.delete_rules()
+
+        output, errors = self.import_rules(path, keep_identifiers=True)
+
+        self.assertIn("Imported 2 redirect rules", output)
+        self.assertEqual(errors, "")
+        self.assertEqual(self.rule_values("redirect_identifier", "redirect_url", "is_private", "user_id"), expected)
+
+    def test_csv_round_trip_generates_identifiers(self):
+        expected = self.rules()
+        existing = {redirect_identifier for redirect_identifier, in self.rule_values("redirect_identifier")}
+        path = self.export("rules.csv")
+
+        self.import_rules(path)
+
+        self.assertEqual(self.rules(), sorted(expected * 2))
+        self.assertEqual(len(self.rule_values("id")) - len(existing), 2)
+
+    def test_export_of_one_user(self):
+        other_user = CustomUser.objects.create(username="otheruser", password="testpassword123")
+        RedirectRule.objects.create(user=other_user, redirect_url="https://example.net")
+
+        with open(self.export("rules.jsonl", user="otheruser")) as file:
+            rows = [json.loads(line) for line in file]
+
+        self.assertEqual([row["redirect_url"] for row in rows], ["https://example.net"])
+        self.assertEqual(rows[0]["username"], "otheruser")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        path = os.path.join(self.directory, "rules.jsonl")
+        with open(path, "w") as file:
+            file.write(json.dumps({"redirect_url": "https://example.net", "is_private": "t", "username": "testuser"}) + "\n")
+            file.write(json.dumps({"redirect_url": "not a url"}) + "\n")
+            file.write("not json\n")
+            file.write(json.dumps({"redirect_url": "https://example.net", "username": "nobody"}) + "\n")
+
+        output, errors = self.import_rules(path)
+
+        self.assertIn("Imported 1 redirect rules", output)
+        self.assertIn("skipped 3 invalid rows", output)
+        self.assertEqual([line.split(":")[0] for line in errors.splitlines()], ["Line 2", "Line 3", "Line 4"])
+        self.assertEqual(self.count_rules(redirect_url="https://example.net", is_private=True, user=self.user), 1)
+
+    def test_invalid_identifiers_are_reported_and_skipped(self):
+        generated = self.redirect_rule1.redirect_identifier
+        self.delete_rules()
+        path = os.path.join(self.directory, "rules.jsonl")
+        with open(path, "w") as file:
+            for redirect_identifier in (
+                generated,
+                "3f2a9c1e-4",
+                # Valid, but the allocator has not got this far yet.
+                identifier_from_value(IDENTIFIER_SPACE - 1),
+                1234567,
+                ["abc1234"],
+                "abc/123",
+                "abc12345",
+                None,
+            ):
+                file.write(json.dumps({"redirect_url": "https://example.net", "redirect_identifier": redirect_identifier}) + "\n")
+
+        output, errors = self.import_rules(path, keep_identifiers=True)
+
+        self.assertIn("Imported 2 redirect rules", output)
+        self.assertEqual(
+            [line.split(":")[0] for line in errors.splitlines()],
+            ["Line 3", "Line 4", "Line 5", "Line 6", "Line 7", "Line 8"],
+        )
+        self.assertEqual(self.count_rules(redirect_identifier__in=[generated, "3f2a9c1e-4"]), 2)
+
+    def test_rows_with_wrong_types_are_reported_and_skipped(self):
+        path = os.path.join(self.directory, "rules.jsonl")
+        with open(path, "w") as file:
+            file.write(json.dumps(["https://example.net"]) + "\n")
+            file.write(json.dumps({"redirect_url": ["https://example.net"]}) + "\n")
+            file.write(json.dumps({"redirect_url": 42}) + "\n")
+            file.write(json.dumps({"redirect_url": "https://example.net", "is_private": {"value": True}}) + "\n")
+            file.write(json.dumps({"redirect_url": "https://example.net", "username": ["testuser"]}) + "\n")
+            file.write(json.dumps({"redirect_url": "https://example.net", "username": 1}) + "\n")
+            file.write("null\n")
+            file.write(json.dumps({"redirect_url": "https://example.net", "is_private": 1}) + "\n")
+
+        output, errors = self.import_rules(path)
+
+        self.assertIn("Imported 1 redirect rules", output)
+        self.assertEqual(
+            [line.split(":")[0] for line in errors.splitlines()],
+            [f"Line {line_number}" for line_number in range(1, 8)],
+        )
+
+    def test_import_is_chunked_and_uses_copy_on_postgresql(self):
+        RedirectRule.objects.create(user=self.user, redirect_url="https://example.net")
+        path = self.export("rules.csv")
+
+        with mock.patch("links.management.commands.import_redirect_rules.supports_copy", return_value=True), \
+                mock.patch.object(RedirectRule.objects, "copy_rules") as copy_rules:
+            self.import_rules(path, batch_size=2)
+
+        self.assertEqual([len(call.args[0]) for call in copy_rules.call_args_list], [2, 1])
+
+    def test_bulk_import_updates_identifier_filter_and_caches(self):
+        path = self.export("rules.jsonl")
+        self.delete_rules()
+        redirect_rule_cache.set(self.redirect_rule1.redirect_identifier, None)
+
+        self.import_rules(path, keep_identifiers=True)
+
+        self.assertEqual(redirect_rule_cache.get(self.redirect_rule1.redirect_identifier), (False, None))
+
+
+class MergeKeysetTests(SimpleTestCase):
+    def test_rows_of_all_shards_are_merged_in_order(self):
+        start = timezone.now()
+        rows = [{"created_at": start + datetime.timedelta(seconds=index % 7), "id": uuid.uuid4()} for index in range(30)]
+        shards = [sorted(rows[index::3], key=keyset_key()) for index in range(3)]
+
+        self.assertEqual(list(merge_keyset(shards)), sorted(rows, key=keyset_key()))
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "SQLite rebuilds the table from the migration state, which has no constraint, whenever a later migration changes it",
+)
+class UserConstraintTests(AllDatabasesTestMixin, TestCase):
+    def user_foreign_keys(self, alias):
+        with connections[alias].cursor() as cursor:
+            constraints = connections[alias].introspection.get_constraints(cursor, RedirectRule._meta.db_table)
+        return [name for name, constraint in constraints.items() if constraint["foreign_key"]]
+
+    def test_only_shards_besides_default_drop_the_user_foreign_key(self):
+        for alias in connections:
+            if alias in settings.DATABASE_REPLICAS:
+                continue
+            with self.subTest(alias=alias):
+                if alias in settings.DATABASE_SHARDS and alias != "default":
+                    self.assertEqual(self.user_foreign_keys(alias), [])
+                else:
+                    self.assertEqual(len(self.user_foreign_keys(alias)), 1)
+
+
+@skipUnless(
+    len(settings.DATABASE_SHARDS) > 1,
+    "Set DB_SHARD_URLS, e.g. to sqlite:////tmp/shard_1.sqlite3,sqlite:////tmp/shard_2.sqlite3",
+)
+class ShardedRedirectRuleTests(UrlViewsTestBase):
+    def create_rules(self, count):
+        return [
+            RedirectRule.objects.create(user=self.user, redirect_url=f"https://example.com/{index}")
+            for index in range(count)
+        ]
+
+    def shard_of(self, redirect_rule):
+        return shard_for_key(redirect_rule.redirect_identifier)
+
+    def test_rules_are_stored_on_the_shard_of_their_identifier(self):
+        redirect_rules = [self.redirect_rule1, self.redirect_rule2, *self.create_rules(30)]
+
+        for redirect_rule in redirect_rules:
+            self.assertTrue(RedirectRule.objects.using(self.shard_of(redirect_rule)).filter(pk=redirect_rule.pk).exists())
+        counts = [RedirectRule.objects.using(shard).count() for shard in settings.DATABASE_SHARDS]
+        self.assertEqual(sum(counts), 32)
+        self.assertGreater(sum(1 for count in counts if count), 1)
+
+    def test_lookup_only_queries_the_owning_shard(self):
+        redirect_rule = self.redirect_rule1
+        other_shards = [shard for shard in settings.DATABASE_SHARDS if shard != self.shard_of(redirect_rule)]
+        redirect_rule_cache.invalidate(redirect_rule.redirect_identifier)
+        redirect_target_cache.invalidate(redirect_rule.redirect_identifier)
+
+        captures = [self.enterContext(CaptureQueriesContext(connections[shard])) for shard in other_shards]
+        found = RedirectRule.objects.get_by_identifier(redirect_rule.redirect_identifier)
+        redirect_target = RedirectRule.objects.get_redirect_target(redirect_rule.redirect_identifier)
+
+        self.assertEqual(found.user.username, self.user.username)
+        self.assertEqual(redirect_target.redirect_url, redirect_rule.redirect_url)
+        # The default database is still asked for the user.
+        rule_queries = [query for capture in captures for query in capture if "links_redirectrule" in query["sql"]]
+        self.assertEqual(rule_queries, [])
+
+    def test_get_by_id_finds_rules_on_any_shard(self):
+        for redirect_rule in self.create_rules(10):
+            self.assertEqual(RedirectRule.objects.get_by_id(redirect_rule.id, self.user), redirect_rule)
+        self.assertIsNone(RedirectRule.objects.get_by_id(uuid.uuid4(), self.user))
+
+    def test_listing_merges_all_shards_in_order(self):
+        self.create_rules(12)
+        expected = [
+            str(row["id"])
+            for row in sorted(
+                (row for shard in settings.DATABASE_SHARDS for row in RedirectRule.objects.using(shard).values("created_at", "id")),
+                key=keyset_key(),
+            )
+        ]
+        url = "/url/redirect_rules"
+
+        ids, cursor = [], None
+        while True:
+            params = {"page_size": 5, **({"cursor": cursor} if cursor else {})}
+            page = json.loads(self.client.get(url, params, **self.auth_header).content)
+            ids.extend(item["id"] for item in page["results"])
+            cursor = page["next"]
+            if not cursor:
+                break
+        streamed = json.loads(b"".join(self.client.get(url, {"stream": "true"}, **self.auth_header).streaming_content))
+        listed = json.loads(self.client.get(url, **self.auth_header).content)
+
+        self.assertEqual(ids, expected)
+        self.assertEqual([item["id"] for item in streamed], expected)
+        self.assertEqual([item["id"] for item in listed], expected)
+        self.assertEqual({item["user"]["username"] for item in listed}, {self.user.username})
+
+    def test_bulk_created_rules_are_spread_over_shards(self):
+        redirect_rules = RedirectRule.objects.bulk_create_rules(
+            [RedirectRule(user=self.user, redirect_url=f"https://example.com/{index}") for index in range(30)],
+            batch_size=10,
+        )
+
+        for redirect_rule in redirect_rules:
+            self.assertEqual(redirect_rule._state.db, self.shard_of(redirect_rule))
+            self.assertEqual(RedirectRule.objects.get_by_identifier(redirect_rule.redirect_identifier), redirect_rule)
+
+    def test_deleting_a_user_deletes_their_rules_on_all_shards(self):
+        self.create_rules(10)
+
+        self.user.delete()
+
+        self.assertEqual(sum(RedirectRule.objects.using(shard).count() for shard in settings.DATABASE_SHARDS), 0)
+
+    def test_rebalance_moves_rules_to_their_shard(self):
+        redirect_rule = RedirectRule.objects.get_by_identifier(self.redirect_rule1.redirect_identifier)
+        owner = self.shard_of(redirect_rule)
+        wrong_shard = next(shard for shard in settings.DATABASE_SHARDS if shard != owner)
+        RedirectRule.objects.using(owner).filter(pk=redirect_rule.pk)._raw_delete(owner)
+        RedirectRule.objects.using(wrong_shard).bulk_create([redirect_rule])
+        RedirectRule.objects.using(wrong_shard).filter(pk=redirect_rule.pk).update(created_at=redirect_rule.created_at)
+        # Looked up on the owning shard while the rule was elsewhere.
+        redirect_rule_cache.invalidate(redirect_rule.redirect_identifier)
+        self.assertIsNone(RedirectRule.objects.get_by_identifier(redirect_rule.redirect_identifier))
+
+        call_command("rebalance_redirect_shards", stdout=StringIO())
+
+        self.assertFalse(RedirectRule.objects.using(wrong_shard).filter(pk=redirect_rule.pk).exists())
+        moved = RedirectRule.objects.using(owner).get(pk=redirect_rule.pk)
+        self.assertEqual(moved.created_at, redirect_rule.created_at)
+        self.assertEqual(RedirectRule.objects.get_by_identifier(redirect_rule.redirect_identifier), moved)
+
+    def test_deleting_a_stray_copy_keeps_rollups(self):
+        owner = self.shard_of(self.redirect_rule1)
+        wrong_shard = next(shard for shard in settings.DATABASE_SHARDS if shard != owner)
+        RedirectRule.objects.using(wrong_shard).bulk_create([RedirectRule.objects.using(owner).get(pk=self.redirect_rule1.pk)])
+        bucket_start = datetime.datetime(2025, 3, 1, 10, tzinfo=datetime.timezone.utc)
+        RedirectHitRollup.objects.add_counts({(self.redirect_rule1.pk, RedirectHitRollup.HOUR, bucket_start): 5})
+
+        RedirectRule.objects.using(wrong_shard).filter(pk=self.redirect_rule1.pk).delete()
+        self.assertTrue(RedirectHitRollup.objects.filter(redirect_rule_id=self.redirect_rule1.pk).exists())
+
+        self.redirect_rule1.delete()
+        self.assertFalse(RedirectHitRollup.objects.filter(redirect_rule_id=self.redirect_rule1.pk).exists())
+
+    def test_rebalance_keeps_rollups_and_deletion_log(self):
+        redirect_rule = RedirectRule.objects.get_by_identifier(self.redirect_rule1.redirect_identifier)
+        owner = self.shard_of(redirect_rule)
+        wrong_shard = next(shard for shard in settings.DATABASE_SHARDS if shard != owner)
+        RedirectRule.objects.using(owner).filter(pk=redirect_rule.pk)._raw_delete(owner)
+        RedirectRule.objects.using(wrong_shard).bulk_create([redirect_rule])
+        bucket_start = datetime.datetime(2025, 3, 1, 10, tzinfo=datetime.timezone.utc)
+        RedirectHitRollup.objects.add_counts({
+            (redirect_rule.pk, RedirectHitRollup.MINUTE, bucket_start): 3,
+            (redirect_rule.pk, RedirectHitRollup.HOUR, bucket_start): 5,
+        })
+
+        call_command("rebalance_redirect_shards", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(RedirectHitRollup.objects.filter(redirect_rule_id=redirect_rule.pk).values_list("granularity", "count")),
+            [(RedirectHitRollup.HOUR, 5), (RedirectHitRollup.MINUTE, 3)],
+        )
+        stats = json.loads(self.client.get(f"/url/{redirect_rule.pk}/stats", {
+            "start": bucket_start.isoformat(),
+            "end": (bucket_start + datetime.timedelta(hours=1)).isoformat(),
+        }, **self.auth_header).content)
+        self.assertEqual(stats["total"], 8)
+        self.assertFalse(any(RedirectRuleDeletion.objects.using(shard).exists() for shard in settings.DATABASE_SHARDS))
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_added_items_are_always_found(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [encode_base62(value) for value in range(1000)]
+        for item in items:
+            bloom_filter.add(item)
+
+        self.assertTrue(all(item in bloom_filter for item in items))
+
+    def test_false_positive_rate_is_near_target(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        for value in range(1000):
+            bloom_filter.add(f"in-{value}")
+
+        false_positives = sum(f"out-{value}" in bloom_filter for value in range(10000))
+
+        self.assertLess(false_positives / 10000, 0.03)
+        self.assertAlmostEqual(bloom_filter.estimated_error_rate(), 0.01, delta=0.005)
+
+    def test_memory_usage_follows_error_rate(self):
+        coarse = BloomFilter(capacity=10000, error_rate=0.01)
+        fine = BloomFilter(capacity=10000, error_rate=0.0001)
+
+        self.assertEqual(coarse.memory_usage, len(coarse.bits))
+        self.assertGreater(fine.memory_usage, coarse.memory_usage)
+
+
+class RedirectIdentifierFilterTests(UrlViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.identifier_filter = RedirectIdentifierFilter(
+            error_rate=0.001,
+            rebuild_interval=3600,
+            sync_margin=60,
+            min_capacity=100,
+        )
+
+    def test_everything_passes_until_built(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.identifier_filter.might_contain("missing"))
+        self.assertEqual(self.identifier_filter.stats(), {"ready": False})
+
+    def test_absent_identifier_is_rejected_without_queries(self):
+        self.identifier_filter.build()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.identifier_filter.might_contain(self.redirect_rule1.redirect_identifier))
+            self.assertFalse(self.identifier_filter.might_contain("missing"))
+
+    def test_rules_created_by_other_workers_are_synced(self):
+        self.identifier_filter.build()
+        # bulk_create skips the signals, as if the rule came from another process.
+        RedirectRule.objects.bulk_create([RedirectRule(redirect_url="https://example.net", redirect_identifier="remote")])
+        self.assertFalse(self.identifier_filter.might_contain("remote"))
+
+        cache.incr(CREATED_VERSION_KEY)
+
+        with mock.patch.object(self.identifier_filter, "start_sync") as start_sync, self.assertNumQueries(0):
+            self.assertTrue(self.identifier_filter.might_contain("remote"))
+        start_sync.assert_called_once_with()
+
+        self.identifier_filter.sync()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.identifier_filter.might_contain("remote"))
+            self.assertFalse(self.identifier_filter.might_contain("missing"))
+
+    def test_only_one_sync_runs_at_a_time(self):
+        self.identifier_filter.build()
+        cache.incr(CREATED_VERSION_KEY)
+
+        with mock.patch("links.bloom.threading.Thread") as thread:
+            self.assertTrue(self.identifier_filter.might_contain("missing"))
+            self.assertTrue(self.identifier_filter.might_contain("missing"))
+
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs["target"], self.identifier_filter._sync)
+
+    def test_rules_from_hosts_with_a_slow_clock_are_synced(self):
+        self.identifier_filter.build()
+        remote = RedirectRule.objects.bulk_create(
+            [RedirectRule(redirect_url="https://example.net", redirect_identifier="remote")]
+        )[0]
+        # Written by a host whose clock is 30 seconds behind, within the sync margin.
+        RedirectRule.objects.using(remote._state.db).filter(pk=remote.pk).update(
+            created_at=timezone.now() - datetime.timedelta(seconds=30)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.identifier_filter.mark_created()
+
+        self.identifier_filter.sync()
+        self.assertTrue(self.identifier_filter.might_contain("remote"))
+
+    def test_missing_counter_syncs_before_rejecting(self):
+        self.identifier_filter.build()
+        RedirectRule.objects.bulk_create([RedirectRule(redirect_url="https://example.net", redirect_identifier="remote")])
+        # Evicted, or never written to a cache this worker shares.
+        cache.delete(CREATED_VERSION_KEY)
+
+        with mock.patch.object(self.identifier_filter, "start_sync") as start_sync:
+            self.assertTrue(self.identifier_filter.might_contain("missing"))
+        start_sync.assert_called_once_with()
+
+        self.identifier_filter.sync()
+        self.assertTrue(self.identifier_filter.might_contain("remote"))
+        # The sync seeded the counter again.
+        with self.assertNumQueries(0):
+            self.assertFalse(self.identifier_filter.might_contain("missing"))
+
+    @override_settings(REDIRECT_FILTER_ENABLED=True)
+    def test_starting_with_a_per_process_cache_warns(self):
+        with mock.patch("links.bloom.identifier_filter.start") as start, self.assertLogs("links.bloom", "WARNING"):
+            start_identifier_filter()
+
+        start.assert_called_once_with()
+
+    def test_creating_a_rule_bumps_the_counter(self):
+        self.identifier_filter.build()
+
+        redirect_rule = RedirectRule(redirect_url="https://example.net", redirect_identifier="fresh")
+
+        # Bumped once the rule's own database commits.
+        with self.captureOnCommitCallbacks(using=self.shard_of(redirect_rule), execute=True):
+            redirect_rule.save()
+
+        self.assertEqual(cache.get(CREATED_VERSION_KEY), 1)
+
+    def shard_of(self, redirect_rule):
+        return shard_for_key(redirect_rule.redirect_identifier) if is_sharded() else "default"
+
+    def test_created_rules_are_added_once_committed(self):
+        self.identifier_filter.build()
+        self.enterContext(mock.patch("links.models.identifier_filter", self.identifier_filter))
+        rolled_back = RedirectRule(redirect_url="https://example.net", redirect_identifier="rolledback")
+        committed = RedirectRule(redirect_url="https://example.net", redirect_identifier="committed")
+
+        with self.captureOnCommitCallbacks(using=self.shard_of(rolled_back), execute=True):
+            try:
+                with transaction.atomic(using=self.shard_of(rolled_back)):
+                    rolled_back.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        with self.captureOnCommitCallbacks(using=self.shard_of(committed), execute=True):
+            committed.save()
+
+        self.assertNotIn("rolledback", self.identifier_filter._filter)
+        self.assertIn("committed", self.identifier_filter._filter)
+
+    def test_rebuild_is_scheduled_after_many_deletions(self):
+        self.identifier_filter.build()
+        self.identifier_filter.deleted = 10
+
+        with mock.patch.object(self.identifier_filter, "start") as start:
+            self.identifier_filter.might_contain(self.redirect_rule1.redirect_identifier)
+
+        start.assert_called_once_with()
+
+    def test_stats_report_memory_usage(self):
+        self.identifier_filter.build()
+
+        stats = self.identifier_filter.stats()
+
+        self.assertTrue(stats["ready"])
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["capacity"], 100)
+        self.assertGreater(stats["memory_bytes"], 0)
+
+
+class IdentifierAllocatorTests(AllDatabasesTestMixin, TestCase):
+    def setUp(self):
+        IdentifierSequence.objects.create(name="test")
+
+    def test_encode_base62(self):
+        self.assertEqual(encode_base62(0), "0000000")
+        self.assertEqual(encode_base62(61), "000000Z")
+        self.assertEqual(encode_base62(62), "0000010")
+
+    def test_identifiers_map_back_to_their_values(self):
+        for value in (0, 1, 12345, IDENTIFIER_SPACE - 1):
+            self.assertEqual(value_from_identifier(identifier_from_value(value)), value)
+        self.assertIsNone(value_from_identifier("3f2a9c1e-4"))
+
+    def test_identifiers_are_unique_and_compact(self):
+        identifiers = {identifier_from_value(value) for value in range(10000)}
+
+        self.assertEqual(len(identifiers), 10000)
+        self.assertTrue(all(len(identifier) == IDENTIFIER_LENGTH for identifier in identifiers))
+        self.assertTrue(all(identifier.isalnum() for identifier in identifiers))
+
+    def test_sequence_allocator_reserves_per_call(self):
+        allocator = SequenceIdentifierAllocator("test")
+
+        first = allocator.allocate()
+        batch = allocator.allocate_many(3)
+
+        self.assertEqual(len({first, *batch}), 4)
+
+    def test_block_allocator_reserves_once_per_block(self):
+        allocator = BlockIdentifierAllocator("test", block_size=5)
+
+        # SAVEPOINT, UPDATE, SELECT, RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            first_block = [allocator.allocate() for _ in range(5)]
+        with self.assertNumQueries(0):
+            allocator.allocate_many(0)
+        next_identifier = allocator.allocate()
+
+        self.assertEqual(len({*first_block, next_identifier}), 6)
+
+    def test_block_allocators_do_not_overlap(self):
+        allocator1 = BlockIdentifierAllocator("test", block_size=3)
+        allocator2 = BlockIdentifierAllocator("test", block_size=3)
+
+        identifiers = allocator1.allocate_many(4) + allocator2.allocate_many(4) + allocator1.allocate_many(2)
+
+        self.assertEqual(len(set(identifiers)), 10)
+
+    def test_block_is_discarded_after_fork(self):
+        allocator = BlockIdentifierAllocator("test", block_size=10)
+        parent_identifier = allocator.allocate()
+
+        with mock.patch("links.identifiers.os.getpid", return_value=-1):
+            child_identifier = allocator.allocate()
+
+        self.assertNotEqual(child_identifier, identifier_from_value(1))
+        self.assertEqual(parent_identifier, identifier_from_value(0))
+        self.assertEqual(child_identifier, identifier_from_value(10))
+
+    def test_new_rules_get_base62_identifiers(self):
+        redirect_rule = RedirectRule.objects.create(redirect_url="https://example.com")
+
+        self.assertEqual(len(redirect_rule.redirect_identifier), IDENTIFIER_LENGTH)
+        self.assertTrue(redirect_rule.redirect_identifier.isalnum())
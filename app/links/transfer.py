@@ -0,0 +1,178 @@
+"""
+Streaming import and export of redirect rules as JSON Lines or CSV.
+
+Rows are read and written one chunk at a time, so memory use does not depend on the file size.
+On PostgreSQL, CSV exports and all imports go through ``COPY``; other databases use
+``QuerySet.iterator()`` and ``bulk_create``.
+"""
+import csv
+import heapq
+import io
+import json
+from operator import itemgetter
+
+from links.serializers import format_datetime
+
+FORMATS = ("jsonl", "csv")
+EXPORT_FIELDS = ("id", "redirect_identifier", "redirect_url", "is_private", "created_at", "modified_at", "username")
+# ``QuerySet.values_list()`` fields matching EXPORT_FIELDS; the COPY export joins the username in.
+EXPORT_VALUES = ("id", "redirect_identifier", "redirect_url", "is_private", "created_at", "modified_at", "user__username")
+# The same without the join, for exports that look usernames up per chunk.
+EXPORT_ROW_VALUES = (*EXPORT_VALUES[:-1], "user_id")
+COPY_FIELDS = (
+    "id", "created_at", "modified_at", "redirect_url", "redirect_host", "is_private", "redirect_identifier", "user_id",
+)
+# CSV booleans as written by COPY ("t"/"f") and by people.
+BOOLEAN_VALUES = {"": False, "f": False, "false": False, "0": False, "t": True, "true": True, "1": True}
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def supports_copy(connection):
+    return connection.vendor == "postgresql"
+
+
+def copy_to(cursor, sql, params, file):
+    """
+    Run ``COPY (sql) TO STDOUT`` and write its output to the text ``file``; return the row count.
+    """
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy_expert"):
+        # psycopg2 cannot bind parameters in COPY, so they are inlined by the driver.
+        raw_cursor.copy_expert(raw_cursor.mogrify(sql, params).decode(), file)
+        return raw_cursor.rowcount
+    with raw_cursor.copy(sql, params) as copy:
+        for data in copy:
+            file.write(bytes(data).decode())
+    return raw_cursor.rowcount
+
+
+def copy_from(cursor, sql, file):
+    """
+    Run ``COPY ... FROM STDIN`` with the contents of the text ``file``.
+    """
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy_expert"):
+        raw_cursor.copy_expert(sql, file)
+        return
+    with raw_cursor.copy(sql) as copy:
+        while data := file.read(65536):
+            copy.write(data)
+
+
+def merge_export_rows(iterables):
+    """
+    Merge ``EXPORT_ROW_VALUES`` tuples that are each in ``(created_at, id)`` order, e.g. one stream per shard.
+    """
+    if len(iterables) == 1:
+        return iter(iterables[0])
+    return heapq.merge(*iterables, key=itemgetter(4, 0))
+
+
+def export_sql(queryset, connection):
+    """
+    ``COPY`` statement and parameters writing ``queryset`` (``values_list(*EXPORT_VALUES)``) as CSV.
+    """
+    sql, params = queryset.query.sql_with_params()
+    header = ", ".join(map(connection.ops.quote_name, EXPORT_FIELDS))
+    # The subquery's column names come from the ORM; rename them to EXPORT_FIELDS for the header.
+    return f"COPY (SELECT * FROM ({sql}) AS rules ({header})) TO STDOUT WITH (FORMAT csv, HEADER)", params
+
+
+def write_rows(rows, file, format):
+    """
+    Write ``values_list(*EXPORT_VALUES)`` tuples to ``file``; CSV output matches ``COPY`` as closely as possible.
+    """
+    if format == "jsonl":
+        for redirect_rule_id, redirect_identifier, redirect_url, is_private, created_at, modified_at, username in rows:
+            file.write(json.dumps({
+                "id": str(redirect_rule_id),
+                "redirect_identifier": redirect_identifier,
+                "redirect_url": redirect_url,
+                "is_private": is_private,
+                "created_at": format_datetime(created_at),
+                "modified_at": format_datetime(modified_at),
+                "username": username,
+            }))
+            file.write("\n")
+        return
+
+    writer = csv.writer(file)
+    for redirect_rule_id, redirect_identifier, redirect_url, is_private, created_at, modified_at, username in rows:
+        writer.writerow((
+            redirect_rule_id,
+            redirect_identifier,
+            redirect_url,
+            "t" if is_private else "f",
+            created_at.isoformat(sep=" "),
+            modified_at.isoformat(sep=" "),
+            username,
+        ))
+
+
+def write_header(file, format):
+    if format == "csv":
+        csv.writer(file).writerow(EXPORT_FIELDS)
+
+
+def read_rows(file, format):
+    """
+    Yield ``(line_number, row)`` for every record in ``file``; ``row`` is a dict, or ``None`` if unparseable.
+    """
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def parse_boolean(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    try:
+        return BOOLEAN_VALUES[str(value).strip().lower()]
+    except KeyError:
+        raise InvalidRow({"is_private": [f"Invalid boolean: {value!r}"]}) from None
+
+
+def copy_rules_sql(model, connection):
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(model._meta.get_field(field).column) for field in COPY_FIELDS)
+    return f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+
+def rules_csv_buffer(redirect_rules):
+    """
+    ``redirect_rules`` as the CSV input of ``COPY ... (COPY_FIELDS) FROM STDIN``.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for redirect_rule in redirect_rules:
+        writer.writerow((
+            redirect_rule.id,
+            redirect_rule.created_at.isoformat(),
+            redirect_rule.modified_at.isoformat(),
+            redirect_rule.redirect_url,
+            redirect_rule.redirect_host,
+            "t" if redirect_rule.is_private else "f",
+            redirect_rule.redirect_identifier,
+            # An empty unquoted field is NULL in COPY's CSV format.
+            "" if redirect_rule.user_id is None else redirect_rule.user_id,
+        ))
+    buffer.seek(0)
+    return buffer
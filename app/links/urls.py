@@ -1,9 +1,11 @@
 from django.urls import path
 
-from links.views import UrlView, UrlListView, UrlDetailView
+from links.views import UrlView, UrlBulkView, UrlListView, UrlDetailView, UrlStatsView
 
 urlpatterns = [
     path("", UrlView.as_view()),
+    path("bulk", UrlBulkView.as_view()),
     path("redirect_rules", UrlListView.as_view()),
     path("<str:redirect_rule_id>", UrlDetailView.as_view()),
+    path("<str:redirect_rule_id>/stats", UrlStatsView.as_view()),
 ]
@@ -1,11 +1,22 @@
+import datetime
 import json
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 
+from common.api.conditional import conditional_response, make_etag
 from common.api.decorators import jwt_access_required
+from common.api.streaming import stream_json_array
+from common.instrumentation import phase
 from common.views import BaseView
-from links.forms import UrlsForm, UrlsPatchForm
+from links.filters import DEFAULT_ORDERING, filter_rules
+from links.forms import UrlListForm, UrlStatsForm, UrlsForm, UrlsPatchForm
 from links.models import RedirectRule
+from links.pagination import InvalidCursor, keyset_page, keyset_rows
+from links.serializers import serialize_redirect_rule, serialize_redirect_rule_row, user_redirect_rule_rows
+from redirects.models import RedirectHitRollup
 
 
 class UrlView(BaseView):
@@ -29,7 +40,7 @@ class UrlView(BaseView):
             )
 
             return JsonResponse(
-                redirect_rule.as_dict(),
+                serialize_redirect_rule(redirect_rule),
                 status=201,
                 safe=False,
             )
@@ -37,18 +48,169 @@ class UrlView(BaseView):
             return JsonResponse({"error": "Invalid JSON"}, status=400)
 
 
+class UrlBulkView(BaseView):
+    @staticmethod
+    @jwt_access_required
+    def post(request, *args, **kwargs):
+        try:
+            user = request.user
+            data = json.loads(request.body)
+            if not isinstance(data, list):
+                return JsonResponse({"error": "Expected a list of items"}, status=400)
+            if len(data) > settings.URL_BULK_MAX_ITEMS:
+                return JsonResponse(
+                    {"error": f"At most {settings.URL_BULK_MAX_ITEMS} items are allowed"},
+                    status=400,
+                )
+
+            results = []
+            redirect_rules = []
+            for index, item in enumerate(data):
+                form = UrlsForm(item if isinstance(item, dict) else {})
+                if not form.is_valid():
+                    results.append({"index": index, "errors": form.errors})
+                    continue
+
+                redirect_rule = RedirectRule(
+                    user=user,
+                    redirect_url=form.cleaned_data.get("redirect_url"),
+                    is_private=form.cleaned_data.get("is_private"),
+                )
+                redirect_rules.append(redirect_rule)
+                results.append({"index": index, "redirect_rule": redirect_rule})
+
+            RedirectRule.objects.bulk_create_rules(redirect_rules, batch_size=settings.URL_BULK_BATCH_SIZE)
+
+            for result in results:
+                if "redirect_rule" in result:
+                    result["redirect_rule"] = serialize_redirect_rule(result["redirect_rule"])
+
+            if not redirect_rules and results:
+                status = 400
+            elif len(redirect_rules) < len(results):
+                status = 207
+            else:
+                status = 201
+
+            return JsonResponse({"results": results}, status=status)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+
 class UrlListView(BaseView):
     @staticmethod
     @jwt_access_required
     def get(request, *args, **kwargs):
         user = request.user
-        redirect_rules = RedirectRule.objects.filter(user=user).select_related("user")
-        return JsonResponse(
-            [redirect_rule.as_dict() for redirect_rule in redirect_rules],
+        form = UrlListForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        cursor = form.cleaned_data.get("cursor")
+        page_size = form.cleaned_data.get("page_size")
+        ordering = form.cleaned_data.get("ordering") or DEFAULT_ORDERING
+        stream = form.cleaned_data.get("stream")
+        # One queryset per shard; their rows are merged in keyset order.
+        filtered = [
+            filter_rules(queryset, form.cleaned_data).filter(user=user)
+            for queryset in RedirectRule.objects.shard_querysets()
+        ]
+        querysets = [user_redirect_rule_rows(queryset, user) for queryset in filtered]
+
+        try:
+            if stream:
+                # Rows are sent as they are read, so there is nothing to derive validators from.
+                return UrlListView.stream_response(querysets, cursor, ordering)
+            if cursor or page_size:
+                return UrlListView.page_response(request, querysets, cursor, page_size, ordering)
+        except InvalidCursor:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+        if "HTTP_IF_NONE_MATCH" not in request.META:
+            # No ETag to compare: the full list yields its validators itself, without the aggregates.
+            redirect_rules = list(keyset_rows(querysets, ordering=ordering))
+            last_modified = max((row["modified_at"] for row in redirect_rules), default=None)
+            return conditional_response(
+                request,
+                UrlListView.etag(request, len(redirect_rules), last_modified),
+                None,
+                lambda: UrlListView.list_response(redirect_rules),
+            )
+
+        # Any change to the listed rules changes their count or latest modified_at, so these
+        # aggregates validate the client's copy without reading the rows. A deletion leaves
+        # modified_at as it was, so the list has no Last-Modified: only the ETag, which includes
+        # the count, can tell a client its copy is current.
+        with phase("validators"):
+            states = [
+                queryset.aggregate(count=Count("id"), modified_at=Max("modified_at"))
+                for queryset in filtered
+            ]
+        count = sum(state["count"] for state in states)
+        last_modified = max((state["modified_at"] for state in states if state["modified_at"]), default=None)
+
+        return conditional_response(
+            request,
+            UrlListView.etag(request, count, last_modified),
+            None,
+            lambda: UrlListView.list_response(keyset_rows(querysets, ordering=ordering)),
+        )
+
+    @staticmethod
+    def etag(request, count, last_modified):
+        return make_etag("list", request.user.id, request.user.username, request.get_full_path(), count, last_modified)
+
+    @staticmethod
+    def page_response(request, querysets, cursor, page_size, ordering):
+        """
+        One keyset page, validated by an ETag of its own rows: reading page_size rows is cheaper than
+        counting all of the user's rules, which a whole-list ETag would need on every page.
+        """
+        page_size = min(page_size or settings.URL_LIST_PAGE_SIZE, settings.URL_LIST_MAX_PAGE_SIZE)
+        redirect_rules, next_cursor = keyset_page(querysets, page_size, cursor, ordering=ordering)
+        etag = make_etag(
+            "page",
+            request.user.id,
+            request.user.username,
+            request.get_full_path(),
+            next_cursor,
+            *(f"{row['id']}:{row['modified_at'].isoformat()}" for row in redirect_rules),
+        )
+
+        def render():
+            with phase("serialize"):
+                return JsonResponse(
+                    {
+                        "results": [serialize_redirect_rule_row(row) for row in redirect_rules],
+                        "next": next_cursor,
+                    },
+                    status=200,
+                )
+
+        return conditional_response(request, etag, None, render)
+
+    @staticmethod
+    def stream_response(querysets, cursor, ordering):
+        chunk_size = settings.URL_LIST_STREAM_CHUNK_SIZE
+        redirect_rules = keyset_rows(querysets, cursor, chunk_size=chunk_size, ordering=ordering)
+        return StreamingHttpResponse(
+            stream_json_array(
+                map(serialize_redirect_rule_row, redirect_rules),
+                chunk_size=chunk_size,
+            ),
             status=200,
-            safe=False,
+            content_type="application/json",
         )
 
+    @staticmethod
+    def list_response(redirect_rules):
+        with phase("serialize"):
+            return JsonResponse(
+                [serialize_redirect_rule_row(row) for row in redirect_rules],
+                status=200,
+                safe=False,
+            )
+
 
 class UrlDetailView(BaseView):
     @staticmethod
@@ -59,10 +221,15 @@ class UrlDetailView(BaseView):
         if not redirect_rule:
             return JsonResponse({"error": "RedirectRule not found"}, status=404)
 
-        return JsonResponse(
-            redirect_rule.as_dict(),
-            status=200,
-            safe=False,
+        return conditional_response(
+            request,
+            make_etag("detail", redirect_rule.id, redirect_rule.modified_at, user.username),
+            redirect_rule.modified_at,
+            lambda: JsonResponse(
+                serialize_redirect_rule(redirect_rule),
+                status=200,
+                safe=False,
+            ),
         )
 
     @staticmethod
@@ -86,7 +253,7 @@ class UrlDetailView(BaseView):
             redirect_rule.save()
 
             return JsonResponse(
-                redirect_rule.as_dict(),
+                serialize_redirect_rule(redirect_rule),
                 status=200,
                 safe=False,
             )
@@ -102,3 +269,42 @@ class UrlDetailView(BaseView):
             return JsonResponse({"error": "RedirectRule not found"}, status=404)
         redirect_rule.delete()
         return JsonResponse({}, status=204)
+
+
+class UrlStatsView(BaseView):
+    # Longest range a single request may cover, per granularity.
+    MAX_RANGE = {
+        RedirectHitRollup.MINUTE: datetime.timedelta(days=7),
+        RedirectHitRollup.HOUR: datetime.timedelta(days=366),
+    }
+
+    @staticmethod
+    @jwt_access_required
+    def get(request, redirect_rule_id, *args, **kwargs):
+        user = request.user
+        redirect_rule = RedirectRule.objects.get_by_id(redirect_rule_id, user)
+        if not redirect_rule:
+            return JsonResponse({"error": "RedirectRule not found"}, status=404)
+
+        form = UrlStatsForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        granularity = form.cleaned_data.get("granularity") or RedirectHitRollup.HOUR
+        end = form.cleaned_data.get("end") or timezone.now()
+        start = form.cleaned_data.get("start") or end - datetime.timedelta(days=1)
+        if end - start > UrlStatsView.MAX_RANGE[granularity]:
+            return JsonResponse({"error": f"Range is too long for {granularity} granularity"}, status=400)
+
+        series = RedirectHitRollup.objects.series(redirect_rule, start, end, granularity)
+        return JsonResponse(
+            {
+                "redirect_rule_id": redirect_rule.id,
+                "granularity": granularity,
+                "start": start,
+                "end": end,
+                "total": sum(count for _, count in series),
+                "buckets": [{"start": bucket_start, "count": count} for bucket_start, count in series],
+            },
+            status=200,
+        )
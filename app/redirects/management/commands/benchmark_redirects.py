@@ -0,0 +1,175 @@
+import asyncio
+import statistics
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+
+from links.cache import redirect_caches
+from links.models import RedirectRule
+from redirects.urls import async_urlpatterns, sync_urlpatterns
+
+
+def build_urlconf(name, redirect_urlpatterns):
+    urlconf = types.ModuleType(name)
+    urlconf.urlpatterns = [path("redirect/", include(redirect_urlpatterns))]
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /redirect/public/ throughput at high concurrency through the WSGI handler "
+        "with the sync views and through the ASGI handler with the async views. "
+        "--connections compares the configured persistent/pooled connections with a new connection "
+        "per request (WSGI only); combine it with --no-cache so that every request queries the database. "
+        "--middleware compares the full MIDDLEWARE stack with REDIRECT_MIDDLEWARE, the stack of the "
+        "redirect-only entry points (zone3000.redirect_wsgi, zone3000.redirect_asgi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--handler", choices=["wsgi", "asgi", "both"], default="both")
+        parser.add_argument("--connections", choices=["configured", "new", "compare"], default="configured")
+        parser.add_argument("--middleware", choices=["full", "redirect", "compare"], default="full")
+        parser.add_argument("--no-cache", action="store_true", help="Bypass the redirect rule caches.")
+
+    def handle(self, *args, **options):
+        redirect_rule = RedirectRule.objects.create(redirect_url="https://example.com/benchmark")
+        url = f"/redirect/public/{redirect_rule.redirect_identifier}"
+
+        if options["connections"] == "compare":
+            connection_modes = ["configured", "new"]
+        else:
+            connection_modes = [options["connections"]]
+        if options["middleware"] == "compare":
+            middleware_stacks = ["full", "redirect"]
+        else:
+            middleware_stacks = [options["middleware"]]
+
+        try:
+            with override_settings(ALLOWED_HOSTS=["*"], DEBUG=False), self.cache_mode(options["no_cache"]):
+                for middleware_stack in middleware_stacks:
+                    with self.middleware(middleware_stack):
+                        self.run_handlers(url, options, connection_modes, middleware_stack)
+        finally:
+            redirect_rule.delete()
+
+    def run_handlers(self, url, options, connection_modes, middleware_stack):
+        if options["handler"] in ("wsgi", "both"):
+            with override_settings(ROOT_URLCONF=build_urlconf("benchmark_wsgi_urls", sync_urlpatterns)):
+                for connection_mode in connection_modes:
+                    with self.connection_mode(connection_mode):
+                        self.report(
+                            f"wsgi ({connection_mode} connections, {middleware_stack} middleware)",
+                            *self.run_wsgi(url, options["requests"], options["concurrency"]),
+                        )
+        if options["handler"] in ("asgi", "both"):
+            # As served by the ASGI entry points, which never keep connections: only DB_POOL reuses them.
+            connection_mode = "configured" if settings.DB_POOL else "new"
+            with override_settings(ROOT_URLCONF=build_urlconf("benchmark_asgi_urls", async_urlpatterns)), \
+                    self.connection_mode(connection_mode):
+                self.report(
+                    f"asgi ({'pooled' if settings.DB_POOL else 'new'} connections, {middleware_stack} middleware)",
+                    *self.run_asgi(url, options["requests"], options["concurrency"]),
+                )
+
+    def middleware(self, stack):
+        """
+        The test clients build their middleware chain from the settings at their first request.
+        """
+        return override_settings(MIDDLEWARE=settings.REDIRECT_MIDDLEWARE if stack == "redirect" else settings.MIDDLEWARE)
+
+    @contextmanager
+    def connection_mode(self, mode):
+        """
+        With ``new``, every request opens and closes its own connection, bypassing CONN_MAX_AGE and pools.
+        """
+        if mode == "configured":
+            yield
+            return
+
+        saved = {alias: connections.settings[alias].copy() for alias in connections}
+        for alias in connections:
+            database = connections.settings[alias]
+            database["CONN_MAX_AGE"] = 0
+            database["OPTIONS"] = {key: value for key, value in database["OPTIONS"].items() if key != "pool"}
+        try:
+            yield
+        finally:
+            for alias, database in saved.items():
+                connections.settings[alias].update(database)
+
+    @contextmanager
+    def cache_mode(self, disabled):
+        if not disabled:
+            yield
+            return
+
+        saved = [(cache, cache.local.max_size, cache.timeout, cache.not_found_timeout) for cache in redirect_caches]
+        for cache in redirect_caches:
+            cache.clear()
+            cache.local.max_size = cache.timeout = cache.not_found_timeout = 0
+        try:
+            yield
+        finally:
+            for cache, max_size, timeout, not_found_timeout in saved:
+                cache.local.max_size, cache.timeout, cache.not_found_timeout = max_size, timeout, not_found_timeout
+
+    def report(self, name, elapsed, latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{name}: {len(latencies)} requests in {elapsed:.3f}s "
+            f"({len(latencies) / elapsed:,.0f} req/s), "
+            f"p50 {percentiles[49] * 1000:.2f}ms, p99 {percentiles[98] * 1000:.2f}ms"
+        )
+
+    def run_wsgi(self, url, requests, concurrency):
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started_at = time.perf_counter()
+            # The test client skips the connection handling the WSGI handler does around each request.
+            close_old_connections()
+            response = local.client.get(url)
+            close_old_connections()
+            if response.status_code != 302:
+                raise CommandError(f"Unexpected status {response.status_code}")
+            return time.perf_counter() - started_at
+
+        def close_connections(_):
+            connections.close_all()
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(fetch, range(requests)))
+            list(executor.map(close_connections, range(concurrency)))
+        return time.perf_counter() - started_at, latencies
+
+    def run_asgi(self, url, requests, concurrency):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch():
+                async with semaphore:
+                    started_at = time.perf_counter()
+                    response = await client.get(url)
+                    if response.status_code != 302:
+                        raise CommandError(f"Unexpected status {response.status_code}")
+                    return time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            latencies = await asyncio.gather(*(fetch() for _ in range(requests)))
+            return time.perf_counter() - started_at, latencies
+
+        return asyncio.run(run())
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from redirects.models import RedirectHit, RedirectHitRollup
+
+
+class Command(BaseCommand):
+    help = "Fold old per-minute hit rollups into per-hour rollups and delete old raw redirect hits."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minute-retention-hours",
+            type=int,
+            default=48,
+            help="Keep per-minute buckets for this many hours before folding them into hours.",
+        )
+        parser.add_argument(
+            "--raw-retention-days",
+            type=int,
+            default=7,
+            help="Delete raw RedirectHit rows older than this many days.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        minute_cutoff = now - datetime.timedelta(hours=options["minute_retention_hours"])
+        # Only fold whole hours, so an hour bucket never has minutes left on both sides.
+        minute_cutoff = minute_cutoff.replace(minute=0, second=0, microsecond=0)
+        folded = RedirectHitRollup.objects.fold_minutes(before=minute_cutoff)
+
+        raw_cutoff = now - datetime.timedelta(days=options["raw_retention_days"])
+        deleted, _ = RedirectHit.objects.filter(created_at__lt=raw_cutoff).delete()
+
+        self.stdout.write(
+            f"Folded minute buckets before {minute_cutoff.isoformat()} into {folded} hour buckets, "
+            f"deleted {deleted} raw hits before {raw_cutoff.isoformat()}"
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('links', '0004_identifier_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedirectHit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('redirect_rule', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='hits', to='links.redirectrule')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('links', '0004_identifier_sequence'),
+        ('redirects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedirectHitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('redirect_rule', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='hit_rollups', to='links.redirectrule')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('redirect_rule', 'granularity', 'bucket_start'), name='redirects_rollup_bucket_uniq')],
+            },
+        ),
+    ]
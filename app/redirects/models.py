@@ -1,3 +1,174 @@
-from django.db import models
+import datetime
+from collections import Counter
 
-# Create your models here.
+from django.db import connections, models, router, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from links.models import RedirectRule
+from zone3000.db_routers import is_sharded, shard_for_key
+
+
+class RedirectHit(models.Model):
+    # No database constraint: hits are inserted in the background and may outlive their rule.
+    redirect_rule = models.ForeignKey(
+        "links.RedirectRule",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="hits",
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Number of redirects this row stands for; above 1 when the buffer was sampling.
+    weight = models.PositiveIntegerField(default=1)
+
+
+class RedirectHitRollupManager(models.Manager):
+    def add_counts(self, counts):
+        """
+        Add ``{(redirect_rule_id, granularity, bucket_start): count}`` to the rollups in one upsert.
+        """
+        if not counts:
+            return
+
+        connection = connections[router.db_for_write(self.model)]
+        opts = self.model._meta
+        fields = [opts.get_field(name) for name in ("redirect_rule", "granularity", "bucket_start", "count")]
+        table = connection.ops.quote_name(opts.db_table)
+        columns = [connection.ops.quote_name(field.column) for field in fields]
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT ({', '.join(columns[:3])}) "
+            f"DO UPDATE SET {columns[3]} = {table}.{columns[3]} + EXCLUDED.{columns[3]}"
+        )
+        params = [
+            [
+                field.get_db_prep_value(value, connection)
+                for field, value in zip(fields, (*key, count))
+            ]
+            for key, count in counts.items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def add_hits(self, hits):
+        """
+        Count ``(redirect_rule_id, timestamp, weight)`` hits into per-minute buckets.
+        """
+        counts = Counter()
+        for redirect_rule_id, timestamp, weight in hits:
+            bucket_start = datetime.datetime.fromtimestamp(timestamp - timestamp % 60, tz=datetime.timezone.utc)
+            counts[(redirect_rule_id, RedirectHitRollup.MINUTE, bucket_start)] += weight
+        self.add_counts(counts)
+
+    def fold_minutes(self, before, batch_size=1000):
+        """
+        Fold minute buckets older than ``before`` into hour buckets and delete them.
+        """
+        # On the primary: a lagging replica could return minutes that were already folded.
+        database = router.db_for_write(self.model)
+        minutes = self.using(database).filter(granularity=RedirectHitRollup.MINUTE, bucket_start__lt=before)
+        hours = (
+            minutes
+            .annotate(hour=TruncHour("bucket_start"))
+            .values("redirect_rule_id", "hour")
+            .annotate(total=Sum("count"))
+            .order_by()
+        )
+        folded = 0
+        with transaction.atomic(using=database):
+            counts = {}
+            for row in hours.iterator(chunk_size=batch_size):
+                counts[(row["redirect_rule_id"], RedirectHitRollup.HOUR, row["hour"])] = row["total"]
+                if len(counts) >= batch_size:
+                    counts = self._existing_rules_only(counts)
+                    self.add_counts(counts)
+                    folded += len(counts)
+                    counts = {}
+            counts = self._existing_rules_only(counts)
+            self.add_counts(counts)
+            folded += len(counts)
+            minutes.delete()
+        return folded
+
+    @staticmethod
+    def _existing_rules_only(counts):
+        # Hits buffered before their rule was deleted are flushed afterwards and recreate its minute
+        # buckets; those are dropped here instead of being folded into hours that nothing deletes.
+        redirect_rule_ids = {redirect_rule_id for redirect_rule_id, _, _ in counts}
+        existing = set()
+        for queryset in RedirectRule.objects.shard_querysets(primary=True):
+            existing.update(queryset.filter(pk__in=redirect_rule_ids).values_list("pk", flat=True))
+        return {key: count for key, count in counts.items() if key[0] in existing}
+
+    def series(self, redirect_rule, start, end, granularity):
+        """
+        Return ``[(bucket_start, count)]`` for ``[start, end)``; hour series include unfolded minutes.
+        """
+        rollups = self.filter(redirect_rule=redirect_rule, bucket_start__gte=start, bucket_start__lt=end)
+        if granularity == RedirectHitRollup.MINUTE:
+            return list(
+                rollups
+                .filter(granularity=RedirectHitRollup.MINUTE)
+                .order_by("bucket_start")
+                .values_list("bucket_start", "count")
+            )
+
+        counts = Counter(dict(
+            rollups
+            .filter(granularity=RedirectHitRollup.HOUR)
+            .values_list("bucket_start", "count")
+        ))
+        counts.update(dict(
+            rollups
+            .filter(granularity=RedirectHitRollup.MINUTE)
+            .annotate(hour=TruncHour("bucket_start"))
+            .values("hour")
+            .annotate(total=Sum("count"))
+            .order_by()
+            .values_list("hour", "total")
+        ))
+        return sorted(counts.items())
+
+
+class RedirectHitRollup(models.Model):
+    MINUTE = "minute"
+    HOUR = "hour"
+    GRANULARITY_CHOICES = [
+        (MINUTE, "Minute"),
+        (HOUR, "Hour"),
+    ]
+
+    objects = RedirectHitRollupManager()
+
+    redirect_rule = models.ForeignKey(
+        "links.RedirectRule",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="hit_rollups",
+    )
+    granularity = models.CharField(max_length=6, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["redirect_rule", "granularity", "bucket_start"],
+                name="redirects_rollup_bucket_uniq",
+            ),
+        ]
+
+
+@receiver(post_delete, sender="links.RedirectRule")
+def redirect_hit_rollups_delete(sender, instance, **kwargs):
+    # Not cascaded (DO_NOTHING, and a sharded rule is in another database), so the rollups of deleted
+    # rules would be kept and folded forever. Raw hits are left for compact_redirect_hits to expire.
+    if is_sharded():
+        owner = shard_for_key(instance.redirect_identifier)
+        # A stray copy left on its old shard; the rule itself lives on.
+        if owner != instance._state.db and RedirectRule.objects.using(owner).filter(pk=instance.pk).exists():
+            return
+    RedirectHitRollup.objects.filter(redirect_rule_id=instance.pk).delete()
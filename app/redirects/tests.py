@@ -1,14 +1,36 @@
+import datetime
 import json
 import jwt
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import include, path
 
 from zone3000.settings import JWT_SECRET, JWT_ALGORITHM
+from common.testing import AllDatabasesTestMixin
 from custom_users.models import CustomUser
+from links.bloom import identifier_filter
+from links.cache import redirect_rule_cache, redirect_target_cache
 from links.models import RedirectRule
+from links.snapshot import RedirectSnapshot
+from redirects.models import RedirectHit, RedirectHitRollup
+from redirects.tracking import HitBuffer, hit_buffer
+from redirects.urls import async_urlpatterns
+
+urlpatterns = [
+    path("redirect/", include(async_urlpatterns)),
+]
 
 
-class RedirectViewsTestBase(TestCase):
+class RedirectViewsTestBase(AllDatabasesTestMixin, TestCase):
     def setUp(self):
         self.user = CustomUser.objects.create(
             username="testuser",
@@ -43,6 +65,24 @@ class PublicRedirectViewTests(RedirectViewsTestBase):
     def test_public_redirect_success(self):
         response = self.client.get(self.public_url)
 
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
+        self.assertEqual(response.content, b"")
+
+    def test_public_redirect_lean_queries(self):
+        cache.clear()
+        redirect_target_cache.clear()
+
+        with self.assertNumQueries(1):
+            self.client.get(self.public_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.public_url)
+
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
+
+    def test_public_redirect_json_opt_in(self):
+        response = self.client.get(self.public_url, {"format": "json"})
+
         self.assertEqual(response.status_code, 302)
         response_data = json.loads(response.content)
         self.assertEqual(response_data["redirect_url"], self.public_rule.redirect_url)
@@ -56,11 +96,71 @@ class PublicRedirectViewTests(RedirectViewsTestBase):
         response_data = json.loads(response.content)
         self.assertEqual(response_data["error"], "RedirectRule not found")
 
+        response = self.client.get(public_url_to_private_rule, {"format": "json"})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(REDIRECT_JSON_RESPONSE=True)
+    def test_json_response_setting(self):
+        response = self.client.get(self.public_url)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(json.loads(response.content)["redirect_url"], self.public_rule.redirect_url)
+
+    def test_public_redirect_has_no_cache_control_by_default(self):
+        response = self.client.get(self.public_url)
+        self.assertNotIn("Cache-Control", response)
+
+    @override_settings(REDIRECT_CACHE_MAX_AGE=60, REDIRECT_CACHE_S_MAXAGE=600)
+    def test_public_redirect_cache_control(self):
+        response = self.client.get(self.public_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60, s-maxage=600")
+
+        response = self.client.get(self.public_url, {"format": "json"})
+        self.assertEqual(response["Cache-Control"], "public, max-age=60, s-maxage=600")
+
+        response = self.client.get(f"/redirect/public/{self.private_rule.redirect_identifier}")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("Cache-Control", response)
+
+        response = self.client.get(self.private_url, **self.auth_header)
+        self.assertNotIn("Cache-Control", response)
+
+    def test_public_redirect_from_snapshot(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "redirects.snapshot")
+        call_command("build_redirect_snapshot", path=path, stdout=StringIO())
+        snapshot = RedirectSnapshot(path, refresh_interval=3600, sync_margin=0)
+        snapshot.refresh()
+
+        with mock.patch("redirects.views.redirect_snapshot", snapshot), self.assertNumQueries(0):
+            response = self.client.get(self.public_url)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
+
+    def test_unknown_identifier_is_rejected_by_filter(self):
+        cache.clear()
+        identifier_filter.build()
+        self.addCleanup(identifier_filter.reset)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/redirect/public/unknown")
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(self.public_url)
+        self.assertEqual(response.status_code, 302)
+
 
 class PrivateRedirectViewTests(RedirectViewsTestBase):
     def test_private_redirect_success_with_auth(self):
         response = self.client.get(self.private_url, **self.auth_header)
 
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.private_rule.redirect_url)
+
+    def test_private_redirect_json_opt_in(self):
+        response = self.client.get(self.private_url, {"format": "json"}, **self.auth_header)
+
         self.assertEqual(response.status_code, 302)
         response_data = json.loads(response.content)
         self.assertEqual(response_data["redirect_url"], self.private_rule.redirect_url)
@@ -71,9 +171,303 @@ class PrivateRedirectViewTests(RedirectViewsTestBase):
         response = self.client.get(private_url_to_public_rule, **self.auth_header)
 
         self.assertEqual(response.status_code, 302)
-        response_data = json.loads(response.content)
-        self.assertEqual(response_data["redirect_url"], self.public_rule.redirect_url)
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
 
     def test_private_redirect_fails_without_auth(self):
         response = self.client.get(self.private_url)
         self.assertEqual(response.status_code, 401)
+
+
+@override_settings(ROOT_URLCONF="zone3000.redirect_urls", MIDDLEWARE=settings.REDIRECT_MIDDLEWARE)
+class RedirectEntryPointTests(RedirectViewsTestBase):
+    def test_redirects_are_served(self):
+        response = self.client.get(self.public_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
+
+        response = self.client.get(self.private_url, **self.auth_header)
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.get(self.private_url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_only_redirect_routes_are_served(self):
+        response = self.client.get("/url/redirect_rules", **self.auth_header)
+        self.assertEqual(response.status_code, 404)
+
+    def test_host_header_is_validated(self):
+        response = self.client.get(self.public_url, HTTP_HOST="attacker.example")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncRedirectViewTests(RedirectViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        redirect_rule_cache.clear()
+        redirect_target_cache.clear()
+
+    async def test_public_redirect_success(self):
+        response = await self.async_client.get(self.public_url)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.public_rule.redirect_url)
+
+    async def test_public_redirect_json_opt_in(self):
+        response = await self.async_client.get(self.public_url, {"format": "json"})
+
+        self.assertEqual(response.status_code, 302)
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data["redirect_url"], self.public_rule.redirect_url)
+        self.assertEqual(response_data["user"]["username"], self.user.username)
+
+    @override_settings(REDIRECT_CACHE_S_MAXAGE=600)
+    async def test_public_redirect_cache_control(self):
+        response = await self.async_client.get(self.public_url)
+
+        self.assertEqual(response["Cache-Control"], "public, max-age=0, s-maxage=600")
+
+    async def test_public_redirect_to_private_rule_fails(self):
+        response = await self.async_client.get(f"/redirect/public/{self.private_rule.redirect_identifier}")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_public_redirect_unknown_identifier(self):
+        response = await self.async_client.get("/redirect/public/unknown")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_public_redirect_unknown_identifier_with_filter(self):
+        await sync_to_async(identifier_filter.build)()
+        self.addCleanup(identifier_filter.reset)
+
+        response = await self.async_client.get("/redirect/public/unknown")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_private_redirect_success_with_auth(self):
+        response = await self.async_client.get(self.private_url, headers={"Authorization": f"Bearer {self.token}"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.private_rule.redirect_url)
+
+    async def test_private_redirect_fails_without_auth(self):
+        response = await self.async_client.get(self.private_url)
+
+        self.assertEqual(response.status_code, 401)
+
+
+class HitBufferTests(RedirectViewsTestBase):
+    def test_flush_writes_buffered_hits(self):
+        buffer = HitBuffer(max_size=10, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+        buffer.record(self.public_rule.id)
+
+        self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(RedirectHit.objects.filter(redirect_rule=self.public_rule).count(), 2)
+        self.assertEqual(buffer.stats()["buffered"], 0)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_buffer_drops_hits(self):
+        buffer = HitBuffer(max_size=2, batch_size=10, flush_interval=5)
+        for _ in range(3):
+            buffer.record(self.public_rule.id)
+
+        stats = buffer.stats()
+        self.assertEqual(stats["buffered"], 2)
+        self.assertEqual(stats["dropped"], 1)
+
+    def test_sampling_weights_kept_hits(self):
+        buffer = HitBuffer(max_size=4, batch_size=10, flush_interval=5, overflow="sample", sample_rate=0.5)
+        with mock.patch("redirects.tracking.random.random", side_effect=[0.1, 0.9]):
+            for _ in range(4):
+                buffer.record(self.public_rule.id)
+        buffer.flush()
+
+        weights = list(RedirectHit.objects.order_by("id").values_list("weight", flat=True))
+        self.assertEqual(weights, [1, 1, 2])
+        self.assertEqual(buffer.stats()["dropped"], 1)
+
+    def test_fractional_weights_are_rounded_at_random(self):
+        # 1 / 0.4 = 2.5: a weight of 3 for half of the kept hits and 2 for the other half.
+        buffer = HitBuffer(max_size=4, batch_size=10, flush_interval=5, overflow="sample", sample_rate=0.4)
+        with mock.patch("redirects.tracking.random.random", side_effect=[0.1, 0.3, 0.1, 0.7]):
+            for _ in range(4):
+                buffer.record(self.public_rule.id)
+        buffer.flush()
+
+        weights = list(RedirectHit.objects.order_by("id").values_list("weight", flat=True))
+        self.assertEqual(weights, [1, 1, 3, 2])
+
+    def test_batch_size_wakes_the_flusher(self):
+        buffer = HitBuffer(max_size=10, batch_size=2, flush_interval=5)
+        buffer.record(self.public_rule.id)
+        self.assertFalse(buffer._wakeup.is_set())
+        buffer.record(self.public_rule.id)
+        self.assertTrue(buffer._wakeup.is_set())
+
+    def test_failed_flush_is_counted(self):
+        buffer = HitBuffer(max_size=10, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+
+        with mock.patch("redirects.models.RedirectHit.objects.bulk_create", side_effect=Exception), \
+                self.assertLogs("redirects.tracking", "ERROR"):
+            self.assertEqual(buffer.flush(), 0)
+
+        self.assertEqual(buffer.stats()["failed"], 1)
+        self.assertEqual(buffer.stats()["buffered"], 1)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(RedirectHit.objects.count(), 1)
+
+    def test_failed_hits_beyond_the_buffer_size_are_dropped(self):
+        buffer = HitBuffer(max_size=2, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+        buffer.record(self.public_rule.id)
+
+        def record_more(*args, **kwargs):
+            buffer.record(self.private_rule.id)
+            raise Exception
+
+        with mock.patch("redirects.models.RedirectHit.objects.bulk_create", side_effect=record_more), \
+                self.assertLogs("redirects.tracking", "ERROR"):
+            buffer.flush()
+
+        stats = buffer.stats()
+        self.assertEqual(stats["buffered"], 2)
+        self.assertEqual(stats["dropped"], 1)
+
+    def test_forked_process_starts_with_an_empty_buffer(self):
+        buffer = HitBuffer(max_size=10, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+
+        with mock.patch("redirects.tracking.os.getpid", return_value=os.getpid() + 1):
+            self.assertEqual(buffer.flush(), 0)
+            buffer.record(self.private_rule.id)
+            self.assertEqual(buffer.stats()["recorded"], 1)
+            self.assertEqual(buffer.flush(), 1)
+
+        self.assertEqual(RedirectHit.objects.get().redirect_rule_id, self.private_rule.id)
+
+    def test_redirect_records_a_hit(self):
+        hit_buffer.clear()
+
+        self.client.get(self.public_url)
+        self.client.get(f"/redirect/public/{self.private_rule.redirect_identifier}")
+
+        self.assertEqual(hit_buffer.flush(), 1)
+        self.assertEqual(RedirectHit.objects.get().redirect_rule_id, self.public_rule.id)
+
+    @override_settings(REDIRECT_HITS_ENABLED=False)
+    def test_tracking_can_be_disabled(self):
+        hit_buffer.clear()
+
+        self.client.get(self.public_url)
+
+        self.assertEqual(hit_buffer.flush(), 0)
+
+
+class RedirectHitRollupTests(RedirectViewsTestBase):
+    def setUp(self):
+        super().setUp()
+        self.hour = datetime.datetime(2025, 3, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def timestamp(self, minutes, seconds=0):
+        return (self.hour + datetime.timedelta(minutes=minutes, seconds=seconds)).timestamp()
+
+    def rollups(self, granularity):
+        return list(
+            RedirectHitRollup.objects
+            .filter(redirect_rule=self.public_rule, granularity=granularity)
+            .order_by("bucket_start")
+            .values_list("bucket_start", "count")
+        )
+
+    def test_hits_are_added_to_minute_buckets(self):
+        rule_id = self.public_rule.id
+        RedirectHitRollup.objects.add_hits([(rule_id, self.timestamp(0, 5), 1), (rule_id, self.timestamp(0, 50), 2)])
+        RedirectHitRollup.objects.add_hits([(rule_id, self.timestamp(0, 59), 1), (rule_id, self.timestamp(1), 1)])
+
+        self.assertEqual(
+            self.rollups(RedirectHitRollup.MINUTE),
+            [(self.hour, 4), (self.hour + datetime.timedelta(minutes=1), 1)],
+        )
+
+    def test_flush_updates_rollups(self):
+        buffer = HitBuffer(max_size=10, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+        buffer.record(self.public_rule.id)
+        buffer.flush()
+
+        self.assertEqual(sum(count for _, count in self.rollups(RedirectHitRollup.MINUTE)), 2)
+
+    def test_fold_minutes_into_hours(self):
+        rule_id = self.public_rule.id
+        RedirectHitRollup.objects.add_hits([
+            (rule_id, self.timestamp(1), 1),
+            (rule_id, self.timestamp(59), 2),
+            (rule_id, self.timestamp(61), 3),
+        ])
+        RedirectHitRollup.objects.add_counts({(rule_id, RedirectHitRollup.HOUR, self.hour): 10})
+
+        RedirectHitRollup.objects.fold_minutes(before=self.hour + datetime.timedelta(hours=1))
+
+        self.assertEqual(self.rollups(RedirectHitRollup.HOUR), [(self.hour, 13)])
+        self.assertEqual(self.rollups(RedirectHitRollup.MINUTE), [(self.hour + datetime.timedelta(minutes=61), 3)])
+
+    def test_fold_minutes_drops_hits_of_deleted_rules(self):
+        buffer = HitBuffer(max_size=10, batch_size=10, flush_interval=5)
+        buffer.record(self.public_rule.id)
+        buffer.record(self.private_rule.id)
+        deleted_rule_id = self.public_rule.id
+        self.public_rule.delete()
+        buffer.flush()
+
+        RedirectHitRollup.objects.fold_minutes(before=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1))
+
+        self.assertFalse(RedirectHitRollup.objects.filter(redirect_rule_id=deleted_rule_id).exists())
+        self.assertEqual(
+            list(RedirectHitRollup.objects.values_list("redirect_rule_id", "granularity", "count")),
+            [(self.private_rule.id, RedirectHitRollup.HOUR, 1)],
+        )
+
+    def test_hour_series_includes_unfolded_minutes(self):
+        rule_id = self.public_rule.id
+        next_hour = self.hour + datetime.timedelta(hours=1)
+        RedirectHitRollup.objects.add_counts({(rule_id, RedirectHitRollup.HOUR, self.hour): 5})
+        RedirectHitRollup.objects.add_hits([(rule_id, self.timestamp(61), 1), (rule_id, self.timestamp(62), 1)])
+
+        series = RedirectHitRollup.objects.series(
+            self.public_rule, self.hour, next_hour + datetime.timedelta(hours=1), RedirectHitRollup.HOUR
+        )
+
+        self.assertEqual(series, [(self.hour, 5), (next_hour, 2)])
+
+    def test_rollups_are_deleted_with_their_rule(self):
+        RedirectHitRollup.objects.add_hits([
+            (self.public_rule.id, self.timestamp(1), 1),
+            (self.private_rule.id, self.timestamp(1), 1),
+        ])
+
+        self.public_rule.delete()
+
+        self.assertEqual(
+            list(RedirectHitRollup.objects.values_list("redirect_rule_id", flat=True)),
+            [self.private_rule.id],
+        )
+
+    def test_compact_command(self):
+        old_hit = RedirectHit.objects.create(
+            redirect_rule=self.public_rule,
+            created_at=self.hour,
+        )
+        RedirectHit.objects.create(redirect_rule=self.public_rule)
+        RedirectHitRollup.objects.add_hits([(self.public_rule.id, self.timestamp(1), 1)])
+
+        call_command("compact_redirect_hits", stdout=StringIO())
+
+        self.assertFalse(RedirectHit.objects.filter(id=old_hit.id).exists())
+        self.assertEqual(RedirectHit.objects.count(), 1)
+        self.assertEqual(self.rollups(RedirectHitRollup.HOUR), [(self.hour, 1)])
+        self.assertEqual(self.rollups(RedirectHitRollup.MINUTE), [])
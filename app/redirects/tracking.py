@@ -0,0 +1,182 @@
+import atexit
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_SAMPLE = "sample"
+
+
+class HitBuffer:
+    """
+    Per-process buffer of redirect hits, written to ``RedirectHit`` in batches by a background thread,
+    together with the matching per-minute ``RedirectHitRollup`` increments.
+
+    ``record`` only appends to a list, so the redirect path never waits for the database. The
+    thread flushes when ``batch_size`` hits are waiting or every ``flush_interval`` seconds.
+    When the buffer is full new hits are dropped. With the ``sample`` overflow policy, once
+    it is half full only ``sample_rate`` of the hits are kept, each weighted by
+    ``1 / sample_rate``, so counts stay unbiased; a fractional weight is rounded up or down at
+    random, in proportion to its fraction, since weights are whole numbers. Hits of a failed write
+    go back into the buffer for the next flush, as far as there is room; the rest are counted as
+    dropped.
+
+    A process forked from one with buffered hits (``gunicorn --preload``) starts with an empty
+    buffer; the parent writes its own hits.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval, overflow=OVERFLOW_DROP, sample_rate=0.1):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self._hits = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+        self._atexit_registered = False
+        self._pid = os.getpid()
+
+    def record(self, redirect_rule_id):
+        if self._pid != os.getpid():
+            self._forked()
+
+        with self._lock:
+            size = len(self._hits)
+            weight = 1
+            if size >= self.max_size:
+                self.dropped += 1
+                return
+            if self.overflow == OVERFLOW_SAMPLE and size >= self.max_size // 2:
+                if random.random() >= self.sample_rate:
+                    self.dropped += 1
+                    return
+                weight, fraction = divmod(1 / self.sample_rate, 1)
+                weight = int(weight) + (fraction > 0 and random.random() < fraction)
+
+            self._hits.append((redirect_rule_id, time.time(), weight))
+            self.recorded += 1
+            if size + 1 >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        from redirects.models import RedirectHit, RedirectHitRollup
+
+        if self._pid != os.getpid():
+            self._forked()
+        with self._lock:
+            hits, self._hits = self._hits, []
+        if not hits:
+            return 0
+
+        try:
+            with transaction.atomic():
+                RedirectHit.objects.bulk_create(
+                    [
+                        RedirectHit(
+                            redirect_rule_id=redirect_rule_id,
+                            created_at=datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc),
+                            weight=weight,
+                        )
+                        for redirect_rule_id, timestamp, weight in hits
+                    ],
+                    batch_size=self.batch_size,
+                )
+                RedirectHitRollup.objects.add_hits(hits)
+        except Exception:
+            logger.exception("Failed to write %d redirect hits", len(hits))
+            self._requeue(hits)
+            return 0
+
+        self.flushed += len(hits)
+        return len(hits)
+
+    def _requeue(self, hits):
+        with self._lock:
+            self.failed += len(hits)
+            room = max(self.max_size - len(self._hits), 0)
+            if room < len(hits):
+                logger.error("Dropped %d redirect hits that could not be written", len(hits) - room)
+                self.dropped += len(hits) - room
+                hits = hits[len(hits) - room:]
+            self._hits[:0] = hits
+
+    def _forked(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hits = []
+            self.recorded = self.dropped = self.flushed = self.failed = 0
+            started, self._started = self._started, False
+        if started:
+            self.start()
+
+    def clear(self):
+        with self._lock:
+            self._hits = []
+
+    def start(self):
+        """
+        Start the flusher thread of the current process; a forked child starts its own on first ``record``.
+        """
+        if self._pid != os.getpid():
+            self._forked()
+        with self._lock:
+            if self._started:
+                return
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+            self._started = True
+            thread = threading.Thread(target=self._run, name="redirect-hit-flusher", daemon=True)
+            thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buffered": len(self._hits),
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "failed": self.failed,
+            }
+
+
+hit_buffer = HitBuffer(
+    max_size=settings.REDIRECT_HITS_BUFFER_SIZE,
+    batch_size=settings.REDIRECT_HITS_BATCH_SIZE,
+    flush_interval=settings.REDIRECT_HITS_FLUSH_INTERVAL,
+    overflow=settings.REDIRECT_HITS_OVERFLOW,
+    sample_rate=settings.REDIRECT_HITS_SAMPLE_RATE,
+)
+
+
+def record_hit(redirect_rule_id):
+    if settings.REDIRECT_HITS_ENABLED:
+        hit_buffer.record(redirect_rule_id)
+
+
+def start_hit_tracking():
+    if settings.REDIRECT_HITS_ENABLED:
+        hit_buffer.start()
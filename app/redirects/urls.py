@@ -1,8 +1,21 @@
+from django.conf import settings
 from django.urls import path
 
-from redirects.views import PrivateRedirectView, PublicRedirectView
+from redirects.views import (
+    AsyncPrivateRedirectView,
+    AsyncPublicRedirectView,
+    PrivateRedirectView,
+    PublicRedirectView,
+)
 
-urlpatterns = [
+sync_urlpatterns = [
     path('public/<str:redirect_identifier>', PublicRedirectView.as_view()),
     path('private/<str:redirect_identifier>',  PrivateRedirectView.as_view()),
 ]
+
+async_urlpatterns = [
+    path('public/<str:redirect_identifier>', AsyncPublicRedirectView.as_view()),
+    path('private/<str:redirect_identifier>', AsyncPrivateRedirectView.as_view()),
+]
+
+urlpatterns = async_urlpatterns if settings.ASYNC_REDIRECTS else sync_urlpatterns
@@ -1,34 +1,125 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
 
 from common.api.decorators import jwt_access_required
 from common.views import BaseView
+from links.bloom import identifier_filter
 from links.models import RedirectRule
+from links.snapshot import redirect_snapshot
+from links.serializers import serialize_redirect_rule
+from redirects.tracking import record_hit
+
+
+class RuleRedirect(HttpResponseRedirect):
+    # Every scheme URLField accepts for redirect_url.
+    allowed_schemes = ["http", "https", "ftp", "ftps"]
+
+
+def json_requested(request):
+    """
+    Whether the client opted in to the legacy JSON body (``?format=json``) instead of a plain 302.
+    """
+    return settings.REDIRECT_JSON_RESPONSE or request.GET.get("format") == "json"
+
+
+def not_found():
+    return JsonResponse({"error": "RedirectRule not found"}, status=404)
+
+
+def cache_publicly(response):
+    """
+    Let browsers and shared caches reuse a public redirect for the configured time.
+    """
+    if settings.REDIRECT_CACHE_MAX_AGE or settings.REDIRECT_CACHE_S_MAXAGE:
+        cache_control = {"public": True, "max_age": settings.REDIRECT_CACHE_MAX_AGE}
+        if settings.REDIRECT_CACHE_S_MAXAGE:
+            cache_control["s_maxage"] = settings.REDIRECT_CACHE_S_MAXAGE
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def json_redirect(redirect_rule):
+    record_hit(redirect_rule.id)
+    return JsonResponse(
+        serialize_redirect_rule(redirect_rule),
+        status=302,
+        safe=False,
+    )
+
+
+def lean_redirect(redirect_target):
+    record_hit(redirect_target.id)
+    return RuleRedirect(redirect_target.redirect_url)
 
 
 class PrivateRedirectView(BaseView):
     @staticmethod
     @jwt_access_required
     def get(request, redirect_identifier, *args, **kwargs):
-        redirect_rule = RedirectRule.objects.get_by_identifier(redirect_identifier)
-        if not redirect_rule:
-            return JsonResponse({"error": "RedirectRule not found"}, status=404)
+        if json_requested(request):
+            redirect_rule = RedirectRule.objects.get_by_identifier(redirect_identifier)
+            return json_redirect(redirect_rule) if redirect_rule else not_found()
 
-        return JsonResponse(
-            redirect_rule.as_dict(),
-            status=302,
-            safe=False,
-        )
+        redirect_target = RedirectRule.objects.get_redirect_target(redirect_identifier)
+        return lean_redirect(redirect_target) if redirect_target else not_found()
 
 
 class PublicRedirectView(BaseView):
     @staticmethod
     def get(request, redirect_identifier, *args, **kwargs):
-        redirect_rule = RedirectRule.objects.get_by_identifier(redirect_identifier)
-        if not redirect_rule or redirect_rule.is_private:
-            return JsonResponse({"error": "RedirectRule not found"}, status=404)
-
-        return JsonResponse(
-            redirect_rule.as_dict(),
-            status=302,
-            safe=False,
-        )
+        json_response = json_requested(request)
+        if redirect_snapshot.enabled and not json_response:
+            found, redirect_target = redirect_snapshot.get(redirect_identifier)
+            if found:
+                return cache_publicly(lean_redirect(redirect_target)) if redirect_target else not_found()
+
+        if not identifier_filter.might_contain(redirect_identifier):
+            return not_found()
+
+        if json_response:
+            redirect_rule = RedirectRule.objects.get_by_identifier(redirect_identifier)
+            if not redirect_rule or redirect_rule.is_private:
+                return not_found()
+            return cache_publicly(json_redirect(redirect_rule))
+
+        redirect_target = RedirectRule.objects.get_redirect_target(redirect_identifier)
+        if not redirect_target or redirect_target.is_private:
+            return not_found()
+        return cache_publicly(lean_redirect(redirect_target))
+
+
+class AsyncPrivateRedirectView(BaseView):
+    @staticmethod
+    @jwt_access_required
+    async def get(request, redirect_identifier, *args, **kwargs):
+        if json_requested(request):
+            redirect_rule = await RedirectRule.objects.aget_by_identifier(redirect_identifier)
+            return json_redirect(redirect_rule) if redirect_rule else not_found()
+
+        redirect_target = await RedirectRule.objects.aget_redirect_target(redirect_identifier)
+        return lean_redirect(redirect_target) if redirect_target else not_found()
+
+
+class AsyncPublicRedirectView(BaseView):
+    @staticmethod
+    async def get(request, redirect_identifier, *args, **kwargs):
+        json_response = json_requested(request)
+        if redirect_snapshot.enabled and not json_response:
+            found, redirect_target = await redirect_snapshot.aget(redirect_identifier)
+            if found:
+                return cache_publicly(lean_redirect(redirect_target)) if redirect_target else not_found()
+
+        if not await identifier_filter.amight_contain(redirect_identifier):
+            return not_found()
+
+        if json_response:
+            redirect_rule = await RedirectRule.objects.aget_by_identifier(redirect_identifier)
+            if not redirect_rule or redirect_rule.is_private:
+                return not_found()
+            return cache_publicly(json_redirect(redirect_rule))
+
+        redirect_target = await RedirectRule.objects.aget_redirect_target(redirect_identifier)
+        if not redirect_target or redirect_target.is_private:
+            return not_found()
+        return cache_publicly(lean_redirect(redirect_target))
@@ -0,0 +1,16 @@
+"""
+URL configuration of the API without the admin (``zone3000.slim_settings``); ``zone3000.urls`` adds
+the admin in front of it.
+"""
+from django.urls import path, include
+
+from redirects import urls
+from links import urls as links_urls
+from common import urls as common_urls
+
+
+urlpatterns = [
+    path('redirect/', include(urls)),
+    path('url/', include(links_urls)),
+    path('', include(common_urls)),
+]
@@ -12,5 +12,20 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zone3000.settings')
+# Serve the redirect routes with the native async views when running under ASGI.
+os.environ.setdefault('ASYNC_REDIRECTS', 'True')
+
+# Async views run the ORM in worker threads, and every thread would keep a persistent connection of
+# its own: close connections after each request unless DB_CONN_MAX_AGE says otherwise (which
+# check_async_connections warns about), or reuse them through DB_POOL.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+from links.bloom import start_identifier_filter  # noqa: E402
+from redirects.tracking import start_hit_tracking  # noqa: E402
+from zone3000.db_routers import check_async_connections  # noqa: E402
+
+check_async_connections()
+start_hit_tracking()
+start_identifier_filter()
@@ -0,0 +1,208 @@
+import logging
+import random
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_DATABASE = DEFAULT_DB_ALIAS
+# Models spread over DATABASE_SHARDS, and the field whose value picks their shard.
+SHARD_KEYS = {
+    "links.redirectrule": "redirect_identifier",
+}
+
+_routing_scope = ContextVar("db_routing_scope", default=None)
+
+
+class RoutingScope:
+    __slots__ = ("primary", "wrote")
+
+    def __init__(self, primary):
+        self.primary = primary
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to the primary and reads to a random database from ``DATABASE_REPLICAS``.
+
+    Reads go to the primary when:
+
+    * there are no replicas, or the caller passes the ``primary=True`` hint;
+    * they run inside a ``read_your_writes`` block that has written, or whose key wrote within
+      the last ``DB_PRIMARY_STICKY_SECONDS``.
+
+    Related objects are read from the database their instance came from.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or hints.get("primary"):
+            return PRIMARY_DATABASE
+
+        scope = _routing_scope.get()
+        if scope is not None and (scope.primary or scope.wrote):
+            return PRIMARY_DATABASE
+
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in (PRIMARY_DATABASE, *replicas):
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        scope = _routing_scope.get()
+        if scope is not None:
+            scope.wrote = True
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY_DATABASE, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def is_sharded():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def shard_for_key(key):
+    """
+    The ``DATABASE_SHARDS`` alias that owns ``key``; adding or removing shards moves most keys.
+    """
+    shards = settings.DATABASE_SHARDS
+    return shards[zlib.crc32(key.encode()) % len(shards)]
+
+
+class ShardRouter:
+    """
+    Keep the models in ``SHARD_KEYS`` on the ``DATABASE_SHARDS`` alias chosen by a hash of their shard key.
+
+    Instances are written to the shard that owns them and re-read from the one they came from.
+    Other reads carry no shard key, so callers pass a ``shard_key`` hint or query ``.using(shard)``
+    themselves; without either they fall through to the next router, i.e. the default database.
+    Sharded models are not replicated: their reads never go to ``DATABASE_REPLICAS``.
+    """
+
+    def _shard_for(self, model, hints):
+        field = SHARD_KEYS.get(model._meta.label_lower)
+        if field is None or not is_sharded():
+            return None
+        if "shard_key" in hints:
+            return shard_for_key(hints["shard_key"])
+        instance = hints.get("instance")
+        if isinstance(instance, model) and getattr(instance, field):
+            return shard_for_key(getattr(instance, field))
+        return None
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if isinstance(instance, model) and instance._state.db in settings.DATABASE_SHARDS:
+            return instance._state.db
+        return self._shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows reference rows of the default database through foreign keys without constraints.
+        if is_sharded() and SHARD_KEYS.keys() & {obj1._meta.label_lower, obj2._meta.label_lower}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def _pin_key(key):
+    return f"db_primary_pin:{key}"
+
+
+def _pin_cache():
+    # Shared by all workers, so that a write in one sends the reads of every other to the primary.
+    return caches[settings.DB_PRIMARY_PIN_CACHE_ALIAS]
+
+
+def _pinning_enabled():
+    return bool(settings.DATABASE_REPLICAS) and settings.DB_PRIMARY_STICKY_SECONDS > 0
+
+
+def pin_to_primary(*keys):
+    """
+    Send reads for ``keys`` to the primary for the next ``DB_PRIMARY_STICKY_SECONDS``, in every worker
+    sharing the ``DB_PRIMARY_PIN_CACHE_ALIAS`` cache.
+    """
+    if _pinning_enabled() and keys:
+        _pin_cache().set_many({_pin_key(key): True for key in keys}, settings.DB_PRIMARY_STICKY_SECONDS)
+
+
+async def apin_to_primary(*keys):
+    if _pinning_enabled() and keys:
+        await _pin_cache().aset_many({_pin_key(key): True for key in keys}, settings.DB_PRIMARY_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(key):
+    return _pinning_enabled() and _pin_cache().get(_pin_key(key), False)
+
+
+async def ais_pinned_to_primary(key):
+    return _pinning_enabled() and await _pin_cache().aget(_pin_key(key), False)
+
+
+@contextmanager
+def read_your_writes(key):
+    """
+    Read from the primary inside the block once it writes, or if ``key`` wrote recently; pin ``key`` after a write.
+    """
+    if not _pinning_enabled():
+        yield
+        return
+
+    scope = RoutingScope(primary=is_pinned_to_primary(key))
+    token = _routing_scope.set(scope)
+    try:
+        yield
+    finally:
+        _routing_scope.reset(token)
+        if scope.wrote:
+            pin_to_primary(key)
+
+
+@asynccontextmanager
+async def aread_your_writes(key):
+    if not _pinning_enabled():
+        yield
+        return
+
+    scope = RoutingScope(primary=await ais_pinned_to_primary(key))
+    token = _routing_scope.set(scope)
+    try:
+        yield
+    finally:
+        _routing_scope.reset(token)
+        if scope.wrote:
+            await apin_to_primary(key)
+
+
+def check_async_connections():
+    """
+    Warn about databases that keep connections under ASGI, where every ORM worker thread would
+    hold one of its own; called by the ASGI entry points.
+    """
+    kept = [alias for alias, database in settings.DATABASES.items() if database.get("CONN_MAX_AGE")]
+    if kept:
+        logger.warning(
+            "DB_CONN_MAX_AGE keeps the connections of %s open under ASGI, one per worker thread. "
+            "Set it to 0, or reuse connections through DB_POOL.",
+            ", ".join(kept),
+        )
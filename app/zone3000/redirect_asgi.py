@@ -0,0 +1,27 @@
+"""
+ASGI entry point that serves only the redirect routes, with the native async views and a
+minimal middleware stack. See ``zone3000.redirect_settings``.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+# Not setdefault: DJANGO_SETTINGS_MODULE is usually set for the whole deployment.
+os.environ['DJANGO_SETTINGS_MODULE'] = 'zone3000.redirect_settings'
+os.environ.setdefault('ASYNC_REDIRECTS', 'True')
+
+# Async views run the ORM in worker threads, and every thread would keep a persistent connection of
+# its own: close connections after each request unless DB_CONN_MAX_AGE says otherwise (which
+# check_async_connections warns about), or reuse them through DB_POOL.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
+
+from links.bloom import start_identifier_filter  # noqa: E402
+from redirects.tracking import start_hit_tracking  # noqa: E402
+from zone3000.db_routers import check_async_connections  # noqa: E402
+
+check_async_connections()
+start_hit_tracking()
+start_identifier_filter()
@@ -0,0 +1,12 @@
+"""
+Settings of the redirect-only entry points, ``zone3000.redirect_wsgi`` and ``zone3000.redirect_asgi``.
+
+They serve ``/redirect/`` (and ``/metrics``) with the apps and middleware of
+``zone3000.slim_settings``: no session, CSRF, auth, messages and clickjacking middleware, since
+the redirect views authenticate with ``jwt_access_required`` and ``BaseView`` is CSRF exempt.
+"""
+from zone3000.slim_settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'zone3000.redirect_urls'
+
+WSGI_APPLICATION = 'zone3000.redirect_wsgi.application'
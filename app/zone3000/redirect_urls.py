@@ -0,0 +1,12 @@
+"""
+URL configuration of the redirect-only entry points (``zone3000.redirect_settings``).
+"""
+from django.urls import path, include
+
+from common.views import MetricsView
+from redirects import urls
+
+urlpatterns = [
+    path('redirect/', include(urls)),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+]
@@ -0,0 +1,21 @@
+"""
+WSGI entry point that serves only the redirect routes, with a minimal middleware stack.
+
+Run it next to ``zone3000.wsgi`` and send ``/redirect/`` to it, e.g.
+``gunicorn zone3000.redirect_wsgi``. See ``zone3000.redirect_settings``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+# Not setdefault: DJANGO_SETTINGS_MODULE is usually set for the whole deployment.
+os.environ['DJANGO_SETTINGS_MODULE'] = 'zone3000.redirect_settings'
+
+application = get_wsgi_application()
+
+from links.bloom import start_identifier_filter  # noqa: E402
+from redirects.tracking import start_hit_tracking  # noqa: E402
+
+start_hit_tracking()
+start_identifier_filter()
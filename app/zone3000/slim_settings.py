@@ -0,0 +1,27 @@
+"""
+Slim settings profile for API and redirect workers.
+
+Leaves out what the API does not use, so a new worker imports and sets up less before its first
+request: the admin, auth, contenttypes, sessions, messages and staticfiles apps (``CustomUser``
+only uses the password hashers), the session/CSRF/auth/messages middleware (views authenticate
+with ``jwt_access_required`` and are CSRF exempt), the template engine and translations.
+Everything else comes from ``zone3000.settings``; run ``manage.py profile_startup zone3000.settings
+zone3000.slim_settings`` to compare the two.
+"""
+from zone3000.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'common',
+    'links',
+    'custom_users',
+    'redirects',
+]
+
+MIDDLEWARE = REDIRECT_MIDDLEWARE  # noqa: F405
+
+ROOT_URLCONF = 'zone3000.api_urls'
+
+# JSON responses only; Django's error pages do not need a configured engine.
+TEMPLATES = []
+
+USE_I18N = False
@@ -15,16 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
 
-from redirects import urls
-from links import urls as links_urls
-from common import urls as common_urls
+from zone3000.api_urls import urlpatterns as api_urlpatterns
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('redirect/', include(urls)),
-    path('url/', include(links_urls)),
-    path('', include(common_urls)),
+    *api_urlpatterns,
 ]
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zone3000.settings')
 
 application = get_wsgi_application()
+
+from links.bloom import start_identifier_filter  # noqa: E402
+from redirects.tracking import start_hit_tracking  # noqa: E402
+
+start_hit_tracking()
+start_identifier_filter()